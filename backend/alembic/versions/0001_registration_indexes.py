@@ -0,0 +1,52 @@
+"""Index des requêtes fréquentes sur les inscriptions
+
+Les tables sont créées au démarrage par Base.metadata.create_all ; cette
+révision ajoute aux bases existantes les index déclarés dans
+models.Registration.__table_args__ :
+- (game_id, approval_status, created_at, id) : listes admin d'une partie, statistiques
+- (approval_status, created_at, id) : file de validation et compteur des inscriptions en attente
+- game_id WHERE confirmed : rappels (index partiel)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# Identifiants de révision utilisés par Alembic
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Base neuve : create_all créera la table avec ses index au démarrage
+    if not context.is_offline_mode() and not sa.inspect(op.get_bind()).has_table("registrations"):
+        return
+
+    op.create_index(
+        "ix_registrations_game_status_created", "registrations",
+        ["game_id", "approval_status", "created_at", "id"],
+        if_not_exists=True
+    )
+    op.create_index(
+        "ix_registrations_status_created", "registrations",
+        ["approval_status", "created_at", "id"],
+        if_not_exists=True
+    )
+    op.create_index(
+        "ix_registrations_game_confirmed", "registrations",
+        ["game_id"],
+        postgresql_where=sa.text("confirmed = true"),
+        sqlite_where=sa.text("confirmed = 1"),
+        if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_index("ix_registrations_game_confirmed", table_name="registrations", if_exists=True)
+    op.drop_index("ix_registrations_status_created", table_name="registrations", if_exists=True)
+    op.drop_index("ix_registrations_game_status_created", table_name="registrations", if_exists=True)
@@ -0,0 +1,46 @@
+"""Index de pagination des listes de parties et de candidatures
+
+Tri des listes paginées par curseur (keyset) :
+- games (date, id)
+- membership_applications (created_at, id) et (status, created_at, id)
+Les listes d'inscriptions utilisent les index de la révision 0001.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# Identifiants de révision utilisés par Alembic
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = None if context.is_offline_mode() else sa.inspect(op.get_bind())
+
+    # Base neuve : create_all créera les tables avec leurs index au démarrage
+    if inspector is None or inspector.has_table("games"):
+        op.create_index("ix_games_date_id", "games", ["date", "id"], if_not_exists=True)
+
+    if inspector is None or inspector.has_table("membership_applications"):
+        op.create_index(
+            "ix_membership_applications_created", "membership_applications",
+            ["created_at", "id"],
+            if_not_exists=True
+        )
+        op.create_index(
+            "ix_membership_applications_status_created", "membership_applications",
+            ["status", "created_at", "id"],
+            if_not_exists=True
+        )
+
+
+def downgrade():
+    op.drop_index("ix_membership_applications_status_created", table_name="membership_applications", if_exists=True)
+    op.drop_index("ix_membership_applications_created", table_name="membership_applications", if_exists=True)
+    op.drop_index("ix_games_date_id", table_name="games", if_exists=True)
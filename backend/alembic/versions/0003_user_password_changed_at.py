@@ -0,0 +1,34 @@
+"""Date du dernier changement de mot de passe des administrateurs
+
+users.password_changed_at est inscrite dans les tokens (claim "pwd") : un
+token émis avant un changement de mot de passe n'est plus accepté.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# Identifiants de révision utilisés par Alembic
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not context.is_offline_mode():
+        inspector = sa.inspect(op.get_bind())
+        # Base neuve : create_all créera la table complète au démarrage
+        if not inspector.has_table("users"):
+            return
+        if "password_changed_at" in {column["name"] for column in inspector.get_columns("users")}:
+            return
+
+    op.add_column("users", sa.Column("password_changed_at", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("users", "password_changed_at")
@@ -0,0 +1,35 @@
+"""Date de dernière modification des parties
+
+games.updated_at sert de validateur HTTP (ETag / Last-Modified) pour
+/api/games/active. Les parties existantes reprennent leur date de création.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# Identifiants de révision utilisés par Alembic
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not context.is_offline_mode():
+        inspector = sa.inspect(op.get_bind())
+        # Base neuve : create_all créera la table complète au démarrage
+        if not inspector.has_table("games"):
+            return
+        if "updated_at" in {column["name"] for column in inspector.get_columns("games")}:
+            return
+
+    op.add_column("games", sa.Column("updated_at", sa.DateTime(), nullable=True))
+    op.execute("UPDATE games SET updated_at = created_at WHERE updated_at IS NULL")
+
+
+def downgrade():
+    op.drop_column("games", "updated_at")
@@ -0,0 +1,77 @@
+"""Un tag NFC par joueur et par partie
+
+Index unique (game_id, nfc_tag_id) sur les inscriptions : dernier garde-fou
+contre la double attribution d'un bracelet par deux postes d'accueil (les
+inscriptions sans tag, nfc_tag_id NULL, ne sont pas concernées).
+
+Si des joueurs d'une même partie portent déjà le même tag, la migration
+s'arrête sans rien modifier et liste les inscriptions concernées : c'est à
+l'opérateur de choisir qui garde le bracelet (interface admin ou SQL), puis
+de relancer alembic upgrade head.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# Identifiants de révision utilisés par Alembic
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+DUPLICATES_QUERY = """
+    SELECT r.game_id, g.name AS game_name, g.date AS game_date, t.tag_number, r.id,
+           r.first_name, r.last_name, r.nickname
+    FROM registrations r
+    JOIN (
+        SELECT game_id, nfc_tag_id FROM registrations
+        WHERE nfc_tag_id IS NOT NULL
+        GROUP BY game_id, nfc_tag_id
+        HAVING COUNT(*) > 1
+    ) d ON d.game_id = r.game_id AND d.nfc_tag_id = r.nfc_tag_id
+    LEFT JOIN games g ON g.id = r.game_id
+    LEFT JOIN nfc_tags t ON t.id = r.nfc_tag_id
+    ORDER BY r.game_id, r.nfc_tag_id, r.id
+"""
+
+
+def _check_duplicates():
+    """Arrête la migration si un tag est porté par plusieurs joueurs d'une partie"""
+    rows = op.get_bind().execute(sa.text(DUPLICATES_QUERY)).all()
+    if not rows:
+        return
+    lines = [
+        f"  - partie #{row.game_id} ({row.game_name}, {row.game_date}), tag {row.tag_number} : "
+        f"inscription #{row.id} {row.first_name} {row.last_name} ({row.nickname})"
+        for row in rows
+    ]
+    raise RuntimeError(
+        "Tags NFC attribués à plusieurs joueurs d'une même partie :\n"
+        + "\n".join(lines)
+        + "\nRetirez le tag des inscriptions en trop (UPDATE registrations SET nfc_tag_id = NULL "
+        "WHERE id IN (...)) puis relancez alembic upgrade head. Aucune donnée n'a été modifiée."
+    )
+
+
+def upgrade():
+    if not context.is_offline_mode():
+        # Base neuve : create_all créera la table avec ses index au démarrage
+        if not sa.inspect(op.get_bind()).has_table("registrations"):
+            return
+        _check_duplicates()
+
+    op.create_index(
+        "ux_registrations_game_nfc_tag", "registrations",
+        ["game_id", "nfc_tag_id"],
+        unique=True,
+        if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_index("ux_registrations_game_nfc_tag", table_name="registrations", if_exists=True)
@@ -0,0 +1,100 @@
+"""Statistiques précalculées des parties
+
+Tables game_stats (compteurs par partie) et game_association_stats
+(inscriptions et payés par association), tenues à jour par les endpoints qui
+modifient les inscriptions. Les parties existantes sont calculées depuis
+leurs inscriptions ; python rebuild_game_stats.py vérifie et corrige ensuite
+une éventuelle dérive.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# Identifiants de révision utilisés par Alembic
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+# Inscription payée (le type de paiement génère un coût) et non invitée
+PAID = "pt.generates_cost = TRUE"
+PAYS = f"{PAID} AND r.attendance_type <> 'invited'"
+FREELANCE = "(r.has_association IS NULL OR r.has_association = FALSE OR r.association_name IS NULL OR r.association_name = '')"
+
+
+def _count_if(condition: str) -> str:
+    return f"COALESCE(SUM(CASE WHEN {condition} THEN 1 ELSE 0 END), 0)"
+
+
+def upgrade():
+    if not context.is_offline_mode():
+        inspector = sa.inspect(op.get_bind())
+        # Base neuve : create_all créera les tables au démarrage
+        if not inspector.has_table("registrations"):
+            return
+        existing = set(inspector.get_table_names())
+    else:
+        existing = set()
+
+    if "game_stats" not in existing:
+        op.create_table(
+            "game_stats",
+            sa.Column("game_id", sa.Integer(), sa.ForeignKey("games.id"), primary_key=True),
+            sa.Column("total_registrations", sa.Integer(), nullable=False),
+            sa.Column("confirmed", sa.Integer(), nullable=False),
+            sa.Column("present", sa.Integer(), nullable=False),
+            sa.Column("morning_only", sa.Integer(), nullable=False),
+            sa.Column("full_day", sa.Integer(), nullable=False),
+            sa.Column("payments_validated", sa.Integer(), nullable=False),
+            sa.Column("paid_freelance", sa.Integer(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        )
+    if "game_association_stats" not in existing:
+        op.create_table(
+            "game_association_stats",
+            sa.Column("game_id", sa.Integer(), sa.ForeignKey("games.id"), primary_key=True),
+            sa.Column("association_name", sa.String(), primary_key=True),
+            sa.Column("registrations", sa.Integer(), nullable=False),
+            sa.Column("paid", sa.Integer(), nullable=False),
+            sa.Column("first_registration_id", sa.Integer(), nullable=False),
+        )
+
+    # Parties sans compteurs (tables créées vides par create_all si l'application a démarré avant)
+    op.execute(f"""
+        INSERT INTO game_association_stats (game_id, association_name, registrations, paid, first_registration_id)
+        SELECT r.game_id, r.association_name, COUNT(r.id), {_count_if(PAYS)}, MIN(r.id)
+        FROM registrations r
+        LEFT JOIN payment_types pt ON pt.id = r.payment_type_id
+        WHERE r.game_id IS NOT NULL AND NOT {FREELANCE}
+          AND NOT EXISTS (SELECT 1 FROM game_stats s WHERE s.game_id = r.game_id)
+        GROUP BY r.game_id, r.association_name
+    """)
+    op.execute(f"""
+        INSERT INTO game_stats (
+            game_id, total_registrations, confirmed, present, morning_only, full_day,
+            payments_validated, paid_freelance, updated_at
+        )
+        SELECT g.id, COUNT(r.id),
+            {_count_if("r.confirmed = TRUE")},
+            {_count_if("r.was_present = TRUE")},
+            {_count_if("r.attendance_type = 'morning'")},
+            {_count_if("r.attendance_type = 'full_day'")},
+            {_count_if(PAID)},
+            {_count_if(f"{PAYS} AND {FREELANCE}")},
+            CURRENT_TIMESTAMP
+        FROM games g
+        LEFT JOIN registrations r ON r.game_id = g.id
+        LEFT JOIN payment_types pt ON pt.id = r.payment_type_id
+        WHERE NOT EXISTS (SELECT 1 FROM game_stats s WHERE s.game_id = g.id)
+        GROUP BY g.id
+    """)
+
+
+def downgrade():
+    op.drop_table("game_association_stats")
+    op.drop_table("game_stats")
@@ -0,0 +1,41 @@
+"""Tickets d'ouverture du flux temps réel
+
+Table event_stream_tickets : tickets à usage unique et de courte durée,
+échangés contre le token admin pour ouvrir /api/events sans faire figurer le
+token dans l'URL (et donc dans les journaux d'accès).
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# Identifiants de révision utilisés par Alembic
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not context.is_offline_mode():
+        inspector = sa.inspect(op.get_bind())
+        # Base neuve : create_all créera la table au démarrage
+        if not inspector.has_table("users") or inspector.has_table("event_stream_tickets"):
+            return
+
+    op.create_table(
+        "event_stream_tickets",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("ticket_hash", sa.String(), nullable=False, unique=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_event_stream_tickets_expires_at", "event_stream_tickets", ["expires_at"])
+
+
+def downgrade():
+    op.drop_index("ix_event_stream_tickets_expires_at", table_name="event_stream_tickets")
+    op.drop_table("event_stream_tickets")
@@ -0,0 +1,251 @@
+"""
+Métriques au format Prometheus (endpoint /metrics)
+Compteurs, jauges et histogrammes en mémoire, sans verrou : ils ne sont
+modifiés que depuis la boucle d'événements (un seul thread), où une mise à
+jour ne peut pas être interrompue par une autre. Le coût d'une mesure se
+limite à quelques opérations sur un dictionnaire.
+
+Les métriques sont propres à chaque processus : avec plusieurs workers
+uvicorn, chacun expose les siennes (label worker = pid) et Prometheus doit
+relever chaque processus ou conteneur.
+
+Mesures : requêtes HTTP par route (nombre, latence, en cours), pool de
+connexions SQLAlchemy, tâches planifiées (durée, résultat, leader), envois
+SMTP (durée, échecs) et profondeur des files (emails, inscriptions et
+candidatures en attente).
+
+Désactivées par défaut : METRICS_ENABLED=true les active, à condition de
+définir METRICS_TOKEN (le port du backend est joignable directement en
+développement). Sans token, les métriques restent désactivées.
+"""
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import os
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"  # Endpoint /metrics et mesures HTTP
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")  # Obligatoire : /metrics exige "Authorization: Bearer <token>"
+
+if METRICS_ENABLED and not METRICS_TOKEN:
+    logger.warning("⚠️ METRICS_ENABLED=true sans METRICS_TOKEN : métriques désactivées")
+    METRICS_ENABLED = False
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # Response ajoute charset=utf-8
+WORKER = str(os.getpid())
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """Métrique nommée, avec des séries par combinaison de labels"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = ("worker",) + labelnames
+
+    def _key(self, labels: Tuple[str, ...]) -> LabelValues:
+        return (WORKER,) + tuple(str(label) for label in labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self.values.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str):
+        self.values[self._key(labels)] = value
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # Par série : effectifs par intervalle (non cumulés), somme
+        self.series: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, *labels: str):
+        key = self._key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * len(self.buckets), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REGISTRY: List[Metric] = []
+
+
+def register(metric: Metric) -> Metric:
+    REGISTRY.append(metric)
+    return metric
+
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+JOB_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+EMAIL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+PROCESS_START = register(Gauge("process_start_time_seconds", "Démarrage du processus (timestamp Unix)"))
+HTTP_REQUESTS = register(Counter("http_requests_total", "Requêtes HTTP traitées", ("method", "route", "status")))
+HTTP_DURATION = register(Histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP (hors flux temps réel)", ("method", "route"), HTTP_BUCKETS
+))
+HTTP_IN_PROGRESS = register(Gauge("http_requests_in_progress", "Requêtes HTTP en cours"))
+DB_POOL = register(Gauge("db_pool_connections", "Connexions du pool SQLAlchemy par état", ("state",)))
+JOB_RUNS = register(Counter("scheduler_job_runs_total", "Exécutions des tâches planifiées", ("job", "outcome")))
+JOB_DURATION = register(Histogram("scheduler_job_duration_seconds", "Durée des tâches planifiées", ("job",), JOB_BUCKETS))
+JOB_LAST_SUCCESS = register(Gauge("scheduler_job_last_success_timestamp_seconds", "Dernière exécution réussie", ("job",)))
+SCHEDULER_LEADER = register(Gauge("scheduler_leader", "1 si ce processus exécute les tâches planifiées"))
+EMAIL_SENDS = register(Counter("email_sends_total", "Envois SMTP par résultat", ("outcome",)))
+EMAIL_SEND_DURATION = register(Histogram("email_send_duration_seconds", "Durée d'un envoi SMTP", (), EMAIL_BUCKETS))
+QUEUE_DEPTH = register(Gauge("queue_depth", "Éléments en attente par file", ("queue",)))
+LIVE_SUBSCRIBERS = register(Gauge("live_events_subscribers", "Tableaux de bord connectés au flux temps réel"))
+
+PROCESS_START.set(time.time())
+SCHEDULER_LEADER.set(0)
+
+
+def record_job_run(job: str, duration: float, outcome: str):
+    """Résultat d'une tâche planifiée (success / error)"""
+    JOB_RUNS.inc(job, outcome)
+    JOB_DURATION.observe(duration, job)
+    if outcome == "success":
+        JOB_LAST_SUCCESS.set(time.time(), job)
+
+
+def record_email_send(duration: float, sent: bool):
+    """Résultat d'un envoi SMTP"""
+    EMAIL_SENDS.inc("sent" if sent else "failed")
+    EMAIL_SEND_DURATION.observe(duration)
+
+
+def update_pool_gauges(engine):
+    """État du pool de connexions (QueuePool ; ignoré pour les autres pools)"""
+    pool = engine.pool
+    for state, reader in (("size", "size"), ("checked_out", "checkedout"), ("checked_in", "checkedin"), ("overflow", "overflow")):
+        if hasattr(pool, reader):
+            DB_POOL.set(getattr(pool, reader)(), state)
+
+
+async def update_queue_gauges(db: AsyncSession, counters: Dict[str, int], subscribers: int):
+    """
+    Files d'attente : emails par statut (hors envoyés, index sur status) et
+    compteurs en mémoire des inscriptions et candidatures en attente
+    """
+    depths = dict((await db.execute(
+        select(EmailOutbox.status, func.count(EmailOutbox.id))
+        .where(EmailOutbox.status.in_(["pending", "sending", "failed"]))
+        .group_by(EmailOutbox.status)
+    )).all())
+    for status in ("pending", "sending", "failed"):
+        QUEUE_DEPTH.set(depths.get(status, 0), f"email_{status}")
+    for name, value in counters.items():
+        QUEUE_DEPTH.set(value, name)
+    LIVE_SUBSCRIBERS.set(subscribers)
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI : nombre et durée des requêtes HTTP par route (modèle de
+    chemin, ex. /api/games/{game_id} ; "unmatched" pour les 404 de routage).
+    La durée des flux temps réel (text/event-stream) n'est pas mesurée.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        response = {"status": 500, "event_stream": False}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                for name, value in message.get("headers", []):
+                    if name.lower() == b"content-type":
+                        response["event_stream"] = value.startswith(b"text/event-stream")
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_PROGRESS.dec()
+            route: Optional[object] = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            HTTP_REQUESTS.inc(scope["method"], path, str(response["status"]))
+            if not response["event_stream"]:
+                HTTP_DURATION.observe(time.perf_counter() - start, scope["method"], path)
@@ -1,15 +1,32 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+import asyncio
 import os
 import hashlib
+import time
 
 SECRET_KEY = os.getenv("SECRET_KEY", "votre-cle-secrete-a-changer-en-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 heures
+# Durée de validité d'un token vérifié en cache (secondes). Un changement de mot de passe
+# révoque les tokens sur tous les workers via LISTEN/NOTIFY (config_cache.py) ; si la
+# diffusion est indisponible (CONFIG_CACHE_NOTIFY=false, SQLite), les autres workers
+# acceptent encore l'ancien token pendant au plus ADMIN_CACHE_TTL secondes.
+ADMIN_CACHE_TTL = float(os.getenv("ADMIN_CACHE_TTL", 60))
+ADMIN_CACHE_SIZE = int(os.getenv("ADMIN_CACHE_SIZE", 256))  # Nombre maximal de tokens en cache
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))  # Coût bcrypt (les hashs d'un autre coût sont mis à jour à la connexion)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))  # Threads dédiés au hachage des mots de passe
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt prend 100 à 300 ms de CPU : exécuté hors de la boucle d'événements,
+# dans un pool borné pour qu'une rafale de connexions ne sature pas le serveur
+_password_executor: Optional[ThreadPoolExecutor] = None
 
 
 def hash_password(password: str) -> str:
@@ -37,6 +54,62 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         return False
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Indique si le hash doit être recalculé (fallback SHA256 ou coût bcrypt modifié)"""
+    if hashed_password.startswith("sha256:"):
+        return True
+    try:
+        return pwd_context.needs_update(hashed_password)
+    except Exception:
+        return False
+
+
+def verify_and_rehash_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Vérifier un mot de passe et, s'il est correct mais que son hash est obsolète,
+    retourner le nouveau hash à enregistrer : (valide, nouveau hash ou None)
+    """
+    if not verify_password(plain_password, hashed_password):
+        return False, None
+    if password_needs_rehash(hashed_password):
+        new_hash = hash_password(plain_password)
+        # Pas de mise à jour si bcrypt est indisponible (le fallback redonnerait un SHA256)
+        if not new_hash.startswith("sha256:"):
+            return True, new_hash
+    return True, None
+
+
+async def _run_password_task(func, *args):
+    global _password_executor
+    if _password_executor is None:
+        _password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, func, *args)
+
+
+async def hash_password_async(password: str) -> str:
+    """Hasher un mot de passe sans bloquer la boucle d'événements"""
+    return await _run_password_task(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Vérifier un mot de passe sans bloquer la boucle d'événements"""
+    return await _run_password_task(verify_password, plain_password, hashed_password)
+
+
+async def verify_and_rehash_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Version asynchrone de verify_and_rehash_password"""
+    return await _run_password_task(verify_and_rehash_password, plain_password, hashed_password)
+
+
+def shutdown_password_executor():
+    """Arrête les threads de hachage (arrêt de l'application)"""
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False)
+        _password_executor = None
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Créer un token JWT"""
     to_encode = data.copy()
@@ -50,13 +123,78 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def verify_token(token: str) -> Optional[str]:
-    """Vérifier un token JWT et retourner le username"""
+def decode_token(token: str) -> Optional[dict]:
+    """Vérifier un token JWT et retourner son contenu"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-        return username
     except JWTError:
         return None
+    if payload.get("sub") is None:
+        return None
+    return payload
+
+
+def password_stamp(user) -> str:
+    """
+    Empreinte du dernier changement de mot de passe, inscrite dans le token
+    (claim "pwd") : un token émis avant un changement de mot de passe est refusé.
+    """
+    if user.password_changed_at is None:
+        return ""
+    return user.password_changed_at.isoformat()
+
+
+class AdminIdentity:
+    """Administrateur authentifié (sans session de base de données)"""
+
+    def __init__(self, id: int, username: str):
+        self.id = id
+        self.username = username
+
+
+class AdminTokenCache:
+    """
+    Cache borné des tokens déjà vérifiés : évite le décodage JWT et la requête
+    User à chaque appel admin. Une entrée expire après ADMIN_CACHE_TTL secondes
+    (ou à l'expiration du token si elle est plus proche).
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[AdminIdentity, float]]" = OrderedDict()
+
+    def get(self, token: str) -> Optional[AdminIdentity]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        identity, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return identity
+
+    def set(self, token: str, identity: AdminIdentity, token_exp: Optional[float] = None):
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        lifetime = self.ttl
+        if token_exp is not None:
+            lifetime = min(lifetime, token_exp - time.time())
+        if lifetime <= 0:
+            return
+        self._entries[token] = (identity, time.monotonic() + lifetime)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate_user(self, username: str):
+        """Retire du cache tous les tokens d'un utilisateur"""
+        for token in [t for t, (identity, _) in self._entries.items() if identity.username == username]:
+            del self._entries[token]
+
+    def clear(self):
+        self._entries.clear()
+
+
+admin_token_cache = AdminTokenCache(ADMIN_CACHE_TTL, ADMIN_CACHE_SIZE)
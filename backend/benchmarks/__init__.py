@@ -0,0 +1,18 @@
+"""
+Banc de mesure des performances de l'API (hors production)
+
+Génère un jeu de données synthétique (saisons de parties, inscriptions, tags,
+candidatures) sur une base locale PostgreSQL ou SQLite, puis rejoue des
+scénarios scriptés contre l'application, dans le même processus :
+
+- registration_spike : rush d'inscriptions publiques à l'ouverture
+- dashboard : chargement du tableau de bord admin
+- statistics : statistiques globales et par partie
+- checkin : pointage des présents et attribution des tags à l'accueil
+- reminders : rappels automatiques, envoyés à un faux serveur SMTP local
+
+Usage (depuis backend/) :
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.run --database-url sqlite:///benchmark.db
+    python -m benchmarks.run --output results.json --compare baseline.json
+"""
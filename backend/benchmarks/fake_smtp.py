@@ -0,0 +1,68 @@
+"""
+Faux serveur SMTP local pour le scénario des rappels
+
+Accepte tous les messages sans les délivrer (pas de TLS ni d'authentification)
+et les compte. `latency` simule le temps de réponse d'un fournisseur après
+chaque message.
+"""
+import asyncio
+from typing import Optional
+
+
+class FakeSMTPServer:
+    """Serveur SMTP minimal (EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT)"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.messages = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        def reply(line: str):
+            writer.write(f"{line}\r\n".encode())
+
+        reply("220 benchmark ESMTP")
+        try:
+            while True:
+                await writer.drain()
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors="replace").strip().upper()
+                if command.startswith(("EHLO", "HELO")):
+                    reply("250-benchmark")
+                    reply("250-8BITMIME")
+                    reply("250 SMTPUTF8")
+                elif command == "DATA":
+                    reply("354 Fin par <CRLF>.<CRLF>")
+                    await writer.drain()
+                    while (await reader.readline()) not in (b".\r\n", b".\n", b""):
+                        pass
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                    self.messages += 1
+                    reply("250 OK")
+                elif command.startswith("QUIT"):
+                    reply("221 Bye")
+                    await writer.drain()
+                    break
+                elif command.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                    reply("250 OK")
+                else:
+                    reply("502 Commande non supportée")
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,119 @@
+"""
+Mesures du banc : latence, débit et nombre de requêtes SQL par endpoint
+"""
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+import math
+import time
+
+from sqlalchemy import event
+
+# Compteur de requêtes SQL de l'appel en cours (propagé aux greenlets de SQLAlchemy)
+_query_counter: ContextVar[Optional[List[int]]] = ContextVar("benchmark_query_counter", default=None)
+
+
+def install_query_counter(async_engine):
+    """Compte les requêtes SQL exécutées pendant chaque appel mesuré"""
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        counter = _query_counter.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile par interpolation linéaire (valeurs triées)"""
+    if not values:
+        return 0.0
+    rank = (len(values) - 1) * pct / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+class EndpointStats:
+    """Échantillons d'un endpoint (clé "MÉTHODE /chemin/{param}")"""
+
+    def __init__(self):
+        self.latencies: List[float] = []  # millisecondes
+        self.queries: List[int] = []
+        self.errors = 0
+        self.statuses: Dict[int, int] = {}
+
+    def add(self, latency_ms: float, status: int, queries: int, ok: bool):
+        self.latencies.append(latency_ms)
+        self.queries.append(queries)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not ok:
+            self.errors += 1
+
+    def summary(self, duration: float) -> Dict:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "statuses": {str(code): total for code, total in sorted(self.statuses.items())},
+            "throughput_rps": round(count / duration, 2) if duration > 0 else 0.0,
+            "latency_ms": {
+                "mean": round(sum(latencies) / count, 2) if count else 0.0,
+                "p50": round(percentile(latencies, 50), 2),
+                "p95": round(percentile(latencies, 95), 2),
+                "p99": round(percentile(latencies, 99), 2),
+                "max": round(latencies[-1], 2) if count else 0.0,
+            },
+            "queries_per_request": {
+                "mean": round(sum(self.queries) / count, 2) if count else 0.0,
+                "max": max(self.queries) if count else 0,
+            },
+        }
+
+
+class Recorder:
+    """Regroupe les mesures d'un scénario par endpoint"""
+
+    def __init__(self):
+        self.endpoints: Dict[str, EndpointStats] = {}
+        self.extra: Dict = {}
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    async def _timed(self, coroutine_function, status_of):
+        """Exécute et chronomètre un appel en comptant ses requêtes SQL"""
+        counter = [0]
+        token = _query_counter.set(counter)
+        start = time.perf_counter()
+        try:
+            result = await coroutine_function()
+            status = status_of(result)
+        except Exception:
+            result, status = None, 0
+        finally:
+            _query_counter.reset(token)
+        latency_ms = (time.perf_counter() - start) * 1000
+        return result, status, latency_ms, counter[0]
+
+    async def measure(self, name: str, call, expected=(200,)):
+        """Exécute `call()` (coroutine renvoyant une réponse httpx) et enregistre sa mesure"""
+        response, status, latency_ms, queries = await self._timed(call, lambda response: response.status_code)
+        self.endpoints.setdefault(name, EndpointStats()).add(latency_ms, status, queries, status in expected)
+        return response
+
+    async def measure_task(self, name: str, coroutine_function):
+        """Mesure une tâche hors HTTP (job planifié, worker) ; statut 0 si elle lève une exception"""
+        result, status, latency_ms, queries = await self._timed(coroutine_function, lambda result: 200)
+        self.endpoints.setdefault(name, EndpointStats()).add(latency_ms, status, queries, status == 200)
+        return result
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    def summary(self) -> Dict:
+        duration = (self.finished or time.perf_counter()) - self.started
+        total = sum(len(stats.latencies) for stats in self.endpoints.values())
+        return {
+            "duration_s": round(duration, 3),
+            "requests": total,
+            "throughput_rps": round(total / duration, 2) if duration > 0 else 0.0,
+            "endpoints": {name: stats.summary(duration) for name, stats in sorted(self.endpoints.items())},
+            **self.extra,
+        }
@@ -0,0 +1,212 @@
+"""
+Lance le banc de mesure et produit un rapport par endpoint
+
+L'application est appelée dans le même processus (httpx + ASGI, sans réseau
+ni uvicorn) : les temps mesurés sont ceux de l'application et de la base.
+Le scheduler et le worker d'emails ne sont pas démarrés ; le scénario des
+rappels les exécute lui-même contre un faux serveur SMTP local.
+
+Usage (depuis backend/) :
+    python -m benchmarks.run [--database-url URL] [--profile small|season|large] [--reset]
+                             [--scenarios registration_spike,dashboard,...]
+                             [--requests 200] [--concurrency 20]
+                             [--output results.json] [--compare baseline.json]
+
+La base doit être vide (elle est alors remplie avec le jeu de données
+synthétique) ; --reset supprime et recrée toutes ses tables. Ne jamais
+pointer le banc sur une base de production.
+
+Avec --compare, les endpoints dont le p95 augmente de plus de --threshold
+(20 % par défaut, et d'au moins --min-delta-ms) ou dont le nombre moyen de
+requêtes SQL augmente sont signalés, et le code de sortie vaut 1.
+"""
+from datetime import datetime
+from typing import Dict, List
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+
+from benchmarks.fake_smtp import FakeSMTPServer
+
+DEFAULT_DATABASE_URL = "sqlite:///benchmark.db"
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Banc de mesure de l'API Airsoft Manager")
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL, help="Base locale PostgreSQL ou SQLite (URL synchrone)")
+    parser.add_argument("--profile", default="season", choices=["small", "season", "large"], help="Volume du jeu de données")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du générateur de données")
+    parser.add_argument("--reset", action="store_true", help="Supprime et recrée les tables avant de générer les données")
+    parser.add_argument("--scenarios", default="all", help="Scénarios à lancer, séparés par des virgules")
+    parser.add_argument("--requests", type=int, default=200, help="Utilisateurs simulés par scénario")
+    parser.add_argument("--concurrency", type=int, default=20, help="Utilisateurs simultanés")
+    parser.add_argument("--smtp-latency", type=float, default=0.0, help="Temps de réponse simulé du serveur SMTP (secondes)")
+    parser.add_argument("--email-rate", type=float, default=0.0, help="EMAIL_RATE_LIMIT pendant les rappels (0 = illimité)")
+    parser.add_argument("--output", help="Fichier JSON du rapport")
+    parser.add_argument("--compare", help="Rapport JSON de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Hausse relative du p95 signalée comme régression")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="Hausse absolue minimale du p95 signalée (bruit de mesure)")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args: argparse.Namespace, smtp_port: int):
+    """Variables lues à l'import des modules de l'application : à définir avant"""
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.update({
+        "SCHEDULER_ENABLED": "false",
+        "SMTP_HOST": "127.0.0.1",
+        "SMTP_PORT": str(smtp_port),
+        "SMTP_USER": "",
+        "SMTP_PASSWORD": "",
+        "SMTP_START_TLS": "false",
+        "EMAIL_FROM": "benchmark@example.com",
+        "EMAIL_RATE_LIMIT": str(args.email_rate),
+    })
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def print_report(report: Dict):
+    header = f"{'endpoint':<58} {'req':>5} {'err':>4} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'sql':>6}"
+    for name, scenario in report["scenarios"].items():
+        print(f"\n=== {name} : {scenario['requests']} appels en {scenario['duration_s']} s ({scenario['throughput_rps']} req/s)")
+        if "emails_sent" in scenario:
+            print(f"    {scenario['emails_sent']} emails envoyés ({scenario['emails_per_s']} emails/s)")
+        print(header)
+        for endpoint, stats in scenario["endpoints"].items():
+            latency = stats["latency_ms"]
+            print(
+                f"{endpoint:<58} {stats['requests']:>5} {stats['errors']:>4} {latency['p50']:>8.1f} "
+                f"{latency['p95']:>8.1f} {latency['p99']:>8.1f} {stats['throughput_rps']:>8.1f} "
+                f"{stats['queries_per_request']['mean']:>6.1f}"
+            )
+
+
+def compare_reports(report: Dict, baseline: Dict, threshold: float, min_delta_ms: float) -> List[str]:
+    """Régressions par rapport à un rapport de référence (p95 et requêtes SQL)"""
+    regressions = []
+    for name, scenario in report["scenarios"].items():
+        reference = baseline.get("scenarios", {}).get(name)
+        if not reference:
+            continue
+        for endpoint, stats in scenario["endpoints"].items():
+            before = reference["endpoints"].get(endpoint)
+            if not before:
+                continue
+            p95, p95_before = stats["latency_ms"]["p95"], before["latency_ms"]["p95"]
+            if p95_before and p95 > p95_before * (1 + threshold) and p95 - p95_before >= min_delta_ms:
+                regressions.append(f"{name} {endpoint} : p95 {p95_before} → {p95} ms")
+            queries, queries_before = stats["queries_per_request"]["mean"], before["queries_per_request"]["mean"]
+            if queries > queries_before:
+                regressions.append(f"{name} {endpoint} : requêtes SQL {queries_before} → {queries}")
+            if stats["errors"] > before["errors"]:
+                regressions.append(f"{name} {endpoint} : erreurs {before['errors']} → {stats['errors']}")
+    return regressions
+
+
+async def run(args: argparse.Namespace) -> int:
+    """Démarre le faux serveur SMTP, configure l'environnement puis lance le banc"""
+    smtp = FakeSMTPServer(latency=args.smtp_latency)
+    await smtp.start()
+    configure_environment(args, smtp.port)
+    try:
+        return await run_benchmark(args, smtp)
+    finally:
+        await smtp.stop()
+
+
+async def run_benchmark(args: argparse.Namespace, smtp: FakeSMTPServer) -> int:
+    # Import après la configuration : database.py et email_service.py lisent l'environnement
+    import httpx
+    import main
+    from database import async_engine
+    from email_service import close_smtp_pool
+    from benchmarks import seed
+    from benchmarks.metrics import Recorder, install_query_counter
+    from benchmarks.scenarios import SCENARIOS, BenchmarkContext
+
+    logging.getLogger().setLevel(logging.WARNING)
+    names = list(SCENARIOS) if args.scenarios == "all" else [name.strip() for name in args.scenarios.split(",")]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print(f"❌ Scénario(s) inconnu(s) : {', '.join(unknown)} (disponibles : {', '.join(SCENARIOS)})")
+        return 2
+
+    if args.reset:
+        seed.reset_database()
+    elif not seed.database_is_empty():
+        print("❌ La base contient déjà des parties : utilisez une base dédiée au banc ou --reset")
+        return 2
+    print(f"🌱 Génération du jeu de données ({args.profile})...")
+    dataset = await seed.seed(args.profile, args.seed)
+    print(f"   {', '.join(f'{count} {name}' for name, count in dataset.items())}")
+
+    install_query_counter(async_engine)
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "database": async_engine.dialect.name,
+            "profile": args.profile,
+            "seed": args.seed,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+        },
+        "dataset": dataset,
+        "scenarios": {},
+    }
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        login = await client.post("/api/auth/login", json={
+            "username": main.ADMIN_USERNAME, "password": main.ADMIN_PASSWORD
+        })
+        login.raise_for_status()
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        context = BenchmarkContext(client, headers, smtp, args.requests, args.concurrency, args.seed)
+        await context.load()
+        for name in names:
+            print(f"🏃 {name}...")
+            recorder = Recorder()
+            await SCENARIOS[name](context, recorder)
+            recorder.stop()
+            report["scenarios"][name] = recorder.summary()
+
+    await close_smtp_pool()
+    await async_engine.dispose()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2, ensure_ascii=False)
+        print(f"\n💾 Rapport enregistré : {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as reference:
+            regressions = compare_reports(report, json.load(reference), args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n❌ {len(regressions)} régression(s) par rapport à {args.compare} :")
+            for regression in regressions:
+                print(f"   - {regression}")
+            return 1
+        print(f"\n✅ Aucune régression par rapport à {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run(parse_args(sys.argv[1:]))))
@@ -0,0 +1,208 @@
+"""
+Scénarios du banc de mesure
+
+Chaque scénario simule `requests` utilisateurs (visiteurs, admins, postes
+d'accueil), dont `concurrency` à la fois, et enregistre chaque appel sous la
+clé "MÉTHODE /chemin/{param}" pour regrouper les mesures par endpoint.
+"""
+from typing import Awaitable, Callable, Dict, List
+import asyncio
+import random
+import time
+
+import httpx
+from sqlalchemy import delete, func, select, update
+
+from database import AsyncSessionLocal
+from email_queue import process_email_batch
+from models import EmailOutbox, Game, PaymentType, Registration
+from scheduler import send_automatic_reminders_job
+
+from benchmarks.fake_smtp import FakeSMTPServer
+from benchmarks.metrics import Recorder
+
+
+class BenchmarkContext:
+    """Paramètres et données partagés par les scénarios"""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        admin_headers: Dict[str, str],
+        smtp: FakeSMTPServer,
+        requests: int,
+        concurrency: int,
+        seed: int
+    ):
+        self.client = client
+        self.admin_headers = admin_headers
+        self.smtp = smtp
+        self.requests = requests
+        self.concurrency = concurrency
+        self.rng = random.Random(seed)
+        self.game_id = None  # Partie à venir (inscriptions, accueil, rappels)
+        self.past_game_ids: List[int] = []
+
+    async def load(self):
+        async with AsyncSessionLocal() as db:
+            self.game_id = await db.scalar(
+                select(Game.id).where(Game.is_closed == False).order_by(Game.date, Game.id).limit(1)
+            )
+            self.past_game_ids = list((await db.scalars(
+                select(Game.id).where(Game.is_closed == True).order_by(Game.date.desc()).limit(20)
+            )).all())
+
+
+async def run_users(count: int, concurrency: int, user: Callable[[int], Awaitable[None]]):
+    """Lance `count` utilisateurs simulés, au plus `concurrency` en même temps"""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def limited(index: int):
+        async with semaphore:
+            await user(index)
+
+    await asyncio.gather(*(limited(index) for index in range(count)))
+
+
+async def registration_spike(ctx: BenchmarkContext, recorder: Recorder):
+    """Ouverture des inscriptions : page publique puis formulaire, quelques candidatures"""
+    client = ctx.client
+    run_id = ctx.rng.randrange(1_000_000)
+
+    async def visitor(index: int):
+        await recorder.measure("GET /api/games/active", lambda: client.get("/api/games/active"))
+        await recorder.measure("GET /api/settings", lambda: client.get("/api/settings"))
+        await recorder.measure("GET /api/rules", lambda: client.get("/api/rules"))
+        if index % 20 == 19:
+            await recorder.measure("POST /api/membership-applications", lambda: client.post(
+                "/api/membership-applications", json={
+                    "first_name": "Camille", "last_name": f"Rush{index}",
+                    "address": "1 rue du Terrain, 42000 Saint-Étienne",
+                    "email": f"candidat-{run_id}-{index}@example.com", "phone": "0700000000",
+                    "airsoft_experience": "1 an", "motivation": "Participer aux parties de l'association."
+                }
+            ))
+            return
+        association = ["LSPA", "Red Fox", None, None][index % 4]
+        await recorder.measure("POST /api/registrations", lambda: client.post(
+            "/api/registrations", json={
+                "first_name": "Sam", "last_name": f"Rush{index}", "nickname": f"R{index}",
+                "email": f"rush-{run_id}-{index}@example.com", "phone": "0600000000",
+                "attendance_type": "full_day" if index % 3 else "morning",
+                "has_association": association is not None, "association_name": association
+            }
+        ))
+
+    await run_users(ctx.requests, ctx.concurrency, visitor)
+
+
+async def dashboard(ctx: BenchmarkContext, recorder: Recorder):
+    """Chargement du tableau de bord admin (listes, compteurs, file d'emails)"""
+    client, headers = ctx.client, ctx.admin_headers
+    past_games = ctx.past_game_ids or [ctx.game_id]
+
+    async def admin(index: int):
+        game_id = past_games[index % len(past_games)]
+        calls = [
+            ("GET /api/games", "/api/games"),
+            ("GET /api/games/{game_id}/registrations", f"/api/games/{ctx.game_id}/registrations"),
+            ("GET /api/games/{game_id}/registrations", f"/api/games/{game_id}/registrations"),
+            ("GET /api/registrations/pending", "/api/registrations/pending"),
+            ("GET /api/registrations/pending/count", "/api/registrations/pending/count"),
+            ("GET /api/membership-applications", "/api/membership-applications?status=pending"),
+            ("GET /api/membership-applications/pending/count", "/api/membership-applications/pending/count"),
+            ("GET /api/nfc-tags", "/api/nfc-tags"),
+            ("GET /api/payment-types", "/api/payment-types"),
+            ("GET /api/email-queue", "/api/email-queue"),
+            ("GET /api/games/{game_id}/reminders", f"/api/games/{ctx.game_id}/reminders"),
+        ]
+        for name, url in calls:
+            await recorder.measure(name, lambda: client.get(url, headers=headers))
+
+    await run_users(ctx.requests, ctx.concurrency, admin)
+
+
+async def statistics(ctx: BenchmarkContext, recorder: Recorder):
+    """Statistiques globales et par partie, avec un export de temps en temps"""
+    client, headers = ctx.client, ctx.admin_headers
+
+    async def admin(index: int):
+        await recorder.measure("GET /api/statistics", lambda: client.get("/api/statistics", headers=headers))
+        await recorder.measure("GET /api/statistics/by-game", lambda: client.get(
+            "/api/statistics/by-game?limit=20", headers=headers
+        ))
+        if index % 10 == 0:
+            await recorder.measure("GET /api/statistics/by-game/export", lambda: client.get(
+                "/api/statistics/by-game/export?format=csv", headers=headers
+            ))
+            await recorder.measure("GET /api/games/{game_id}/registrations/export", lambda: client.get(
+                f"/api/games/{ctx.game_id}/registrations/export?format=csv", headers=headers
+            ))
+
+    await run_users(ctx.requests, ctx.concurrency, admin)
+
+
+async def checkin(ctx: BenchmarkContext, recorder: Recorder):
+    """Accueil le jour de la partie : présence, bracelet et paiement de chaque joueur"""
+    client, headers = ctx.client, ctx.admin_headers
+    async with AsyncSessionLocal() as db:
+        players = list((await db.scalars(select(Registration.id).where(
+            Registration.game_id == ctx.game_id,
+            Registration.approval_status == "approved",
+            Registration.nfc_tag_id.is_(None)
+        ).order_by(Registration.id).limit(ctx.requests))).all())
+        payment_type_id = await db.scalar(select(PaymentType.id).order_by(PaymentType.id).limit(1))
+
+    async def station(index: int):
+        registration_id = players[index]
+        await recorder.measure("PATCH /api/registrations/{registration_id}/attendance", lambda: client.patch(
+            f"/api/registrations/{registration_id}/attendance", json={"was_present": True}, headers=headers
+        ))
+        await recorder.measure("POST /api/registrations/{registration_id}/nfc-tag/auto", lambda: client.post(
+            f"/api/registrations/{registration_id}/nfc-tag/auto", headers=headers
+        ))
+        await recorder.measure("PATCH /api/registrations/{registration_id}/payment-type", lambda: client.patch(
+            f"/api/registrations/{registration_id}/payment-type", json={"payment_type_id": payment_type_id}, headers=headers
+        ))
+
+    await run_users(len(players), ctx.concurrency, station)
+    await recorder.measure("POST /api/games/{game_id}/nfc-tags/auto-assign", lambda: client.post(
+        f"/api/games/{ctx.game_id}/nfc-tags/auto-assign", headers=headers
+    ))
+
+
+async def reminders(ctx: BenchmarkContext, recorder: Recorder):
+    """Rappels automatiques de la partie à venir : job planifié puis envoi par le worker d'emails"""
+    async with AsyncSessionLocal() as db:
+        # Repartir d'une partie sans rappel pour que chaque exécution mesure le même travail
+        await db.execute(update(Game).where(Game.id == ctx.game_id).values(reminder_sent=False))
+        await db.execute(delete(EmailOutbox).where(EmailOutbox.dedupe_key.like(f"reminder:{ctx.game_id}:%")))
+        await db.commit()
+
+    await recorder.measure_task("JOB send_automatic_reminders", send_automatic_reminders_job)
+
+    messages_before = ctx.smtp.messages
+    started = time.perf_counter()
+    while True:
+        async with AsyncSessionLocal() as db:
+            pending = await db.scalar(select(func.count(EmailOutbox.id)).where(EmailOutbox.status == "pending"))
+        if not pending:
+            break
+        processed = await recorder.measure_task("WORKER process_email_batch", process_email_batch)
+        if not processed:
+            break  # Emails en attente d'un nouvel essai : hors du périmètre de la mesure
+
+    duration = time.perf_counter() - started
+    sent = ctx.smtp.messages - messages_before
+    recorder.extra["emails_sent"] = sent
+    recorder.extra["emails_per_s"] = round(sent / duration, 2) if duration > 0 else 0.0
+
+
+# Ordre d'exécution par défaut, celui d'une semaine de partie
+SCENARIOS = {
+    "registration_spike": registration_spike,
+    "dashboard": dashboard,
+    "statistics": statistics,
+    "checkin": checkin,
+    "reminders": reminders,
+}
@@ -0,0 +1,177 @@
+"""
+Jeu de données synthétique du banc de mesure
+
+Génère, de façon reproductible (graine fixe), des saisons de parties passées
+(une par semaine) avec leurs inscriptions, présences, paiements et rappels
+envoyés, la partie à venir dans 2 jours (ouverte aux inscriptions, dans la
+fenêtre des rappels), des tags NFC et des candidatures d'adhésion.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List
+import json
+import random
+
+from sqlalchemy import func, insert, select
+
+from database import AsyncSessionLocal, Base, engine
+from game_stats import rebuild_game_stats
+from models import (
+    EmailOutbox, Game, MembershipApplication, NFCTag, PartnerAssociation,
+    PaymentType, PricingSettings, Registration
+)
+
+# Volumes par profil
+PROFILES = {
+    "small": {"seasons": 1, "games_per_season": 10, "registrations_per_game": 40, "tags": 100, "applications": 50},
+    "season": {"seasons": 3, "games_per_season": 26, "registrations_per_game": 120, "tags": 300, "applications": 400},
+    "large": {"seasons": 5, "games_per_season": 52, "registrations_per_game": 250, "tags": 600, "applications": 2000},
+}
+
+PAYMENT_TYPES = [("Espèces", True), ("Carte", True), ("Virement", True), ("Gratuité", False)]
+PARTNER_ASSOCIATIONS = ["LSPA", "Team Delta", "Les Sangliers", "Airsoft 42", "Black Wolves"]
+OTHER_ASSOCIATIONS = ["Red Fox", "Phoenix", "Les Ombres", "Team Alpha", "Nomades", "Vipères", "Spectre"]
+FIRST_NAMES = ["Lucas", "Hugo", "Léa", "Louis", "Emma", "Jules", "Chloé", "Noah", "Manon", "Arthur", "Inès", "Tom"]
+LAST_NAMES = ["Martin", "Bernard", "Dubois", "Thomas", "Robert", "Richard", "Petit", "Durand", "Leroy", "Moreau"]
+
+INSERT_BATCH_SIZE = 1000
+
+
+def database_is_empty() -> bool:
+    """Aucune partie ni inscription : la base peut recevoir le jeu de données"""
+    with engine.connect() as conn:
+        return not conn.scalar(select(func.count(Game.id))) and not conn.scalar(select(func.count(Registration.id)))
+
+
+def reset_database():
+    """Supprime et recrée toutes les tables"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+
+def _insert_rows(conn, table, rows: List[Dict]):
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        conn.execute(insert(table), rows[start:start + INSERT_BATCH_SIZE])
+
+
+def _player(rng: random.Random, index: int) -> Dict:
+    first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    association = None
+    if rng.random() < 0.45:
+        association = rng.choice(PARTNER_ASSOCIATIONS if rng.random() < 0.6 else OTHER_ASSOCIATIONS)
+    return {
+        "first_name": first_name,
+        "last_name": f"{last_name}{index}",
+        "nickname": f"{first_name[:3]}{index}",
+        "email": f"joueur{index}@example.com",
+        "phone": f"06{index:08d}"[:10],
+        "attendance_type": "full_day" if rng.random() < 0.7 else "morning",
+        "has_association": association is not None,
+        "association_name": association,
+        "bb_weight_rifle": rng.choice(["0.25", "0.28", "0.30"]),
+        "has_second_rifle": False,
+    }
+
+
+def _generate(conn, rng: random.Random, profile: Dict) -> Dict:
+    today = date.today()
+    _insert_rows(conn, PricingSettings, [{"partner_association_price": 5, "other_association_price": 7, "freelance_price": 9}])
+    _insert_rows(conn, PaymentType, [{"name": name, "generates_cost": cost, "is_active": True} for name, cost in PAYMENT_TYPES])
+    _insert_rows(conn, PartnerAssociation, [{"name": name, "is_active": True} for name in PARTNER_ASSOCIATIONS])
+    payment_type_ids = list(conn.scalars(select(PaymentType.id).order_by(PaymentType.id)))
+
+    _insert_rows(conn, NFCTag, [
+        {"tag_number": f"LT-{number:04d}", "is_available": True, "is_active": number % 50 != 0}
+        for number in range(1, profile["tags"] + 1)
+    ])
+
+    # Parties passées (une par semaine, clôturées) puis la partie à venir et les suivantes
+    past_games = profile["seasons"] * profile["games_per_season"]
+    _insert_rows(conn, Game, [
+        {
+            "date": today - timedelta(days=7 * week), "name": f"Partie S{week}",
+            "is_active": False, "is_closed": True, "reminder_sent": True
+        }
+        for week in range(past_games, 0, -1)
+    ] + [
+        {
+            "date": today + timedelta(days=2 + 7 * week), "name": f"Partie à venir {week + 1}",
+            "is_active": True, "is_closed": False, "reminder_sent": False
+        }
+        for week in range(3)
+    ])
+    games = conn.execute(select(Game.id, Game.date, Game.is_closed).order_by(Game.date)).all()
+
+    player_index = 0
+    registrations = []
+    for game in games:
+        upcoming = not game.is_closed
+        if game.date > today + timedelta(days=2):
+            continue  # Parties suivantes : pas encore d'inscriptions
+        count = max(1, int(profile["registrations_per_game"] * rng.uniform(0.7, 1.3)))
+        for _ in range(count):
+            player_index += 1
+            status = rng.choices(["approved", "rejected", "pending"], [85, 8, 7] if not upcoming else [60, 5, 35])[0]
+            confirmed = status == "approved" and rng.random() < (0.9 if not upcoming else 0.7)
+            present = None if upcoming or status != "approved" else confirmed and rng.random() < 0.9
+            paid = bool(present) and rng.random() < 0.95
+            registrations.append({
+                **_player(rng, player_index),
+                "game_id": game.id,
+                "approval_status": status,
+                "rejection_reason": "Complet" if status == "rejected" else None,
+                "confirmed": confirmed,
+                "was_present": present,
+                "payment_validated": paid,
+                "payment_type_id": rng.choice(payment_type_ids) if paid else None,
+                "created_at": datetime.combine(game.date, time(12)) - timedelta(days=rng.uniform(1, 20)),
+            })
+    _insert_rows(conn, Registration, registrations)
+
+    # Rappels déjà envoyés pour les parties passées
+    reminders = conn.execute(select(Registration.id, Registration.email, Registration.first_name, Game.id, Game.date).join(Game).where(
+        Game.is_closed == True, Registration.confirmed == True
+    )).all()
+    _insert_rows(conn, EmailOutbox, [
+        {
+            "kind": "reminder", "recipient": email,
+            "payload": json.dumps({"first_name": first_name, "game_date": game_date.isoformat()}),
+            "dedupe_key": f"reminder:{game_id}:{registration_id}:auto", "registration_id": registration_id,
+            "status": "sent", "attempts": 1,
+            "next_attempt_at": datetime.combine(game_date, time(9)) - timedelta(days=2),
+            "sent_at": datetime.combine(game_date, time(9)) - timedelta(days=2),
+        }
+        for registration_id, email, first_name, game_id, game_date in reminders
+    ])
+
+    _insert_rows(conn, MembershipApplication, [
+        {
+            "first_name": rng.choice(FIRST_NAMES), "last_name": f"{rng.choice(LAST_NAMES)}{index}",
+            "address": f"{index} rue du Terrain, 42000 Saint-Étienne", "email": f"candidat{index}@example.com",
+            "phone": f"07{index:08d}"[:10], "has_played_before": rng.random() < 0.6,
+            "airsoft_experience": rng.choice(["Débutant", "1 an", "3 ans", "Plus de 5 ans"]),
+            "motivation": "Rejoindre l'association et participer aux parties.",
+            "status": rng.choices(["pending", "approved", "rejected"], [30, 55, 15])[0],
+            "created_at": datetime.utcnow() - timedelta(days=rng.uniform(0, 365 * profile["seasons"])),
+        }
+        for index in range(1, profile["applications"] + 1)
+    ])
+
+    return {
+        "games": len(games),
+        "registrations": len(registrations),
+        "emails": len(reminders),
+        "tags": profile["tags"],
+        "applications": profile["applications"],
+    }
+
+
+async def seed(profile_name: str, seed_value: int) -> Dict:
+    """Remplit la base vide avec le profil demandé ; retourne les volumes créés"""
+    rng = random.Random(seed_value)
+    with engine.begin() as conn:
+        counts = _generate(conn, rng, PROFILES[profile_name])
+    # Compteurs précalculés des statistiques (game_stats)
+    async with AsyncSessionLocal() as db:
+        await rebuild_game_stats(db)
+        await db.commit()
+    return counts
@@ -0,0 +1,167 @@
+"""
+Traitement des inscriptions par lot
+Applique une même opération (approbation, refus, présence, paiement, type de
+paiement) à une liste d'inscriptions en une seule transaction : une lecture
+des inscriptions concernées, un UPDATE ... WHERE id IN (...), puis la mise en
+file des emails en une fois.
+"""
+from types import SimpleNamespace
+from typing import Dict, List, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from email_queue import enqueue_emails
+from game_stats import apply_contributions_delta, registration_contributions
+from models import Game, PaymentType, Registration
+from schemas import BulkRegistrationRequest
+
+# Opérations réservées aux inscriptions en attente de validation
+APPROVAL_ACTIONS = {"approve", "reject"}
+
+
+# Opérations qui modifient les statistiques des parties
+STATS_ACTIONS = {"attendance", "payment_type"}
+
+# Champs des inscriptions qui déterminent leur contribution aux statistiques
+STATS_COLUMNS = (
+    Registration.game_id, Registration.attendance_type, Registration.confirmed, Registration.was_present,
+    Registration.payment_type_id, Registration.has_association, Registration.association_name,
+)
+
+
+def _update_values(request: BulkRegistrationRequest) -> Dict:
+    """Colonnes modifiées par l'opération"""
+    if request.action == "approve":
+        return {"approval_status": "approved"}
+    if request.action == "reject":
+        return {"approval_status": "rejected", "rejection_reason": request.rejection_reason}
+    if request.action == "attendance":
+        return {"was_present": request.was_present}
+    if request.action == "payment":
+        return {"payment_validated": request.payment_validated}
+    # payment_type : payment_validated conservé pour compatibilité
+    return {
+        "payment_type_id": request.payment_type_id,
+        "payment_validated": request.payment_type_id is not None
+    }
+
+
+async def _update_game_stats(db: AsyncSession, rows: List, request: BulkRegistrationRequest):
+    """Applique aux statistiques la contribution des inscriptions modifiées (avant/après)"""
+    values = _update_values(request)
+    before = await registration_contributions(db, rows)
+    after = await registration_contributions(db, [
+        SimpleNamespace(**{**row._asdict(), **values}) for row in rows
+    ])
+    await apply_contributions_delta(db, before, after)
+
+
+async def _validate_request(db: AsyncSession, request: BulkRegistrationRequest):
+    """Paramètres obligatoires de chaque opération (erreur pour tout le lot)"""
+    if request.action == "reject" and not request.rejection_reason:
+        raise HTTPException(status_code=400, detail="Le motif de refus est obligatoire")
+    if request.action == "attendance" and request.was_present is None:
+        raise HTTPException(status_code=400, detail="La présence (was_present) est obligatoire")
+    if request.action == "payment" and request.payment_validated is None:
+        raise HTTPException(status_code=400, detail="Le statut de paiement (payment_validated) est obligatoire")
+    if request.action == "payment_type" and request.payment_type_id is not None:
+        payment_type = await db.scalar(select(PaymentType).where(PaymentType.id == request.payment_type_id))
+        if not payment_type:
+            raise HTTPException(status_code=404, detail="Type de paiement non trouvé")
+        if not payment_type.is_active:
+            raise HTTPException(status_code=400, detail="Ce type de paiement est désactivé")
+
+
+def _approval_email(action: str, row, rejection_reason: str) -> Dict:
+    """Email d'approbation ou de refus d'une inscription"""
+    if action == "approve":
+        return {
+            "kind": "approval",
+            "recipient": row.email,
+            "payload": {"first_name": row.first_name, "game_date": row.game_date, "registration_id": row.id},
+            "dedupe_key": f"approval:{row.id}",
+            "registration_id": row.id
+        }
+    return {
+        "kind": "rejection",
+        "recipient": row.email,
+        "payload": {"first_name": row.first_name, "game_date": row.game_date, "rejection_reason": rejection_reason},
+        "dedupe_key": f"rejection:{row.id}",
+        "registration_id": row.id
+    }
+
+
+async def apply_bulk_action(db: AsyncSession, request: BulkRegistrationRequest) -> Tuple[List[Dict], Set[int]]:
+    """
+    Applique l'opération et met en file les emails, sans commit (fait par
+    l'appelant). Retourne (résultats par inscription, ids modifiés).
+    """
+    await _validate_request(db, request)
+    registration_ids = list(dict.fromkeys(request.registration_ids))
+
+    # 1 requête : état actuel des inscriptions (date de la partie pour les emails,
+    # champs des statistiques pour les compteurs), verrouillées jusqu'au commit
+    # pour que l'état "avant" des statistiques soit celui que le lot remplace
+    # (ordre des ids : pas d'interblocage entre deux lots)
+    rows = (await db.execute(
+        select(
+            Registration.id, Registration.approval_status, Registration.email,
+            Registration.first_name, Game.date.label("game_date"), *STATS_COLUMNS
+        ).outerjoin(Game, Game.id == Registration.game_id)
+        .where(Registration.id.in_(registration_ids))
+        .order_by(Registration.id)
+        .with_for_update(of=Registration)
+    )).all()
+    rows_by_id = {row.id: row for row in rows}
+
+    # Comme l'endpoint unitaire, approbation et refus exigent que la partie
+    # existe encore (sa date figure dans l'email)
+    game_missing = {
+        row.id for row in rows
+        if request.action in APPROVAL_ACTIONS and row.game_date is None
+    }
+    eligible = [
+        registration_id for registration_id in registration_ids
+        if registration_id in rows_by_id and registration_id not in game_missing
+        and (request.action not in APPROVAL_ACTIONS or rows_by_id[registration_id].approval_status == "pending")
+    ]
+
+    # 1 requête : mise à jour du lot ; la condition sur le statut protège d'un
+    # traitement concurrent entre la lecture et l'écriture
+    updated_ids: Set[int] = set()
+    if eligible:
+        statement = update(Registration).where(Registration.id.in_(eligible))
+        if request.action in APPROVAL_ACTIONS:
+            statement = statement.where(Registration.approval_status == "pending")
+        updated_ids = set((await db.execute(
+            statement.values(**_update_values(request))
+            .returning(Registration.id)
+            .execution_options(synchronize_session=False)
+        )).scalars().all())
+
+    if request.action in STATS_ACTIONS and updated_ids:
+        await _update_game_stats(db, [rows_by_id[registration_id] for registration_id in updated_ids], request)
+
+    if request.action in APPROVAL_ACTIONS and updated_ids:
+        await enqueue_emails(db, [
+            _approval_email(request.action, rows_by_id[registration_id], request.rejection_reason)
+            for registration_id in registration_ids if registration_id in updated_ids
+        ])
+
+    results = []
+    for registration_id in registration_ids:
+        if registration_id in updated_ids:
+            results.append({"registration_id": registration_id, "status": "updated"})
+        elif registration_id not in rows_by_id:
+            results.append({"registration_id": registration_id, "status": "not_found", "detail": "Inscription non trouvée"})
+        elif registration_id in game_missing:
+            results.append({"registration_id": registration_id, "status": "game_not_found", "detail": "Partie non trouvée"})
+        else:
+            results.append({
+                "registration_id": registration_id,
+                "status": "not_pending",
+                "detail": "Cette inscription n'est pas en attente de validation"
+            })
+    return results, updated_ids
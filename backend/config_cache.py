@@ -0,0 +1,237 @@
+"""
+Cache en mémoire des lignes de configuration uniques
+SiteSettings, Rules et PricingSettings (ainsi que le contexte de tarification)
+sont lus à chaque requête publique mais ne changent que sur action d'un admin.
+Ils sont chargés une fois, conservés sous forme de schémas Pydantic (copies
+détachées de toute session), et invalidés par les endpoints de modification.
+
+Avec plusieurs workers uvicorn sur PostgreSQL, l'invalidation est diffusée
+par NOTIFY sur le canal config_cache ; chaque worker l'écoute (LISTEN) et vide
+les entrées concernées. CONFIG_CACHE_TTL borne dans tous les cas la durée de
+vie d'une entrée.
+
+Le même canal révoque les tokens admin en cache (auth.admin_token_cache)
+sur tous les workers après un changement de mot de passe. La connexion
+d'écoute sert aussi aux autres modules qui diffusent entre workers
+(listen / notify, ex. live_events.py).
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+import asyncio
+import logging
+import os
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from auth import admin_token_cache
+from database import async_engine, connect_dedicated
+from models import SiteSettings, Rules
+from schemas import SiteSettingsResponse, RulesResponse
+
+logger = logging.getLogger(__name__)
+
+CONFIG_CACHE_TTL = float(os.getenv("CONFIG_CACHE_TTL", 300))  # Durée de vie maximale d'une entrée (secondes)
+CONFIG_CACHE_NOTIFY = os.getenv("CONFIG_CACHE_NOTIFY", "true").lower() == "true"  # Diffusion LISTEN/NOTIFY (PostgreSQL)
+NOTIFY_CHANNEL = "config_cache"
+
+# Clés du cache
+SITE_SETTINGS = "site_settings"
+RULES = "rules"
+PRICING_SETTINGS = "pricing_settings"
+PRICING_CONTEXT = "pricing_context"
+ADMIN_TOKENS = "admin_tokens"  # Tokens admin vérifiés (cache de auth.py), vidés en entier sur les autres workers
+
+T = TypeVar("T")
+
+_listener_task: Optional[asyncio.Task] = None
+_listener_stop: Optional[asyncio.Event] = None
+
+# Autres canaux écoutés sur la même connexion : canal -> (handler(payload), on_reconnect)
+_channel_handlers: Dict[str, Tuple[Callable[[str], None], Optional[Callable[[], None]]]] = {}
+
+
+class ConfigCache:
+    """Cache clé -> valeur avec durée de vie et invalidation explicite"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[Any, float]] = {}
+        self._versions: Dict[str, int] = {}
+
+    async def get(self, key: str, db: AsyncSession, loader: Callable[[AsyncSession], Awaitable[T]]) -> T:
+        """Retourne la valeur en cache, ou la charge avec `loader` si absente ou expirée"""
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() < entry[1]:
+            return entry[0]
+
+        version = self._versions.get(key, 0)
+        value = await loader(db)
+        # Une invalidation pendant le chargement rend la valeur lue potentiellement obsolète
+        if self.ttl > 0 and self._versions.get(key, 0) == version:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+        return value
+
+    def invalidate(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def clear(self):
+        self.invalidate(*list(self._entries))
+
+
+config_cache = ConfigCache(CONFIG_CACHE_TTL)
+
+
+def notify_enabled() -> bool:
+    """Diffusion entre workers disponible (PostgreSQL et CONFIG_CACHE_NOTIFY)"""
+    return CONFIG_CACHE_NOTIFY and async_engine.dialect.name == "postgresql"
+
+
+def listen(channel: str, handler: Callable[[str], None], on_reconnect: Optional[Callable[[], None]] = None):
+    """
+    Écoute un canal NOTIFY supplémentaire (à appeler avant start_config_listener).
+    on_reconnect est appelé à chaque (re)connexion : des messages ont pu être manqués.
+    """
+    _channel_handlers[channel] = (handler, on_reconnect)
+
+
+async def notify(channel: str, payload: str):
+    """Publie un message NOTIFY (hors transaction en cours) ; lève l'erreur en cas d'échec"""
+    async with async_engine.begin() as conn:
+        await conn.execute(select(func.pg_notify(channel, payload)))
+
+
+async def invalidate_config(*keys: str):
+    """
+    Invalide des entrées du cache après modification (à appeler après le commit)
+    et prévient les autres workers par NOTIFY.
+    """
+    config_cache.invalidate(*keys)
+    await _broadcast(keys)
+
+
+async def invalidate_admin_tokens(username: str):
+    """
+    Révoque les tokens en cache d'un administrateur (changement de mot de passe,
+    à appeler après le commit). Les autres workers vident tout leur cache de
+    tokens : les tokens encore valides y sont simplement revérifiés.
+    """
+    admin_token_cache.invalidate_user(username)
+    await _broadcast([ADMIN_TOKENS])
+
+
+async def _broadcast(keys):
+    if not notify_enabled():
+        return
+    try:
+        await notify(NOTIFY_CHANNEL, ",".join(keys))
+    except Exception as e:
+        logger.error(f"❌ Diffusion de l'invalidation du cache impossible: {e}")
+
+
+async def _load_site_settings(db: AsyncSession) -> SiteSettingsResponse:
+    settings = await db.scalar(select(SiteSettings).limit(1))
+    if not settings:
+        # Créer les paramètres par défaut si ils n'existent pas
+        settings = SiteSettings(
+            site_title="Bienvenue sur le terrain de la LSPA",
+            primary_color="#4CAF50"
+        )
+        db.add(settings)
+        await db.commit()
+        await db.refresh(settings)
+    return SiteSettingsResponse.model_validate(settings)
+
+
+async def _load_rules(db: AsyncSession) -> RulesResponse:
+    rules = await db.scalar(select(Rules).limit(1))
+    if not rules:
+        # Créer les règles par défaut si elles n'existent pas
+        rules = Rules()
+        db.add(rules)
+        await db.commit()
+        await db.refresh(rules)
+    return RulesResponse.model_validate(rules)
+
+
+async def get_cached_site_settings(db: AsyncSession) -> SiteSettingsResponse:
+    """Paramètres du site (créés avec les valeurs par défaut si absents)"""
+    return await config_cache.get(SITE_SETTINGS, db, _load_site_settings)
+
+
+async def get_cached_rules(db: AsyncSession) -> RulesResponse:
+    """Règles du terrain (créées vides si absentes)"""
+    return await config_cache.get(RULES, db, _load_rules)
+
+
+def _on_notification(connection, pid, channel, payload):
+    keys = [key for key in payload.split(",") if key]
+    if ADMIN_TOKENS in keys:
+        admin_token_cache.clear()
+        keys.remove(ADMIN_TOKENS)
+    config_cache.invalidate(*keys)
+
+
+def _channel_callback(handler: Callable[[str], None]):
+    def callback(connection, pid, channel, payload):
+        try:
+            handler(payload)
+        except Exception as e:
+            logger.error(f"❌ Message NOTIFY invalide sur {channel}: {e}")
+    return callback
+
+
+async def _listen_loop():
+    """Écoute les invalidations des autres workers, avec reconnexion automatique"""
+    while not _listener_stop.is_set():
+        conn = None
+        try:
+            conn = await connect_dedicated("config-cache")
+            await conn.add_listener(NOTIFY_CHANNEL, _on_notification)
+            for channel, (handler, _) in _channel_handlers.items():
+                await conn.add_listener(channel, _channel_callback(handler))
+            # Des invalidations ont pu être manquées pendant la déconnexion
+            config_cache.clear()
+            admin_token_cache.clear()
+            for _, on_reconnect in _channel_handlers.values():
+                if on_reconnect is not None:
+                    on_reconnect()
+            logger.info("✅ Écoute des invalidations du cache de configuration")
+            while not _listener_stop.is_set() and not conn.is_closed():
+                try:
+                    await asyncio.wait_for(_listener_stop.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    pass
+        except Exception as e:
+            logger.error(f"❌ Écoute des invalidations du cache interrompue: {e}")
+            try:
+                await asyncio.wait_for(_listener_stop.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                pass
+        finally:
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+
+
+def start_config_listener():
+    """Démarre l'écoute LISTEN/NOTIFY (sans effet hors PostgreSQL)"""
+    global _listener_task, _listener_stop
+    if not notify_enabled() or (_listener_task is not None and not _listener_task.done()):
+        return
+    _listener_stop = asyncio.Event()
+    _listener_task = asyncio.get_running_loop().create_task(_listen_loop())
+
+
+async def stop_config_listener():
+    """Arrête l'écoute des invalidations"""
+    global _listener_task
+    if _listener_task is None:
+        return
+    _listener_stop.set()
+    try:
+        await asyncio.wait_for(_listener_task, timeout=5)
+    except asyncio.TimeoutError:
+        _listener_task.cancel()
+    _listener_task = None
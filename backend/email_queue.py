@@ -0,0 +1,316 @@
+"""
+File d'attente persistante des emails sortants (outbox)
+Les endpoints enregistrent les emails dans la table email_outbox, dans la même
+transaction que la modification métier, et rendent la main immédiatement.
+Un worker asynchrone, démarré avec le scheduler, envoie les emails par lots
+avec un nouvel essai à délai exponentiel en cas d'échec.
+"""
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+
+from sqlalchemy import select, func, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal, async_engine
+from models import EmailOutbox
+from email_service import dispatch_emails, email_subject, render_email_batch, EMAIL_TEMPLATES
+
+logger = logging.getLogger(__name__)
+
+EMAIL_QUEUE_BATCH_SIZE = int(os.getenv("EMAIL_QUEUE_BATCH_SIZE", 50))  # Emails traités par lot
+EMAIL_QUEUE_POLL_INTERVAL = float(os.getenv("EMAIL_QUEUE_POLL_INTERVAL", 10))  # Secondes entre deux relèves si la file est vide
+EMAIL_QUEUE_MAX_ATTEMPTS = int(os.getenv("EMAIL_QUEUE_MAX_ATTEMPTS", 6))  # Essais avant abandon
+EMAIL_QUEUE_RETRY_BASE = float(os.getenv("EMAIL_QUEUE_RETRY_BASE", 30))  # Délai du premier nouvel essai (secondes), doublé à chaque échec
+EMAIL_QUEUE_RETRY_MAX = float(os.getenv("EMAIL_QUEUE_RETRY_MAX", 3600))  # Délai maximal entre deux essais (secondes)
+EMAIL_QUEUE_LEASE = float(os.getenv("EMAIL_QUEUE_LEASE", 300))  # Durée du verrou d'un email en cours d'envoi (secondes)
+
+_worker_task: Optional[asyncio.Task] = None
+_wakeup: Optional[asyncio.Event] = None
+_stopping = False
+
+
+def _json_default(value):
+    """Sérialise les dates du payload en ISO 8601"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Type non sérialisable : {type(value)}")
+
+
+def _load_payload(entry: EmailOutbox) -> Dict:
+    """Relit le payload JSON d'un email de la file"""
+    params = json.loads(entry.payload)
+    if "game_date" in params:
+        params["game_date"] = date.fromisoformat(params["game_date"])
+    return params
+
+
+def render_entries(entries: List[EmailOutbox]) -> Dict[int, tuple]:
+    """
+    Construit (destinataire, sujet, contenu HTML) pour chaque email, par type :
+    un lot de rappels partage la mise en page déjà rendue.
+    Retourne {id: message} ou {id: exception} si le payload est invalide.
+    """
+    rendered = {}
+    by_kind: Dict[str, List[EmailOutbox]] = {}
+    for entry in entries:
+        by_kind.setdefault(entry.kind, []).append(entry)
+
+    for kind, kind_entries in by_kind.items():
+        valid, contexts = [], []
+        for entry in kind_entries:
+            try:
+                contexts.append(_load_payload(entry))
+                valid.append(entry)
+            except Exception as e:
+                rendered[entry.id] = e
+        try:
+            bodies = render_email_batch(kind, contexts)
+        except Exception:
+            # Un payload invalide fait échouer le lot : on isole l'email fautif
+            bodies = []
+            for context in contexts:
+                try:
+                    bodies.append(render_email_batch(kind, [context])[0])
+                except Exception as e:
+                    bodies.append(e)
+        for entry, body in zip(valid, bodies):
+            if isinstance(body, Exception):
+                rendered[entry.id] = body
+            else:
+                rendered[entry.id] = (entry.recipient, email_subject(kind), body)
+    return rendered
+
+
+def _insert_outbox():
+    """INSERT avec clause ON CONFLICT selon la base"""
+    if async_engine.dialect.name == "postgresql":
+        return postgresql.insert(EmailOutbox)
+    return sqlite.insert(EmailOutbox)
+
+
+async def enqueue_emails(db: AsyncSession, emails: List[Dict]) -> List[int]:
+    """
+    Ajoute des emails à la file, dans la transaction en cours (le commit est fait
+    par l'appelant). Chaque email est un dict {kind, recipient, payload,
+    dedupe_key, registration_id}. Les emails dont la clé de déduplication existe
+    déjà sont ignorés par la base (ON CONFLICT DO NOTHING), y compris quand deux
+    requêtes concurrentes ajoutent le même email. Une seule requête pour le lot.
+    Retourne les ids des emails réellement ajoutés.
+    """
+    now = datetime.utcnow()
+    rows, seen = [], set()
+    for email in emails:
+        dedupe_key = email.get("dedupe_key")
+        if dedupe_key:
+            if dedupe_key in seen:
+                continue
+            seen.add(dedupe_key)
+        if email["kind"] not in EMAIL_TEMPLATES:
+            raise ValueError(f"Type d'email inconnu : {email['kind']}")
+        rows.append({
+            "kind": email["kind"],
+            "recipient": email["recipient"],
+            "payload": json.dumps(email["payload"], default=_json_default),
+            "dedupe_key": dedupe_key,
+            "registration_id": email.get("registration_id"),
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+            "updated_at": now
+        })
+    if not rows:
+        return []
+
+    return list((await db.scalars(
+        _insert_outbox().values(rows)
+        .on_conflict_do_nothing(index_elements=[EmailOutbox.dedupe_key])
+        .returning(EmailOutbox.id)
+    )).all())
+
+
+async def enqueue_email(
+    db: AsyncSession,
+    kind: str,
+    recipient: str,
+    payload: Dict,
+    dedupe_key: Optional[str] = None,
+    registration_id: Optional[int] = None
+) -> Optional[int]:
+    """Ajoute un email à la file (voir enqueue_emails). Retourne son id, ou None si doublon."""
+    ids = await enqueue_emails(db, [{
+        "kind": kind,
+        "recipient": recipient,
+        "payload": payload,
+        "dedupe_key": dedupe_key,
+        "registration_id": registration_id
+    }])
+    return ids[0] if ids else None
+
+
+def notify_email_worker():
+    """Réveille le worker pour envoyer sans attendre la prochaine relève"""
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    """Délai exponentiel avant le prochain essai"""
+    return timedelta(seconds=min(EMAIL_QUEUE_RETRY_BASE * 2 ** (attempts - 1), EMAIL_QUEUE_RETRY_MAX))
+
+
+async def _claim_batch(db: AsyncSession) -> List[EmailOutbox]:
+    """
+    Réserve un lot d'emails à envoyer. Les lignes sont verrouillées avec
+    SKIP LOCKED pour que plusieurs workers puissent relever la file en parallèle ;
+    un email "sending" dont le verrou a expiré (worker arrêté ou planté pendant
+    l'envoi) est repris, et cet envoi interrompu compte comme un essai : un
+    email qui fait planter le worker finit abandonné.
+    """
+    now = datetime.utcnow()
+    entries = (await db.scalars(
+        select(EmailOutbox).where(
+            EmailOutbox.status.in_(["pending", "sending"]),
+            EmailOutbox.next_attempt_at <= now
+        ).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+        .limit(EMAIL_QUEUE_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+    )).all()
+
+    claimed = []
+    for entry in entries:
+        if entry.status == "sending":
+            entry.attempts = (entry.attempts or 0) + 1
+            if entry.attempts >= EMAIL_QUEUE_MAX_ATTEMPTS:
+                entry.status = "failed"
+                entry.last_error = "Envoi interrompu (verrou expiré) à chaque essai"
+                logger.error(f"✗ Email #{entry.id} ({entry.kind}) abandonné après {entry.attempts} envois interrompus")
+                continue
+        entry.status = "sending"
+        entry.next_attempt_at = now + timedelta(seconds=EMAIL_QUEUE_LEASE)
+        claimed.append(entry)
+    await db.commit()
+    return claimed
+
+
+async def process_email_batch() -> int:
+    """Envoie un lot d'emails de la file. Retourne le nombre d'emails traités."""
+    async with AsyncSessionLocal() as db:
+        entries = await _claim_batch(db)
+        if not entries:
+            return 0
+
+        # Construction des messages ; un payload invalide échoue définitivement
+        rendered = render_entries(entries)
+        to_send = []
+        for entry in entries:
+            message = rendered[entry.id]
+            if isinstance(message, Exception):
+                entry.status = "failed"
+                entry.last_error = f"Email invalide : {message}"
+                logger.error(f"✗ Email #{entry.id} invalide: {message}")
+            else:
+                to_send.append((entry, message))
+
+        results = await dispatch_emails([message for _, message in to_send])
+
+        now = datetime.utcnow()
+        for (entry, _), result in zip(to_send, results):
+            entry.attempts = (entry.attempts or 0) + 1
+            if result["sent"]:
+                entry.status = "sent"
+                entry.sent_at = now
+                entry.last_error = None
+            elif entry.attempts >= EMAIL_QUEUE_MAX_ATTEMPTS:
+                entry.status = "failed"
+                entry.last_error = result["error"]
+                logger.error(f"✗ Email #{entry.id} ({entry.kind}) abandonné après {entry.attempts} essais: {result['error']}")
+            else:
+                entry.status = "pending"
+                entry.last_error = result["error"]
+                entry.next_attempt_at = now + _retry_delay(entry.attempts)
+                logger.warning(f"⚠️  Email #{entry.id} ({entry.kind}) en échec, nouvel essai prévu: {result['error']}")
+        await db.commit()
+
+        sent = sum(1 for result in results if result["sent"])
+        logger.info(f"📧 File d'emails: {sent}/{len(entries)} envoyés")
+        return len(entries)
+
+
+async def _worker_loop():
+    """Boucle du worker : vide la file par lots, puis attend un réveil ou la prochaine relève"""
+    while not _stopping:
+        try:
+            processed = await process_email_batch()
+        except Exception as e:
+            logger.error(f"❌ Erreur du worker d'emails: {e}")
+            processed = 0
+
+        if processed or _stopping:
+            continue
+
+        _wakeup.clear()
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=EMAIL_QUEUE_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_email_worker():
+    """Démarre le worker d'envoi des emails (à appeler depuis la boucle d'événements)"""
+    global _worker_task, _wakeup, _stopping
+    if _worker_task is not None and not _worker_task.done():
+        return
+    _stopping = False
+    _wakeup = asyncio.Event()
+    _worker_task = asyncio.get_running_loop().create_task(_worker_loop())
+    logger.info("✅ Worker d'emails démarré")
+
+
+async def stop_email_worker(timeout: float = 10):
+    """Arrête le worker proprement (le lot en cours est terminé si possible)"""
+    global _worker_task, _stopping
+    if _worker_task is None:
+        return
+    _stopping = True
+    _wakeup.set()
+    done, _ = await asyncio.wait({_worker_task}, timeout=timeout)
+    if not done:
+        # Lot interrompu : les emails "sending" seront repris à l'expiration du verrou
+        _worker_task.cancel()
+        try:
+            await _worker_task
+        except asyncio.CancelledError:
+            pass
+        logger.warning(f"⚠️  Worker d'emails interrompu après {timeout} s d'attente")
+    _worker_task = None
+    logger.info("🛑 Worker d'emails arrêté")
+
+
+async def get_queue_status(db: AsyncSession, failures_limit: int = 20) -> Dict:
+    """Compteurs de la file par statut et derniers échecs (tableau de bord admin)"""
+    counts = dict((await db.execute(
+        select(EmailOutbox.status, func.count(EmailOutbox.id)).group_by(EmailOutbox.status)
+    )).all())
+
+    recent_failures = (await db.scalars(
+        select(EmailOutbox).where(
+            or_(
+                EmailOutbox.status == "failed",
+                (EmailOutbox.status == "pending") & (EmailOutbox.attempts > 0)
+            )
+        ).order_by(EmailOutbox.updated_at.desc()).limit(failures_limit)
+    )).all()
+
+    return {
+        "pending": counts.get("pending", 0),
+        "sending": counts.get("sending", 0),
+        "sent": counts.get("sent", 0),
+        "failed": counts.get("failed", 0),
+        "recent_failures": recent_failures
+    }
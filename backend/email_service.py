@@ -1,19 +1,169 @@
 import aiosmtplib
+import asyncio
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup
 import os
 
+from app_metrics import record_email_send
+
 SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
 SMTP_USER = os.getenv("SMTP_USER", "")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_START_TLS = os.getenv("SMTP_START_TLS", "true").lower() in ("1", "true", "yes")
 EMAIL_FROM = os.getenv("EMAIL_FROM", SMTP_USER)
 APP_URL = os.getenv("APP_URL", "http://localhost:3000")
 
+# Pool de connexions SMTP
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 3))  # Sessions SMTP simultanées max
+SMTP_POOL_IDLE_TIMEOUT = float(os.getenv("SMTP_POOL_IDLE_TIMEOUT", 30))  # Secondes avant de fermer une session inactive
+
+# Envois groupés (rappels)
+EMAIL_MAX_CONCURRENCY = int(os.getenv("EMAIL_MAX_CONCURRENCY", SMTP_POOL_SIZE))  # Envois simultanés max
+EMAIL_RATE_LIMIT = float(os.getenv("EMAIL_RATE_LIMIT", 5))  # Messages par seconde max et par processus (0 = illimité)
+
+# Erreurs après lesquelles la connexion est considérée comme perdue
+CONNECTION_ERRORS = (
+    aiosmtplib.SMTPServerDisconnected,
+    aiosmtplib.SMTPConnectError,
+    aiosmtplib.SMTPTimeoutError,
+    ConnectionError,
+    asyncio.TimeoutError,
+)
+
+
+class SMTPConnectionPool:
+    """
+    Pool de sessions SMTP authentifiées (connexion + STARTTLS + AUTH une seule fois)
+    réutilisées d'un message à l'autre. Le nombre de sessions ouvertes est borné
+    par `size` ; une session fermée par le serveur est recréée de façon transparente.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str],
+        password: Optional[str],
+        start_tls: bool,
+        size: int,
+        idle_timeout: float
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.start_tls = start_tls
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self._idle: List[Tuple[aiosmtplib.SMTP, float]] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bind_loop(self):
+        """Les connexions sont liées à une boucle d'événements : repartir de zéro si elle change"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._idle = []
+            self._semaphore = asyncio.Semaphore(self.size)
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        """Ouvre une nouvelle session SMTP authentifiée"""
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            start_tls=self.start_tls
+        )
+        await client.connect()
+        return client
+
+    async def _discard(self, client: aiosmtplib.SMTP):
+        """Ferme une session sans propager d'erreur"""
+        try:
+            if client.is_connected:
+                await client.quit()
+        except Exception:
+            client.close()
+
+    async def _acquire(self) -> Tuple[aiosmtplib.SMTP, bool]:
+        """Retourne une session (réutilisée si possible) et indique si elle a été réutilisée"""
+        now = time.monotonic()
+        while self._idle:
+            client, last_used = self._idle.pop()
+            if client.is_connected and now - last_used < self.idle_timeout:
+                return client, True
+            await self._discard(client)
+        return await self._connect(), False
 
-async def send_email(to_email: str, subject: str, html_content: str):
-    """Envoyer un email"""
+    async def send_message(self, message: MIMEMultipart):
+        """Envoie un message en réutilisant une session du pool (durée et résultat mesurés)"""
+        self._bind_loop()
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                await self._send_with_session(message)
+            except Exception:
+                record_email_send(time.perf_counter() - started, sent=False)
+                raise
+            record_email_send(time.perf_counter() - started, sent=True)
+
+    async def _send_with_session(self, message: MIMEMultipart):
+        """Envoi sur une session du pool (appelé sous le sémaphore)"""
+        client, reused = await self._acquire()
+        try:
+            await client.send_message(message)
+        except CONNECTION_ERRORS:
+            await self._discard(client)
+            if not reused:
+                raise
+            # Session inactive fermée par le serveur : on se reconnecte une fois
+            client = await self._connect()
+            try:
+                await client.send_message(message)
+            except Exception:
+                await self._discard(client)
+                raise
+        except Exception:
+            # Erreur propre au message (destinataire refusé...) : la session reste utilisable
+            try:
+                await client.rset()
+            except Exception:
+                await self._discard(client)
+                raise
+            self._idle.append((client, time.monotonic()))
+            raise
+        self._idle.append((client, time.monotonic()))
+
+    async def close(self):
+        """Ferme toutes les sessions inactives"""
+        idle, self._idle = self._idle, []
+        for client, _ in idle:
+            await self._discard(client)
+
+
+smtp_pool = SMTPConnectionPool(
+    hostname=SMTP_HOST,
+    port=SMTP_PORT,
+    username=SMTP_USER or None,
+    password=SMTP_PASSWORD or None,
+    start_tls=SMTP_START_TLS,
+    size=SMTP_POOL_SIZE,
+    idle_timeout=SMTP_POOL_IDLE_TIMEOUT
+)
+
+
+def build_message(to_email: str, subject: str, html_content: str) -> MIMEMultipart:
+    """Construire un email HTML"""
     message = MIMEMultipart("alternative")
     message["From"] = EMAIL_FROM
     message["To"] = to_email
@@ -21,350 +171,114 @@ async def send_email(to_email: str, subject: str, html_content: str):
     
     html_part = MIMEText(html_content, "html")
     message.attach(html_part)
-    
-    try:
-        await aiosmtplib.send(
-            message,
-            hostname=SMTP_HOST,
-            port=SMTP_PORT,
-            username=SMTP_USER,
-            password=SMTP_PASSWORD,
-            start_tls=True
-        )
-    except Exception as e:
-        print(f"Erreur lors de l'envoi de l'email: {e}")
-        raise
-
-
-async def send_confirmation_email(
-    email: str,
-    first_name: str,
-    game_date: date,
-    registration_id: int
-):
-    """Envoyer un email de confirmation d'inscription"""
-    subject = "Confirmation d'inscription - Partie d'Airsoft"
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{
-                font-family: Arial, sans-serif;
-                background-color: #1a1a1a;
-                color: #e0e0e0;
-                padding: 20px;
-            }}
-            .container {{
-                max-width: 600px;
-                margin: 0 auto;
-                background-color: #2d2d2d;
-                padding: 30px;
-                border-radius: 10px;
-                box-shadow: 0 4px 6px rgba(0, 0, 0, 0.3);
-            }}
-            h1 {{
-                color: #4CAF50;
-                border-bottom: 2px solid #4CAF50;
-                padding-bottom: 10px;
-            }}
-            .info {{
-                background-color: #3a3a3a;
-                padding: 15px;
-                border-left: 4px solid #4CAF50;
-                margin: 20px 0;
-            }}
-            .button {{
-                display: inline-block;
-                background-color: #4CAF50;
-                color: white;
-                padding: 12px 30px;
-                text-decoration: none;
-                border-radius: 5px;
-                margin: 20px 0;
-            }}
-            .footer {{
-                margin-top: 30px;
-                font-size: 12px;
-                color: #888;
-                text-align: center;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>🎯 Confirmation d'inscription</h1>
-            <p>Bonjour {first_name},</p>
-            <p>Merci pour votre inscription à la partie d'airsoft !</p>
-            
-            <div class="info">
-                <strong>Date de la partie :</strong> {game_date.strftime('%d/%m/%Y')}
-            </div>
-            
-            <p>Pour finaliser votre inscription, veuillez cliquer sur le bouton ci-dessous :</p>
-            
-            <a href="{APP_URL}/confirm/{registration_id}" class="button">
-                Confirmer mon inscription
-            </a>
-            
-            <p>Nous vous enverrons un rappel quelques jours avant la partie.</p>
-            
-            <p>À bientôt sur le terrain ! 🔫</p>
-            
-            <div class="footer">
-                <p>Si vous n'avez pas demandé cette inscription, vous pouvez ignorer cet email.</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    await send_email(email, subject, html_content)
+    return message
 
 
-async def send_reminder_email(
-    email: str,
-    first_name: str,
-    game_date: date
-):
-    """Envoyer un email de rappel"""
-    subject = "Rappel - Partie d'Airsoft"
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{
-                font-family: Arial, sans-serif;
-                background-color: #1a1a1a;
-                color: #e0e0e0;
-                padding: 20px;
-            }}
-            .container {{
-                max-width: 600px;
-                margin: 0 auto;
-                background-color: #2d2d2d;
-                padding: 30px;
-                border-radius: 10px;
-                box-shadow: 0 4px 6px rgba(0, 0, 0, 0.3);
-            }}
-            h1 {{
-                color: #FF9800;
-                border-bottom: 2px solid #FF9800;
-                padding-bottom: 10px;
-            }}
-            .info {{
-                background-color: #3a3a3a;
-                padding: 15px;
-                border-left: 4px solid #FF9800;
-                margin: 20px 0;
-            }}
-            .footer {{
-                margin-top: 30px;
-                font-size: 12px;
-                color: #888;
-                text-align: center;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>⚠️ Rappel - Partie d'Airsoft</h1>
-            <p>Bonjour {first_name},</p>
-            <p>Nous vous rappelons que vous êtes inscrit(e) à la prochaine partie d'airsoft !</p>
-            
-            <div class="info">
-                <strong>Date de la partie :</strong> {game_date.strftime('%d/%m/%Y')}
-            </div>
-            
-            <p><strong>N'oubliez pas d'apporter :</strong></p>
-            <ul>
-                <li>Votre équipement d'airsoft</li>
-                <li>Vos protections (lunettes, masque)</li>
-                <li>De l'eau et de quoi grignoter</li>
-                <li>Votre bonne humeur ! 😊</li>
-            </ul>
-            
-            <p>À très bientôt ! 🎯</p>
-            
-            <div class="footer">
-                <p>Airsoft Manager - Gestion des parties</p>
-            </div>
-        </div>
-    </body>
-    </html>
+class RateLimiter:
+    """
+    Espace les envois pour ne pas dépasser `rate` messages par seconde.
+    La limite vaut pour un processus : chaque worker uvicorn fait tourner son
+    propre worker d'emails, le débit total peut donc atteindre
+    N workers × EMAIL_RATE_LIMIT.
     """
-    
-    await send_email(email, subject, html_content)
 
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next_slot = 0.0
 
-async def send_rejection_email(
-    email: str,
-    first_name: str,
-    game_date: date,
-    rejection_reason: str
-):
-    """Envoyer un email de rejet d'inscription"""
-    subject = "Inscription refusée - Partie d'Airsoft"
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{
-                font-family: Arial, sans-serif;
-                background-color: #1a1a1a;
-                color: #e0e0e0;
-                padding: 20px;
-            }}
-            .container {{
-                max-width: 600px;
-                margin: 0 auto;
-                background-color: #2d2d2d;
-                padding: 30px;
-                border-radius: 10px;
-                box-shadow: 0 4px 6px rgba(0, 0, 0, 0.3);
-            }}
-            h1 {{
-                color: #f44336;
-                border-bottom: 2px solid #f44336;
-                padding-bottom: 10px;
-            }}
-            .info {{
-                background-color: #3a3a3a;
-                padding: 15px;
-                border-left: 4px solid #f44336;
-                margin: 20px 0;
-            }}
-            .reason {{
-                background-color: #3a3a3a;
-                padding: 15px;
-                border-left: 4px solid #ff9800;
-                margin: 20px 0;
-            }}
-            .footer {{
-                margin-top: 30px;
-                font-size: 12px;
-                color: #888;
-                text-align: center;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>❌ Inscription refusée</h1>
-            <p>Bonjour {first_name},</p>
-            <p>Nous sommes désolés de vous informer que votre inscription à la partie d'airsoft a été refusée.</p>
-            
-            <div class="info">
-                <strong>Date de la partie :</strong> {game_date.strftime('%d/%m/%Y')}
-            </div>
-            
-            <div class="reason">
-                <strong>Motif du refus :</strong><br>
-                {rejection_reason}
-            </div>
-            
-            <p>Si vous pensez qu'il s'agit d'une erreur ou si vous souhaitez plus d'informations, n'hésitez pas à nous contacter.</p>
-            
-            <p>À bientôt peut-être ! 🎯</p>
-            
-            <div class="footer">
-                <p>Airsoft Manager - Gestion des parties</p>
-            </div>
-        </div>
-    </body>
-    </html>
+    async def wait(self):
+        """Attend le prochain créneau d'envoi disponible"""
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+async def dispatch_emails(
+    emails: List[Tuple[str, str, str]],
+    max_concurrency: int = EMAIL_MAX_CONCURRENCY,
+    rate_limit: float = EMAIL_RATE_LIMIT
+) -> List[Dict]:
     """
-    
-    await send_email(email, subject, html_content)
+    Envoie une liste d'emails (destinataire, sujet, contenu HTML) avec une
+    concurrence bornée et un débit plafonné (limites des fournisseurs SMTP).
+    Retourne un résultat par destinataire : {"email", "sent", "error"}.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    limiter = RateLimiter(rate_limit)
 
+    async def dispatch(to_email: str, subject: str, html_content: str) -> Dict:
+        async with semaphore:
+            await limiter.wait()
+            try:
+                await smtp_pool.send_message(build_message(to_email, subject, html_content))
+                return {"email": to_email, "sent": True, "error": None}
+            except Exception as e:
+                return {"email": to_email, "sent": False, "error": str(e)}
 
-async def send_approval_email(
-    email: str,
-    first_name: str,
-    game_date: date,
-    registration_id: int
-):
-    """Envoyer un email d'approbation d'inscription"""
-    subject = "Inscription approuvée - Partie d'Airsoft"
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{
-                font-family: Arial, sans-serif;
-                background-color: #1a1a1a;
-                color: #e0e0e0;
-                padding: 20px;
-            }}
-            .container {{
-                max-width: 600px;
-                margin: 0 auto;
-                background-color: #2d2d2d;
-                padding: 30px;
-                border-radius: 10px;
-                box-shadow: 0 4px 6px rgba(0, 0, 0, 0.3);
-            }}
-            h1 {{
-                color: #4CAF50;
-                border-bottom: 2px solid #4CAF50;
-                padding-bottom: 10px;
-            }}
-            .info {{
-                background-color: #3a3a3a;
-                padding: 15px;
-                border-left: 4px solid #4CAF50;
-                margin: 20px 0;
-            }}
-            .button {{
-                display: inline-block;
-                background-color: #4CAF50;
-                color: white;
-                padding: 12px 30px;
-                text-decoration: none;
-                border-radius: 5px;
-                margin: 20px 0;
-            }}
-            .footer {{
-                margin-top: 30px;
-                font-size: 12px;
-                color: #888;
-                text-align: center;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>✅ Inscription approuvée</h1>
-            <p>Bonjour {first_name},</p>
-            <p>Bonne nouvelle ! Votre inscription à la partie d'airsoft a été approuvée par l'administrateur.</p>
-            
-            <div class="info">
-                <strong>Date de la partie :</strong> {game_date.strftime('%d/%m/%Y')}
-            </div>
-            
-            <p>Pour finaliser votre inscription, veuillez cliquer sur le bouton ci-dessous :</p>
-            
-            <a href="{APP_URL}/confirm/{registration_id}" class="button">
-                Confirmer mon inscription
-            </a>
-            
-            <p>Nous vous enverrons un rappel quelques jours avant la partie.</p>
-            
-            <p>À bientôt sur le terrain ! 🔫</p>
-            
-            <div class="footer">
-                <p>Si vous n'êtes plus disponible, vous pouvez ignorer cet email.</p>
-            </div>
-        </div>
-    </body>
-    </html>
+    return await asyncio.gather(*(dispatch(*email) for email in emails))
+
+
+async def close_smtp_pool():
+    """Fermer les sessions SMTP ouvertes (arrêt de l'application)"""
+    await smtp_pool.close()
+
+
+CONFIRMATION_SUBJECT = "Confirmation d'inscription - Partie d'Airsoft"
+REMINDER_SUBJECT = "Rappel - Partie d'Airsoft"
+REJECTION_SUBJECT = "Inscription refusée - Partie d'Airsoft"
+APPROVAL_SUBJECT = "Inscription approuvée - Partie d'Airsoft"
+
+# Modèles d'email : type -> (fichier, sujet, couleur d'accent)
+EMAIL_TEMPLATES = {
+    "confirmation": ("confirmation.html", CONFIRMATION_SUBJECT, "#4CAF50"),
+    "reminder": ("reminder.html", REMINDER_SUBJECT, "#FF9800"),
+    "rejection": ("rejection.html", REJECTION_SUBJECT, "#f44336"),
+    "approval": ("approval.html", APPROVAL_SUBJECT, "#4CAF50"),
+}
+
+TEMPLATES_DIR = Path(__file__).parent / "templates" / "emails"
+
+
+def format_date_fr(value: date) -> str:
+    """Filtre Jinja2 : date au format JJ/MM/AAAA"""
+    return value.strftime('%d/%m/%Y')
+
+
+# Environnement Jinja2 chargé une seule fois ; les modèles sont compilés au démarrage
+templates = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False
+)
+templates.filters["date_fr"] = format_date_fr
+compiled_templates = {
+    kind: templates.get_template(filename)
+    for kind, (filename, _, _) in EMAIL_TEMPLATES.items()
+}
+
+
+@lru_cache(maxsize=None)
+def render_styles(accent: str) -> Markup:
+    """Feuille de style commune, rendue une seule fois par couleur d'accent"""
+    return Markup(templates.get_template("styles.css").render(accent=accent))
+
+
+def email_subject(kind: str) -> str:
+    """Sujet d'un type d'email"""
+    return EMAIL_TEMPLATES[kind][1]
+
+
+def render_email_batch(kind: str, contexts: List[Dict]) -> List[str]:
     """
-    
-    await send_email(email, subject, html_content)
+    Construit le contenu HTML de plusieurs emails du même type. La mise en page
+    et la feuille de style sont partagées : seul le contenu propre à chaque
+    destinataire est rendu pour chaque message.
+    """
+    _, _, accent = EMAIL_TEMPLATES[kind]
+    template = compiled_templates[kind]
+    common = {"styles": render_styles(accent), "app_url": APP_URL}
+    return [template.render(common, **context) for context in contexts]
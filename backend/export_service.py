@@ -0,0 +1,335 @@
+"""
+Exports CSV et XLSX des inscriptions et des statistiques
+Les lignes sont lues par lots avec un curseur serveur (yield_per) et écrites
+au fil de l'eau dans une StreamingResponse : la mémoire reste constante quel
+que soit le nombre de lignes et le téléchargement commence immédiatement.
+
+Le XLSX est produit sans dépendance : une archive zip (zipfile, écriture
+sur flux non positionnable) dont la feuille est écrite ligne par ligne.
+Chaque export utilise sa propre session, ouverte pendant la durée du flux.
+"""
+from datetime import date, datetime
+from typing import AsyncIterator, Iterable, List, Optional, Sequence
+from xml.sax.saxutils import escape
+import csv
+import io
+import os
+import re
+import zipfile
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
+
+from database import AsyncSessionLocal
+from models import Game, Registration
+from pricing import PricingContext, calculate_registration_price
+from statistics_service import compute_games_statistics
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 500))  # Lignes lues par aller-retour avec la base
+EXPORT_FLUSH_SIZE = 64 * 1024  # Taille d'un morceau envoyé au client (octets)
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",  # charset ajouté par StreamingResponse
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+REGISTRATION_COLUMNS = [
+    "ID", "Partie", "Date de la partie", "Nom", "Prénom", "Pseudo", "Email", "Téléphone",
+    "Association", "Type de présence", "Statut", "Confirmé", "Présent", "Type de paiement",
+    "Prix (€)", "Tag NFC", "Inscrit le",
+]
+
+STATISTICS_COLUMNS = [
+    "Partie", "Date", "Inscriptions", "Confirmées", "Présents", "Paiements validés",
+    "Revenu (€)", "Matinée", "Journée entière", "Associations",
+]
+
+ATTENDANCE_LABELS = {"morning": "Matinée", "full_day": "Journée entière", "invited": "Invité"}
+STATUS_LABELS = {"pending": "En attente", "approved": "Approuvée", "rejected": "Refusée"}
+
+# Caractères interdits en XML 1.0
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+# Cellules interprétées comme formules par un tableur (injection CSV)
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _yes_no(value: Optional[bool]) -> str:
+    if value is None:
+        return ""
+    return "Oui" if value else "Non"
+
+
+def registration_row(registration: Registration, pricing: PricingContext) -> list:
+    """Ligne d'export d'une inscription (relations déjà chargées)"""
+    game = registration.game
+    return [
+        registration.id,
+        game.name if game else "",
+        game.date if game else None,
+        registration.last_name,
+        registration.first_name,
+        registration.nickname,
+        registration.email,
+        registration.phone,
+        registration.association_name if registration.has_association else "",
+        ATTENDANCE_LABELS.get(registration.attendance_type, registration.attendance_type),
+        STATUS_LABELS.get(registration.approval_status, registration.approval_status),
+        _yes_no(registration.confirmed),
+        _yes_no(registration.was_present),
+        registration.payment_type.name if registration.payment_type else "",
+        calculate_registration_price(registration, pricing),
+        registration.nfc_tag.tag_number if registration.nfc_tag else "",
+        registration.created_at,
+    ]
+
+
+def statistics_row(stats: dict) -> list:
+    """Ligne d'export des statistiques d'une partie"""
+    return [
+        stats["game_name"],
+        stats["game_date"],
+        stats["total_registrations"],
+        stats["confirmed"],
+        stats["present"],
+        stats["payments_validated"],
+        stats["revenue"],
+        stats["morning_only"],
+        stats["full_day"],
+        ", ".join(f"{name} ({count})" for name, count in stats["associations"].items()),
+    ]
+
+
+async def stream_registration_rows(query, pricing: PricingContext) -> AsyncIterator[list]:
+    """Lignes d'export des inscriptions de `query`, lues par lots (curseur serveur)"""
+    async with AsyncSessionLocal() as db:
+        result = await db.stream_scalars(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for registration in result:
+            yield registration_row(registration, pricing)
+
+
+async def stream_statistics_rows(
+    pricing: PricingContext,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+) -> AsyncIterator[list]:
+    """Statistiques des parties par ordre chronologique, calculées par lots de parties"""
+    async with AsyncSessionLocal() as db:
+        after = None
+        while True:
+            query = select(Game).order_by(Game.date, Game.id).limit(EXPORT_BATCH_SIZE)
+            if date_from:
+                query = query.where(Game.date >= date_from)
+            if date_to:
+                query = query.where(Game.date <= date_to)
+            if after is not None:
+                query = query.where(tuple_(Game.date, Game.id) > after)
+            games = (await db.scalars(query)).all()
+            if not games:
+                return
+            for stats in await compute_games_statistics(db, games, pricing):
+                yield statistics_row(stats)
+            after = (games[-1].date, games[-1].id)
+            # Les parties déjà exportées n'ont plus besoin de rester en session
+            db.expunge_all()
+
+
+# ==========================================
+# CSV
+# ==========================================
+
+def _csv_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%d/%m/%Y %H:%M")
+    if isinstance(value, date):
+        return value.strftime("%d/%m/%Y")
+    if isinstance(value, float):
+        return f"{value:g}".replace(".", ",")
+    text = str(value)
+    if text.startswith(_FORMULA_PREFIXES):
+        return "'" + text
+    return text
+
+
+async def csv_chunks(columns: Sequence[str], rows: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    """
+    CSV au format du tableur français (UTF-8 avec BOM, séparateur « ; »),
+    envoyé par morceaux de EXPORT_FLUSH_SIZE octets.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";", lineterminator="\r\n")
+    buffer.write("\ufeff")  # BOM : Excel détecte l'UTF-8
+    writer.writerow(columns)
+    async for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        if buffer.tell() >= EXPORT_FLUSH_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+# ==========================================
+# XLSX
+# ==========================================
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Styles : 0 = standard, 1 = date, 2 = date et heure, 3 = en-tête en gras
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="2"><numFmt numFmtId="164" formatCode="dd/mm/yyyy"/>'
+    '<numFmt numFmtId="165" formatCode="dd/mm/yyyy hh:mm"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+
+
+def _workbook(sheet_name: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _xlsx_cell(value, style: int = 0) -> str:
+    if value is None or value == "":
+        return "<c/>"
+    if isinstance(value, bool):
+        value = "Oui" if value else "Non"
+    elif isinstance(value, datetime):
+        # Précision à la seconde (numéro de série Excel en jours)
+        serial = round((value - _EXCEL_EPOCH).total_seconds()) / 86400
+        return f'<c s="2"><v>{serial!r}</v></c>'
+    elif isinstance(value, date):
+        serial = (datetime.combine(value, datetime.min.time()) - _EXCEL_EPOCH).days
+        return f'<c s="1"><v>{serial}</v></c>'
+    elif isinstance(value, (int, float)):
+        return f"<c><v>{value}</v></c>"
+    text = escape(_INVALID_XML_CHARS.sub("", str(value)))
+    style_attr = f' s="{style}"' if style else ""
+    return f'<c t="inlineStr"{style_attr}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values: Iterable, style: int = 0) -> str:
+    return "<row>" + "".join(_xlsx_cell(value, style) for value in values) + "</row>"
+
+
+class _ChunkWriter(io.RawIOBase):
+    """Flux d'écriture non positionnable : zipfile y écrit, le générateur relève les octets"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return data
+
+
+async def xlsx_chunks(sheet_name: str, columns: Sequence[str], rows: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    """Classeur XLSX d'une feuille, envoyé par morceaux au fil de l'écriture des lignes"""
+    output = _ChunkWriter()
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _ROOT_RELS)
+        archive.writestr("xl/workbook.xml", _workbook(sheet_name))
+        archive.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        archive.writestr("xl/styles.xml", _STYLES)
+
+        with archive.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetData>' + _xlsx_row(columns, style=3)
+            ).encode("utf-8"))
+            # Début de l'archive envoyé tout de suite : le téléchargement démarre
+            yield output.take()
+            async for row in rows:
+                sheet.write(_xlsx_row(row).encode("utf-8"))
+                if output.size >= EXPORT_FLUSH_SIZE:
+                    yield output.take()
+            sheet.write(b"</sheetData></worksheet>")
+    yield output.take()
+
+
+def export_filename(prefix: str, date_from: Optional[date], date_to: Optional[date]) -> str:
+    """Nom du fichier d'export d'une période (ex : inscriptions-2025-09-01_2026-06-30)"""
+    if not date_from and not date_to:
+        return prefix
+    start = date_from.isoformat() if date_from else "debut"
+    end = date_to.isoformat() if date_to else "fin"
+    return f"{prefix}-{start}_{end}"
+
+
+def export_response(
+    export_format: str,
+    filename: str,
+    sheet_name: str,
+    columns: Sequence[str],
+    rows: AsyncIterator[list]
+) -> StreamingResponse:
+    """Réponse de téléchargement en flux au format demandé (csv ou xlsx)"""
+    if export_format == "xlsx":
+        body = xlsx_chunks(sheet_name, columns, rows)
+    else:
+        body = csv_chunks(columns, rows)
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_FORMATS[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{export_format}"',
+            "Cache-Control": "no-store",
+        }
+    )
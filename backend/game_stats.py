@@ -0,0 +1,246 @@
+"""
+Tenue à jour incrémentale des statistiques précalculées des parties
+(tables game_stats et game_association_stats)
+
+Un endpoint qui modifie des inscriptions les lit verrouillées (SELECT ...
+FOR UPDATE), relève leur contribution aux compteurs avant la modification,
+puis applique la différence avec la contribution après modification, dans
+la même transaction :
+
+    registration = await db.scalar(select(Registration).where(...).with_for_update())
+    before = await registration_contributions(db, [registration])
+    registration.was_present = True
+    await apply_contributions_delta(db, before, await registration_contributions(db, [registration]))
+
+Le verrou garantit que l'état "avant" est celui que la modification
+remplace : deux postes qui modifient la même inscription sont sérialisés.
+Les compteurs sont modifiés par UPDATE ... SET compteur = compteur + delta,
+sûr avec plusieurs postes en parallèle. rebuild_game_stats recalcule les
+compteurs depuis les inscriptions pour détecter et corriger une dérive
+(python rebuild_game_stats.py).
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_engine
+from models import Game, GameStats, GameAssociationStats, PaymentType, Registration
+from statistics_service import GAME_COUNTERS, aggregate_registrations, load_game_counters
+
+REBUILD_BATCH_SIZE = 500  # Parties vérifiées par lot
+
+
+class Contributions:
+    """Contribution d'un ensemble d'inscriptions aux compteurs des parties"""
+
+    def __init__(self):
+        self.games: Dict[Tuple[int, str], int] = {}  # (partie, compteur) -> valeur
+        self.associations: Dict[Tuple[int, str, str], int] = {}  # (partie, association, compteur) -> valeur
+        self.first_ids: Dict[Tuple[int, str], int] = {}  # (partie, association) -> plus petit id d'inscription
+
+    def add_game(self, game_id: int, counter: str):
+        key = (game_id, counter)
+        self.games[key] = self.games.get(key, 0) + 1
+
+    def add_association(self, game_id: int, name: str, counter: str, registration_id: Optional[int]):
+        key = (game_id, name, counter)
+        self.associations[key] = self.associations.get(key, 0) + 1
+        if registration_id is not None:
+            first_key = (game_id, name)
+            self.first_ids[first_key] = min(self.first_ids.get(first_key, registration_id), registration_id)
+
+
+def _delta(before: Dict, after: Dict) -> Dict:
+    """Différence non nulle entre deux jeux de compteurs"""
+    result = {}
+    for key in set(before) | set(after):
+        value = after.get(key, 0) - before.get(key, 0)
+        if value:
+            result[key] = value
+    return result
+
+
+async def _paid_payment_type_ids(db: AsyncSession, payment_type_ids: Set[int]) -> Set[int]:
+    """Types de paiement (parmi ceux donnés) qui génèrent un coût"""
+    if not payment_type_ids:
+        return set()
+    return set((await db.scalars(select(PaymentType.id).where(
+        PaymentType.id.in_(payment_type_ids),
+        PaymentType.generates_cost == True
+    ))).all())
+
+
+async def registration_contributions(db: AsyncSession, registrations: Iterable) -> Contributions:
+    """
+    Contribution des inscriptions aux compteurs (mêmes règles que
+    statistics_service.aggregate_registrations). Accepte des inscriptions ORM
+    ou des lignes qui en ont les attributs.
+    """
+    registrations = [reg for reg in registrations if reg.game_id is not None]
+    paid_ids = await _paid_payment_type_ids(
+        db, {reg.payment_type_id for reg in registrations if reg.payment_type_id is not None}
+    )
+
+    contributions = Contributions()
+    for reg in registrations:
+        game_id = reg.game_id
+        is_paid = reg.payment_type_id in paid_ids
+        pays = is_paid and reg.attendance_type != "invited"
+
+        contributions.add_game(game_id, "total_registrations")
+        if reg.confirmed:
+            contributions.add_game(game_id, "confirmed")
+        if reg.was_present:
+            contributions.add_game(game_id, "present")
+        if reg.attendance_type == "morning":
+            contributions.add_game(game_id, "morning_only")
+        elif reg.attendance_type == "full_day":
+            contributions.add_game(game_id, "full_day")
+        if is_paid:
+            contributions.add_game(game_id, "payments_validated")
+
+        if not reg.has_association or not reg.association_name:
+            if pays:
+                contributions.add_game(game_id, "paid_freelance")
+        else:
+            contributions.add_association(game_id, reg.association_name, "registrations", reg.id)
+            if pays:
+                contributions.add_association(game_id, reg.association_name, "paid", reg.id)
+    return contributions
+
+
+def _insert(table):
+    """INSERT avec clause ON CONFLICT selon la base"""
+    if async_engine.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+async def apply_contributions_delta(db: AsyncSession, before: Contributions, after: Contributions):
+    """
+    Applique aux compteurs la différence entre deux contributions, sans commit.
+    Une partie sans ligne game_stats (base antérieure non reconstruite) est
+    ignorée : ses statistiques sont alors agrégées depuis les inscriptions.
+    Les modifications des inscriptions (y compris les suppressions) sont
+    écrites d'abord : la première inscription de chaque association
+    concernée est relue depuis la table.
+    """
+    await db.flush()
+    game_delta = _delta(before.games, after.games)
+    association_delta = _delta(before.associations, after.associations)
+    game_ids = {game_id for game_id, _ in game_delta} | {game_id for game_id, _, _ in association_delta}
+    if not game_ids:
+        return
+
+    tracked_games = set()
+    for game_id in sorted(game_ids):
+        values = {"updated_at": datetime.utcnow()}
+        for (delta_game_id, counter), value in game_delta.items():
+            if delta_game_id == game_id:
+                values[counter] = getattr(GameStats, counter) + value
+        # Verrouille aussi la ligne de la partie pour la mise à jour de ses associations
+        result = await db.execute(
+            update(GameStats).where(GameStats.game_id == game_id).values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            tracked_games.add(game_id)
+
+    changes: Dict[Tuple[int, str], Dict[str, int]] = {}
+    for (game_id, name, counter), value in association_delta.items():
+        if game_id in tracked_games:
+            changes.setdefault((game_id, name), {"registrations": 0, "paid": 0})[counter] = value
+    for (game_id, name), values in changes.items():
+        statement = _insert(GameAssociationStats).values(
+            game_id=game_id,
+            association_name=name,
+            registrations=values["registrations"],
+            paid=values["paid"],
+            first_registration_id=after.first_ids.get((game_id, name), before.first_ids.get((game_id, name), 0))
+        )
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=[GameAssociationStats.game_id, GameAssociationStats.association_name],
+            set_={
+                "registrations": GameAssociationStats.registrations + values["registrations"],
+                "paid": GameAssociationStats.paid + values["paid"],
+            }
+        ))
+    if changes:
+        await db.execute(delete(GameAssociationStats).where(
+            GameAssociationStats.game_id.in_({game_id for game_id, _ in changes}),
+            GameAssociationStats.registrations <= 0
+        ))
+    # Une inscription ajoutée, retirée ou déplacée peut changer l'ordre d'apparition
+    for (game_id, name), values in changes.items():
+        if values["registrations"]:
+            await db.execute(
+                update(GameAssociationStats)
+                .where(GameAssociationStats.game_id == game_id, GameAssociationStats.association_name == name)
+                .values(first_registration_id=select(func.min(Registration.id)).where(
+                    Registration.game_id == game_id,
+                    Registration.has_association == True,
+                    Registration.association_name == name
+                ).scalar_subquery())
+                .execution_options(synchronize_session=False)
+            )
+
+
+def init_game_stats(db: AsyncSession, game: Game):
+    """Compteurs à zéro d'une nouvelle partie (après flush, game.id connu)"""
+    db.add(GameStats(game_id=game.id, **{counter: 0 for counter in GAME_COUNTERS}))
+
+
+async def _write_game_stats(db: AsyncSession, game_id: int, counters):
+    """Remplace les compteurs stockés d'une partie"""
+    await db.execute(delete(GameAssociationStats).where(GameAssociationStats.game_id == game_id))
+    await db.execute(delete(GameStats).where(GameStats.game_id == game_id))
+    await db.execute(insert(GameStats).values(
+        game_id=game_id, updated_at=datetime.utcnow(), **counters.counters
+    ))
+    if counters.associations:
+        await db.execute(insert(GameAssociationStats), [
+            {
+                "game_id": game_id, "association_name": name, "registrations": count,
+                "paid": paid, "first_registration_id": first_id
+            }
+            for name, count, paid, first_id in counters.associations
+        ])
+
+
+async def rebuild_game_stats(
+    db: AsyncSession,
+    game_ids: Optional[List[int]] = None,
+    repair: bool = True
+) -> List[int]:
+    """
+    Compare les compteurs stockés aux inscriptions (toutes les parties, ou
+    `game_ids`) et, si `repair`, réécrit ceux qui ont dérivé ou manquent.
+    Retourne les parties en écart. Sans commit.
+    """
+    if game_ids is None:
+        game_ids = list((await db.scalars(select(Game.id).order_by(Game.id))).all())
+
+    drifted = []
+    for start in range(0, len(game_ids), REBUILD_BATCH_SIZE):
+        batch = game_ids[start:start + REBUILD_BATCH_SIZE]
+        expected = await aggregate_registrations(db, batch)
+        stored_ids = set((await db.scalars(select(GameStats.game_id).where(GameStats.game_id.in_(batch)))).all())
+        stored = await load_game_counters(db, [game_id for game_id in batch if game_id in stored_ids])
+        for game_id in batch:
+            if game_id in stored and stored[game_id].key() == expected[game_id].key():
+                continue
+            drifted.append(game_id)
+            if repair:
+                await _write_game_stats(db, game_id, expected[game_id])
+    return drifted
+
+
+async def rebuild_payment_type_games(db: AsyncSession, payment_type_id: int) -> List[int]:
+    """Recalcule les parties qui utilisent un type de paiement (generates_cost modifié)"""
+    game_ids = list((await db.scalars(
+        select(Registration.game_id).where(Registration.payment_type_id == payment_type_id).distinct()
+    )).all())
+    return await rebuild_game_stats(db, game_ids)
@@ -0,0 +1,81 @@
+"""
+Validation HTTP des lectures publiques (règles, paramètres, partie active, logo)
+Les réponses portent un ETag calculé à partir des colonnes updated_at (ou de
+la date de modification du fichier pour le logo) et un Last-Modified : un
+navigateur qui renvoie If-None-Match / If-Modified-Since reçoit un 304 sans
+corps. Cache-Control oblige le navigateur à revalider (un admin voit tout de
+suite ses modifications) mais autorise un cache partagé (Caddy) à servir la
+réponse quelques secondes.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+import hashlib
+import os
+
+from fastapi import Request, Response, status
+
+HTTP_CACHE_SHARED_MAX_AGE = int(os.getenv("HTTP_CACHE_SHARED_MAX_AGE", 10))  # Durée de cache pour Caddy / un proxy (secondes)
+
+CACHE_CONTROL = f"public, max-age=0, s-maxage={HTTP_CACHE_SHARED_MAX_AGE}"
+
+
+def make_etag(*parts) -> str:
+    """ETag faible calculé à partir des valeurs qui déterminent la réponse"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Les dates de la base sont en UTC naïf (datetime.utcnow)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Comparaison faible : W/"x" et "x" désignent la même version
+    wanted = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == wanted for candidate in if_none_match.split(","))
+
+
+def _not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since is None:
+        return False
+    # Last-Modified n'a qu'une précision à la seconde
+    return _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since)
+
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None
+) -> Optional[Response]:
+    """
+    Ajoute les validateurs à la réponse et retourne une réponse 304 si le client
+    possède déjà cette version (None sinon : l'endpoint renvoie le contenu).
+    """
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified).replace(microsecond=0), usegmt=True)
+    response.headers.update(headers)
+
+    # If-None-Match est prioritaire sur If-Modified-Since (RFC 9110)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    elif last_modified is not None and request.headers.get("if-modified-since"):
+        not_modified = _not_modified_since(request.headers["if-modified-since"], last_modified)
+    else:
+        not_modified = False
+
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
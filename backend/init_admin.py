@@ -2,10 +2,9 @@
 Script pour créer ou mettre à jour l'utilisateur admin
 """
 import os
-from database import engine, get_db
+from database import engine, SessionLocal
 from models import User, Base
 from auth import hash_password
-from sqlalchemy.orm import Session
 
 def init_admin():
     # Créer toutes les tables
@@ -16,7 +15,7 @@ def init_admin():
     admin_password = os.getenv("ADMIN_PASSWORD", "admin123")
     
     # Créer une session
-    db = next(get_db())
+    db = SessionLocal()
     
     try:
         # Vérifier si l'admin existe
@@ -0,0 +1,222 @@
+"""
+Événements en direct du tableau de bord admin (Server-Sent Events)
+Les compteurs d'inscriptions et de candidatures en attente sont chargés une
+fois puis tenus à jour en mémoire par les endpoints qui les modifient ; chaque
+changement est poussé aux tableaux de bord ouverts. N tableaux de bord ne
+coûtent donc aucune requête périodique.
+
+Avec plusieurs workers uvicorn sur PostgreSQL, chaque variation et chaque
+événement est diffusé par NOTIFY sur le canal live_events (connexion
+d'écoute de config_cache.py) : tous les workers, y compris l'émetteur,
+l'appliquent à réception, si bien que tous les flux montrent les mêmes
+compteurs. Sans diffusion (SQLite, CONFIG_CACHE_NOTIFY=false), un seul
+worker est supporté ; les compteurs sont de toute façon resynchronisés
+depuis la base au plus tous les LIVE_EVENTS_RESYNC_INTERVAL secondes, à
+l'ouverture d'un flux, et après une reconnexion de l'écoute.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import secrets
+import time
+
+from fastapi import Request
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config_cache import listen, notify, notify_enabled
+from models import EventStreamTicket, Registration, MembershipApplication
+
+logger = logging.getLogger(__name__)
+
+LIVE_EVENTS_HEARTBEAT = float(os.getenv("LIVE_EVENTS_HEARTBEAT", 15))  # Commentaire keep-alive si aucun événement (secondes)
+LIVE_EVENTS_MAX_DURATION = float(os.getenv("LIVE_EVENTS_MAX_DURATION", 300))  # Durée d'un flux avant reconnexion du navigateur (secondes)
+LIVE_EVENTS_RESYNC_INTERVAL = float(os.getenv("LIVE_EVENTS_RESYNC_INTERVAL", 300))  # Âge maximal des compteurs à l'ouverture d'un flux (secondes)
+LIVE_EVENTS_TICKET_TTL = float(os.getenv("LIVE_EVENTS_TICKET_TTL", 30))  # Validité d'un ticket d'ouverture du flux (secondes)
+LIVE_EVENTS_QUEUE_SIZE = 100  # Événements en attente par abonné avant déconnexion
+NOTIFY_CHANNEL = "live_events"
+
+# Compteurs publiés
+PENDING_REGISTRATIONS = "pending_registrations"
+PENDING_APPLICATIONS = "pending_applications"
+
+
+def format_sse(event: str, data) -> str:
+    """Formate un événement au format text/event-stream"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _ticket_hash(ticket: str) -> str:
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+
+async def issue_stream_ticket(db: AsyncSession, user_id: int) -> str:
+    """
+    Crée un ticket d'ouverture du flux (usage unique, LIVE_EVENTS_TICKET_TTL
+    secondes). EventSource ne permet pas d'en-tête Authorization : c'est ce
+    ticket, et non le token admin, qui figure dans l'URL et les journaux d'accès.
+    """
+    now = datetime.utcnow()
+    ticket = secrets.token_urlsafe(32)
+    await db.execute(delete(EventStreamTicket).where(EventStreamTicket.expires_at < now))
+    db.add(EventStreamTicket(
+        ticket_hash=_ticket_hash(ticket),
+        user_id=user_id,
+        expires_at=now + timedelta(seconds=LIVE_EVENTS_TICKET_TTL)
+    ))
+    await db.commit()
+    return ticket
+
+
+async def consume_stream_ticket(db: AsyncSession, ticket: str) -> Optional[int]:
+    """
+    Consomme un ticket et retourne l'id de l'administrateur, ou None si le
+    ticket est inconnu, expiré ou déjà utilisé (DELETE ... RETURNING : un seul
+    flux l'obtient, quel que soit le worker)
+    """
+    user_id = await db.scalar(
+        delete(EventStreamTicket)
+        .where(EventStreamTicket.ticket_hash == _ticket_hash(ticket), EventStreamTicket.expires_at >= datetime.utcnow())
+        .returning(EventStreamTicket.user_id)
+    )
+    await db.commit()
+    return user_id
+
+
+class Subscriber:
+    """Tableau de bord abonné au flux"""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=LIVE_EVENTS_QUEUE_SIZE)
+
+
+class LiveEventHub:
+    """Compteurs en mémoire et diffusion des événements aux abonnés"""
+
+    def __init__(self):
+        self.counters: Dict[str, int] = {}
+        self._synced_at: Optional[float] = None
+        self._subscribers: Set[Subscriber] = set()
+        self._pending_notifications: Set[asyncio.Task] = set()
+
+    async def sync_counters(self, db: AsyncSession):
+        """Recharge les compteurs depuis la base (2 requêtes)"""
+        self.counters = {
+            PENDING_REGISTRATIONS: await db.scalar(select(func.count()).select_from(Registration).where(
+                Registration.approval_status == "pending"
+            )),
+            PENDING_APPLICATIONS: await db.scalar(select(func.count()).select_from(MembershipApplication).where(
+                MembershipApplication.status == "pending"
+            )),
+        }
+        self._synced_at = time.monotonic()
+
+    async def ensure_counters(self, db: AsyncSession):
+        """Charge les compteurs s'ils ne l'ont jamais été ou sont trop anciens"""
+        if self._synced_at is None or time.monotonic() - self._synced_at >= LIVE_EVENTS_RESYNC_INTERVAL:
+            await self.sync_counters(db)
+
+    def mark_stale(self):
+        """Variations peut-être manquées : resynchronisation à la prochaine ouverture de flux"""
+        if self._synced_at is not None:
+            self._synced_at = time.monotonic() - LIVE_EVENTS_RESYNC_INTERVAL
+
+    def adjust(self, name: str, delta: int):
+        """Applique une variation d'un compteur (après le commit) sur tous les workers"""
+        if delta:
+            self._dispatch({"type": "adjust", "name": name, "delta": delta})
+
+    def publish(self, event: str, data):
+        """Diffuse un événement aux abonnés de tous les workers"""
+        self._dispatch({"type": "event", "event": event, "data": data})
+
+    def _dispatch(self, message: Dict):
+        if not notify_enabled():
+            self._apply(message)
+            return
+        task = asyncio.get_running_loop().create_task(self._notify(message))
+        self._pending_notifications.add(task)
+        task.add_done_callback(self._pending_notifications.discard)
+
+    async def _notify(self, message: Dict):
+        try:
+            await notify(NOTIFY_CHANNEL, json.dumps(message, default=str))
+        except Exception as e:
+            # Les autres workers se resynchroniseront ; ce worker reste à jour
+            logger.error(f"❌ Diffusion d'un événement temps réel impossible: {e}")
+            self._apply(message)
+
+    def on_notification(self, payload: str):
+        """Message reçu par LISTEN (y compris ceux émis par ce worker)"""
+        self._apply(json.loads(payload))
+
+    def _apply(self, message: Dict):
+        if message["type"] == "adjust":
+            if self._synced_at is None:
+                return
+            name = message["name"]
+            self.counters[name] = max(0, self.counters.get(name, 0) + message["delta"])
+            self._fan_out("counters", dict(self.counters))
+        else:
+            self._fan_out(message["event"], message["data"])
+
+    def _fan_out(self, event: str, data):
+        """Transmet un événement aux abonnés de ce worker ; un abonné qui ne suit pas est déconnecté"""
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                self._disconnect(subscriber)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber()
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def _disconnect(self, subscriber: Subscriber):
+        self.unsubscribe(subscriber)
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+    async def stream(self, request: Request, subscriber: Subscriber):
+        """
+        Générateur du flux SSE d'un abonné : compteurs actuels, puis événements.
+        Le flux est fermé après LIVE_EVENTS_MAX_DURATION ; le tableau de bord
+        se reconnecte avec un nouveau ticket (et le token est revérifié).
+        """
+        deadline = time.monotonic() + LIVE_EVENTS_MAX_DURATION
+        try:
+            yield "retry: 3000\n\n"
+            yield format_sse("counters", dict(self.counters))
+            while time.monotonic() < deadline:
+                try:
+                    item = await asyncio.wait_for(
+                        subscriber.queue.get(),
+                        timeout=min(LIVE_EVENTS_HEARTBEAT, max(deadline - time.monotonic(), 0))
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                if item is None:
+                    break
+                yield format_sse(*item)
+        finally:
+            self.unsubscribe(subscriber)
+
+
+live_events = LiveEventHub()
+listen(NOTIFY_CHANNEL, live_events.on_notification, on_reconnect=live_events.mark_stale)
@@ -1,35 +1,69 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import datetime, timedelta
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import joinedload
+from datetime import date, datetime, timedelta
 from typing import List, Optional
 import os
+import secrets
 import shutil
 from pathlib import Path
 
-from database import engine, Base, get_db
-from models import User, Game, Registration, Attendance, SiteSettings, Rules, PaymentType, PartnerAssociation, PricingSettings, NFCTag, RuleVersion, MembershipApplication
+from database import engine, async_engine, AsyncSessionLocal, Base, get_db
+from models import User, Game, Registration, Attendance, SiteSettings, Rules, PaymentType, PartnerAssociation, PricingSettings, NFCTag, RuleVersion, MembershipApplication, EmailOutbox
 from schemas import (
     RegistrationCreate, RegistrationUpdate, RegistrationResponse,
     RegistrationApprovalRequest, RegistrationRejectionRequest,
     GameCreate, GameResponse,
     LoginRequest, TokenResponse, ChangePasswordRequest,
-    AttendanceUpdate, StatisticsResponse, GameStatistics,
+    AttendanceUpdate, StatisticsResponse, GameStatistics, ReminderQueueResponse, ReminderDeliveryResponse, ReminderResumeResponse,
     SiteSettingsUpdate, SiteSettingsResponse,
     RulesUpdate, RulesResponse,
     PaymentTypeCreate, PaymentTypeUpdate, PaymentTypeResponse, SetPaymentTypeRequest,
     PartnerAssociationCreate, PartnerAssociationUpdate, PartnerAssociationResponse,
     PricingSettingsUpdate, PricingSettingsResponse,
-    NFCTagCreate, NFCTagUpdate, NFCTagResponse, AssignTagRequest,
+    NFCTagCreate, NFCTagUpdate, NFCTagResponse, AssignTagRequest, GameTagAssignmentResponse,
     RuleVersionCreate, RuleVersionResponse,
-    MembershipApplicationCreate, MembershipApplicationResponse, MembershipApplicationStatusUpdate
+    MembershipApplicationCreate, MembershipApplicationResponse, MembershipApplicationStatusUpdate,
+    EmailOutboxResponse, EmailQueueStatusResponse,
+    BulkRegistrationRequest, BulkRegistrationResponse
 )
-from auth import create_access_token, verify_token, verify_password, hash_password
-from email_service import send_confirmation_email, send_reminder_email, send_rejection_email, send_approval_email
-from scheduler import start_scheduler, stop_scheduler
+from auth import (
+    create_access_token, decode_token, hash_password_async, verify_password_async,
+    verify_and_rehash_password_async, shutdown_password_executor,
+    password_stamp, AdminIdentity, admin_token_cache
+)
+from email_service import close_smtp_pool
+from email_queue import enqueue_email, enqueue_emails, notify_email_worker, start_email_worker, stop_email_worker, get_queue_status
+from scheduler import start_scheduler, stop_scheduler, get_reminder_deliveries, queue_game_reminders
+from bulk_service import apply_bulk_action, APPROVAL_ACTIONS
+from game_stats import Contributions, apply_contributions_delta, init_game_stats, rebuild_payment_type_games, registration_contributions
+from nfc_allocation import assign_tag, auto_assign_tag, auto_assign_game_tags, commit_tag_assignment
+from statistics_service import compute_games_statistics, compute_global_statistics
+from export_service import (
+    REGISTRATION_COLUMNS, STATISTICS_COLUMNS, export_filename, export_response,
+    stream_registration_rows, stream_statistics_rows
+)
+from pricing import PricingContext, calculate_registration_price, normalize_association_name, get_cached_pricing_settings, get_pricing_context
+from config_cache import (
+    invalidate_config, invalidate_admin_tokens, get_cached_site_settings, get_cached_rules,
+    start_config_listener, stop_config_listener,
+    SITE_SETTINGS, RULES, PRICING_SETTINGS, PRICING_CONTEXT
+)
+from http_cache import make_etag, conditional_response
+from live_events import (
+    live_events, issue_stream_ticket, consume_stream_ticket, PENDING_REGISTRATIONS, PENDING_APPLICATIONS,
+    LIVE_EVENTS_TICKET_TTL
+)
+from query_metrics import QueryMetricsMiddleware
+from app_metrics import (
+    METRICS_ENABLED, METRICS_TOKEN, CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    MetricsMiddleware, render_metrics, update_pool_gauges, update_queue_gauges
+)
+from pagination import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, NEXT_CURSOR_HEADER, paginate, finish_page, text_search
 
 # Créer les tables
 Base.metadata.create_all(bind=engine)
@@ -48,8 +82,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# Requêtes SQL par requête HTTP : en-tête Server-Timing et alertes de budget
+app.add_middleware(QueryMetricsMiddleware)
+
+# Métriques Prometheus (/metrics) : nombre et latence des requêtes par route
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 security = HTTPBearer()
 
 # Admin credentials depuis les variables d'environnement
@@ -64,6 +106,8 @@ async def startup_event():
     print("🚀 DÉMARRAGE DE L'APPLICATION")
     print("=" * 60)
     start_scheduler()
+    start_email_worker()
+    start_config_listener()
     print("=" * 60)
 
 
@@ -71,80 +115,61 @@ async def startup_event():
 async def shutdown_event():
     """Événements à l'arrêt de l'application"""
     print("🛑 ARRÊT DE L'APPLICATION")
-    stop_scheduler()
+    await stop_scheduler()
+    await stop_email_worker()
+    await stop_config_listener()
+    await close_smtp_pool()
+    await async_engine.dispose()
+    shutdown_password_executor()
 
 
-def get_or_create_admin(db: Session):
+async def get_or_create_admin(db: AsyncSession):
     """Récupère ou crée l'utilisateur admin"""
-    admin = db.query(User).filter(User.username == ADMIN_USERNAME).first()
+    admin = await db.scalar(select(User).where(User.username == ADMIN_USERNAME))
     if not admin:
         admin = User(
             username=ADMIN_USERNAME,
-            hashed_password=hash_password(ADMIN_PASSWORD),
+            hashed_password=await hash_password_async(ADMIN_PASSWORD),
             is_admin=True
         )
         db.add(admin)
-        db.commit()
-        db.refresh(admin)
+        await db.commit()
+        await db.refresh(admin)
     return admin
 
 
-def get_current_admin(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-):
-    """Vérifie que l'utilisateur est un administrateur"""
-    token = credentials.credentials
-    username = verify_token(token)
-    if not username:
+async def authenticate_admin(token: str, db: AsyncSession) -> AdminIdentity:
+    """Vérifie qu'un token appartient à un administrateur (token vérifié mis en cache)"""
+    identity = admin_token_cache.get(token)
+    if identity:
+        return identity
+    
+    payload = decode_token(token)
+    if not payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Non autorisé"
         )
     
-    user = db.query(User).filter(User.username == username, User.is_admin == True).first()
-    if not user:
+    user = await db.scalar(select(User).where(User.username == payload["sub"], User.is_admin == True))
+    # Un token émis avant le dernier changement de mot de passe est révoqué
+    if not user or payload.get("pwd", "") != password_stamp(user):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Non autorisé"
         )
-    return user
+    
+    identity = AdminIdentity(id=user.id, username=user.username)
+    admin_token_cache.set(token, identity, payload.get("exp"))
+    return identity
 
 
-def calculate_registration_price(registration: Registration, db: Session) -> int:
-    """
-    Calcule le prix d'une inscription selon les règles :
-    - Invité (attendance_type = 'invited') : 0€
-    - Association partenaire : tarif association partenaire (défaut 5€)
-    - Autre association : tarif autre association (défaut 7€)
-    - Freelance (pas d'association) : tarif freelance (défaut 9€)
-    """
-    # Si c'est un invité, le prix est de 0€
-    if registration.attendance_type == 'invited':
-        return 0
-    
-    # Récupérer les paramètres de tarification
-    pricing_settings = db.query(PricingSettings).first()
-    if not pricing_settings:
-        # Créer avec valeurs par défaut si n'existe pas
-        pricing_settings = PricingSettings()
-        db.add(pricing_settings)
-        db.commit()
-    
-    # Si pas d'association, c'est un freelance
-    if not registration.has_association or not registration.association_name:
-        return pricing_settings.freelance_price
-    
-    # Vérifier si l'association est partenaire (comparaison insensible à la casse)
-    partner = db.query(PartnerAssociation).filter(
-        func.lower(PartnerAssociation.name) == func.lower(registration.association_name),
-        PartnerAssociation.is_active == True
-    ).first()
-    
-    if partner:
-        return pricing_settings.partner_association_price
-    else:
-        return pricing_settings.other_association_price
+async def get_current_admin(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+) -> AdminIdentity:
+    """Vérifie que l'utilisateur est un administrateur"""
+    return await authenticate_admin(credentials.credentials, db)
 
 
 @app.get("/")
@@ -153,10 +178,10 @@ async def root():
 
 
 @app.post("/api/auth/login", response_model=TokenResponse)
-async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
+async def login(login_data: LoginRequest, db: AsyncSession = Depends(get_db)):
     """Authentification administrateur"""
     # S'assurer que l'admin existe
-    admin = get_or_create_admin(db)
+    admin = await get_or_create_admin(db)
     
     # Vérifier le nom d'utilisateur
     if login_data.username != admin.username:
@@ -166,28 +191,34 @@ async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
         )
     
     # Vérifier le mot de passe
-    if not verify_password(login_data.password, admin.hashed_password):
+    valid, new_hash = await verify_and_rehash_password_async(login_data.password, admin.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Identifiants incorrects"
         )
     
-    access_token = create_access_token(data={"sub": login_data.username})
+    # Hash obsolète (coût bcrypt modifié, ancien SHA256) : mis à jour de façon transparente
+    if new_hash:
+        admin.hashed_password = new_hash
+        await db.commit()
+    
+    access_token = create_access_token(data={"sub": admin.username, "pwd": password_stamp(admin)})
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @app.post("/api/registrations", response_model=RegistrationResponse)
 async def create_registration(
     registration: RegistrationCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Créer une nouvelle inscription (en attente de validation admin)"""
     # Vérifier qu'il existe une partie active ET non clôturée
-    active_game = db.query(Game).filter(
+    active_game = await db.scalar(select(Game).where(
         Game.date >= datetime.now().date(),
         Game.is_active == True,
         Game.is_closed == False
-    ).order_by(Game.date).first()
+    ).order_by(Game.date).limit(1))
     
     if not active_game:
         raise HTTPException(
@@ -215,8 +246,20 @@ async def create_registration(
     )
     
     db.add(new_registration)
-    db.commit()
-    db.refresh(new_registration)
+    await db.flush()
+    await apply_contributions_delta(db, Contributions(), await registration_contributions(db, [new_registration]))
+    await db.commit()
+    await db.refresh(new_registration)
+    
+    live_events.adjust(PENDING_REGISTRATIONS, +1)
+    live_events.publish("registration_created", {
+        "id": new_registration.id,
+        "game_id": new_registration.game_id,
+        "first_name": new_registration.first_name,
+        "last_name": new_registration.last_name,
+        "nickname": new_registration.nickname,
+        "created_at": new_registration.created_at
+    })
     
     # L'email de confirmation sera envoyé après approbation par l'admin
     # Plus d'envoi automatique ici
@@ -227,12 +270,13 @@ async def create_registration(
 @app.post("/api/registrations/{registration_id}/confirm")
 async def confirm_registration(
     registration_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Confirmer une inscription"""
-    registration = db.query(Registration).filter(
+    # Verrouillée : la contribution "avant" aux statistiques reste celle que l'on remplace
+    registration = await db.scalar(select(Registration).where(
         Registration.id == registration_id
-    ).first()
+    ).with_for_update())
     
     if not registration:
         raise HTTPException(
@@ -240,85 +284,130 @@ async def confirm_registration(
             detail="Inscription non trouvée"
         )
     
+    before = await registration_contributions(db, [registration])
     registration.confirmed = True
-    db.commit()
+    await apply_contributions_delta(db, before, await registration_contributions(db, [registration]))
+    await db.commit()
     
     return {"message": "Inscription confirmée avec succès"}
 
 
 # ===== ENDPOINTS APPROBATION DES INSCRIPTIONS =====
 
+# Relations chargées avec les listes d'inscriptions (une seule requête avec jointures)
+REGISTRATION_LISTING_OPTIONS = (
+    joinedload(Registration.game),
+    joinedload(Registration.nfc_tag),
+    joinedload(Registration.payment_type),
+)
+
+
+def build_registration_response(registration: Registration, pricing: PricingContext) -> RegistrationResponse:
+    """Construit la réponse d'une inscription dont les relations sont déjà chargées"""
+    game = registration.game
+    return RegistrationResponse.model_validate(registration).model_copy(update={
+        "calculated_price": calculate_registration_price(registration, pricing),
+        "nfc_tag_number": registration.nfc_tag.tag_number if registration.nfc_tag else None,
+        "game_name": game.name if game else None,
+        "game_date": game.date if game else None
+    })
+
+
+# Tri des listes d'inscriptions (pagination par curseur)
+REGISTRATION_CURSOR_COLUMNS = (Registration.created_at, Registration.id)
+
+
+def filter_registrations(
+    query,
+    association: Optional[str] = None,
+    attendance_type: Optional[str] = None,
+    search: Optional[str] = None
+):
+    """Filtres communs des listes d'inscriptions (association, type de présence, recherche)"""
+    if association:
+        query = query.where(func.lower(Registration.association_name) == normalize_association_name(association))
+    if attendance_type:
+        query = query.where(Registration.attendance_type == attendance_type)
+    condition = text_search(
+        (Registration.first_name, Registration.last_name, Registration.nickname, Registration.email),
+        search
+    )
+    if condition is not None:
+        query = query.where(condition)
+    return query
+
+
 @app.get("/api/registrations/pending/count")
 async def get_pending_registrations_count(
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Récupérer le nombre d'inscriptions en attente de validation (admin)"""
-    count = db.query(Registration).filter(
+    count = await db.scalar(select(func.count()).select_from(Registration).where(
         Registration.approval_status == "pending"
-    ).count()
+    ))
     
     return {"count": count}
 
 
 @app.get("/api/registrations/pending", response_model=List[RegistrationResponse])
 async def get_pending_registrations(
+    response: Response,
+    game_id: Optional[int] = None,
+    association: Optional[str] = None,
+    attendance_type: Optional[str] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    pricing: PricingContext = Depends(get_pricing_context)
 ):
-    """Récupérer toutes les inscriptions en attente de validation (admin)"""
-    registrations = db.query(Registration).filter(
+    """Récupérer les inscriptions en attente de validation, plus récentes d'abord (admin, paginé)"""
+    query = select(Registration).options(*REGISTRATION_LISTING_OPTIONS).where(
         Registration.approval_status == "pending"
-    ).order_by(Registration.created_at.desc()).all()
-    
-    # Enrichir avec les infos de la partie
-    result = []
-    for reg in registrations:
-        game = db.query(Game).filter(Game.id == reg.game_id).first()
-        
-        reg_dict = {
-            "id": reg.id,
-            "game_id": reg.game_id,
-            "first_name": reg.first_name,
-            "last_name": reg.last_name,
-            "nickname": reg.nickname,
-            "email": reg.email,
-            "phone": reg.phone,
-            "attendance_type": reg.attendance_type,
-            "has_association": reg.has_association,
-            "association_name": reg.association_name,
-            "bb_weight_pistol": reg.bb_weight_pistol,
-            "bb_weight_rifle": reg.bb_weight_rifle,
-            "has_second_rifle": reg.has_second_rifle,
-            "bb_weight_rifle_2": reg.bb_weight_rifle_2,
-            "approval_status": reg.approval_status,
-            "rejection_reason": reg.rejection_reason,
-            "confirmed": reg.confirmed,
-            "was_present": reg.was_present,
-            "payment_validated": reg.payment_validated,
-            "payment_type_id": reg.payment_type_id,
-            "calculated_price": calculate_registration_price(reg, db),
-            "nfc_tag_id": reg.nfc_tag_id,
-            "nfc_tag_number": None,
-            "game_name": game.name if game else None,
-            "game_date": game.date if game else None,
-            "created_at": reg.created_at
-        }
-        result.append(reg_dict)
+    )
+    if game_id is not None:
+        query = query.where(Registration.game_id == game_id)
+    query = filter_registrations(query, association, attendance_type, search)
     
-    return result
+    registrations = (await db.scalars(
+        paginate(query, REGISTRATION_CURSOR_COLUMNS, cursor, limit)
+    )).all()
+    registrations = finish_page(registrations, REGISTRATION_CURSOR_COLUMNS, limit, response)
+    
+    return [build_registration_response(reg, pricing) for reg in registrations]
+
+
+async def claim_pending_registration(db: AsyncSession, registration_id: int, **values):
+    """
+    Change le statut d'une inscription encore en attente (UPDATE conditionnel) ;
+    409 si une autre requête l'a traitée entre la lecture et l'écriture
+    """
+    updated = await db.scalar(
+        update(Registration)
+        .where(Registration.id == registration_id, Registration.approval_status == "pending")
+        .values(**values)
+        .returning(Registration.id)
+        .execution_options(synchronize_session=False)
+    )
+    if updated is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Cette inscription vient d'être traitée par une autre requête"
+        )
 
 
 @app.post("/api/registrations/{registration_id}/approve")
 async def approve_registration(
     registration_id: int,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Approuver une inscription en attente (admin)"""
-    registration = db.query(Registration).filter(
+    registration = await db.scalar(select(Registration).where(
         Registration.id == registration_id
-    ).first()
+    ))
     
     if not registration:
         raise HTTPException(
@@ -333,27 +422,31 @@ async def approve_registration(
         )
     
     # Récupérer la partie associée
-    game = db.query(Game).filter(Game.id == registration.game_id).first()
+    game = await db.scalar(select(Game).where(Game.id == registration.game_id))
     if not game:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Partie non trouvée"
         )
     
-    # Approuver l'inscription
-    registration.approval_status = "approved"
-    db.commit()
-    
-    # Envoyer l'email d'approbation avec le lien de confirmation
-    try:
-        await send_approval_email(
-            email=registration.email,
-            first_name=registration.first_name,
-            game_date=game.date,
-            registration_id=registration.id
-        )
-    except Exception as e:
-        print(f"Erreur envoi email d'approbation: {e}")
+    # Approuver l'inscription et mettre en file l'email d'approbation (même transaction) ;
+    # la condition sur le statut écarte une approbation ou un refus concurrent
+    await claim_pending_registration(db, registration.id, approval_status="approved")
+    await enqueue_email(
+        db,
+        kind="approval",
+        recipient=registration.email,
+        payload={
+            "first_name": registration.first_name,
+            "game_date": game.date,
+            "registration_id": registration.id
+        },
+        dedupe_key=f"approval:{registration.id}",
+        registration_id=registration.id
+    )
+    await db.commit()
+    notify_email_worker()
+    live_events.adjust(PENDING_REGISTRATIONS, -1)
     
     return {"message": "Inscription approuvée avec succès"}
 
@@ -363,12 +456,12 @@ async def reject_registration(
     registration_id: int,
     rejection_data: RegistrationRejectionRequest,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Rejeter une inscription en attente (admin)"""
-    registration = db.query(Registration).filter(
+    registration = await db.scalar(select(Registration).where(
         Registration.id == registration_id
-    ).first()
+    ))
     
     if not registration:
         raise HTTPException(
@@ -383,49 +476,96 @@ async def reject_registration(
         )
     
     # Récupérer la partie associée
-    game = db.query(Game).filter(Game.id == registration.game_id).first()
+    game = await db.scalar(select(Game).where(Game.id == registration.game_id))
     if not game:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Partie non trouvée"
         )
     
-    # Rejeter l'inscription
-    registration.approval_status = "rejected"
-    registration.rejection_reason = rejection_data.rejection_reason
-    db.commit()
-    
-    # Envoyer l'email de rejet
-    try:
-        await send_rejection_email(
-            email=registration.email,
-            first_name=registration.first_name,
-            game_date=game.date,
-            rejection_reason=rejection_data.rejection_reason
-        )
-    except Exception as e:
-        print(f"Erreur envoi email de rejet: {e}")
+    # Rejeter l'inscription et mettre en file l'email de rejet (même transaction) ;
+    # la condition sur le statut écarte une approbation ou un refus concurrent
+    await claim_pending_registration(
+        db, registration.id, approval_status="rejected", rejection_reason=rejection_data.rejection_reason
+    )
+    await enqueue_email(
+        db,
+        kind="rejection",
+        recipient=registration.email,
+        payload={
+            "first_name": registration.first_name,
+            "game_date": game.date,
+            "rejection_reason": rejection_data.rejection_reason
+        },
+        dedupe_key=f"rejection:{registration.id}",
+        registration_id=registration.id
+    )
+    await db.commit()
+    notify_email_worker()
+    live_events.adjust(PENDING_REGISTRATIONS, -1)
     
     return {"message": "Inscription rejetée"}
 
 
+@app.post("/api/registrations/bulk", response_model=BulkRegistrationResponse)
+async def bulk_update_registrations(
+    bulk_request: BulkRegistrationRequest,
+    admin: str = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Appliquer une opération à plusieurs inscriptions en une transaction (admin) :
+    approve, reject (rejection_reason), attendance (was_present),
+    payment (payment_validated) ou payment_type (payment_type_id).
+    Les inscriptions introuvables ou déjà traitées sont signalées sans bloquer le lot.
+    """
+    results, updated_ids = await apply_bulk_action(db, bulk_request)
+    await db.commit()
+    
+    if bulk_request.action in APPROVAL_ACTIONS and updated_ids:
+        notify_email_worker()
+        live_events.adjust(PENDING_REGISTRATIONS, -len(updated_ids))
+    
+    return {
+        "action": bulk_request.action,
+        "updated": len(updated_ids),
+        "results": results
+    }
+
+
 @app.get("/api/games", response_model=List[GameResponse])
 async def get_games(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    skip: Optional[int] = Query(None, ge=0, deprecated=True),
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Récupérer la liste des parties (admin)"""
-    games = db.query(Game).order_by(Game.date.desc()).offset(skip).limit(limit).all()
-    return games
+    """
+    Récupérer la liste des parties, plus récentes d'abord (admin, paginé).
+    skip (OFFSET) reste accepté pour les anciens clients mais est obsolète :
+    suivre l'en-tête X-Next-Cursor avec le paramètre cursor.
+    """
+    columns = (Game.date, Game.id)
+    query = paginate(select(Game), columns, cursor, limit)
+    if skip is not None:
+        if cursor:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Les paramètres skip et cursor sont incompatibles : skip est obsolète, utiliser cursor"
+            )
+        query = query.offset(skip)
+        response.headers["Deprecation"] = "true"
+    games = (await db.scalars(query)).all()
+    return finish_page(games, columns, limit, response)
 
 
 @app.post("/api/games", response_model=GameResponse)
 async def create_game(
     game: GameCreate,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Créer une nouvelle partie (admin)"""
     new_game = Game(
@@ -436,20 +576,34 @@ async def create_game(
     )
     
     db.add(new_game)
-    db.commit()
-    db.refresh(new_game)
+    await db.flush()
+    init_game_stats(db, new_game)
+    await db.commit()
+    await db.refresh(new_game)
     
     return new_game
 
 
 @app.get("/api/games/active", response_model=Optional[GameResponse])
-async def get_active_game(db: Session = Depends(get_db)):
+async def get_active_game(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
     """Récupérer la partie active actuelle (inscriptions ouvertes, date >= aujourd'hui)"""
-    game = db.query(Game).filter(
-        Game.date >= datetime.now().date(),
+    today = datetime.now().date()
+    game = await db.scalar(select(Game).where(
+        Game.date >= today,
         Game.is_active == True,
         Game.is_closed == False
-    ).order_by(Game.date).first()
+    ).order_by(Game.date).limit(1))
+    
+    # La partie active dépend aussi de la date du jour : seul l'ETag la prend en
+    # compte, pas de Last-Modified (If-Modified-Since validerait après minuit ou
+    # après un changement de partie active la version de la veille)
+    if game:
+        etag = make_etag("game", game.id, game.updated_at or game.created_at, today)
+    else:
+        etag = make_etag("no-game", today)
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
     
     return game
 
@@ -458,10 +612,10 @@ async def get_active_game(db: Session = Depends(get_db)):
 async def toggle_game_close(
     game_id: int,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Clôturer ou rouvrir les inscriptions d'une partie (admin)"""
-    game = db.query(Game).filter(Game.id == game_id).first()
+    game = await db.scalar(select(Game).where(Game.id == game_id))
     
     if not game:
         raise HTTPException(
@@ -471,8 +625,8 @@ async def toggle_game_close(
     
     # Basculer l'état de clôture
     game.is_closed = not game.is_closed
-    db.commit()
-    db.refresh(game)
+    await db.commit()
+    await db.refresh(game)
     
     status_text = "clôturée" if game.is_closed else "rouverte"
     return {
@@ -484,60 +638,82 @@ async def toggle_game_close(
 @app.get("/api/games/{game_id}/registrations", response_model=List[RegistrationResponse])
 async def get_game_registrations(
     game_id: int,
+    response: Response,
+    approval_status: str = "approved",
+    association: Optional[str] = None,
+    attendance_type: Optional[str] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    pricing: PricingContext = Depends(get_pricing_context)
 ):
-    """Récupérer les inscriptions approuvées d'une partie (admin)"""
-    # Ne montrer que les inscriptions approuvées dans la liste des parties
-    registrations = db.query(Registration).filter(
+    """Récupérer les inscriptions d'une partie par ordre d'inscription (admin, paginé)"""
+    # Par défaut, ne montrer que les inscriptions approuvées dans la liste des parties
+    query = select(Registration).options(*REGISTRATION_LISTING_OPTIONS).where(
         Registration.game_id == game_id,
-        Registration.approval_status == "approved"
-    ).all()
-    
-    # Récupérer la partie pour les infos
-    game = db.query(Game).filter(Game.id == game_id).first()
-    
-    # Calculer le prix pour chaque inscription
-    result = []
-    for reg in registrations:
-        # Récupérer le numéro du tag si attribué
-        nfc_tag_number = None
-        if reg.nfc_tag_id:
-            tag = db.query(NFCTag).filter(NFCTag.id == reg.nfc_tag_id).first()
-            if tag:
-                nfc_tag_number = tag.tag_number
-        
-        reg_dict = {
-            "id": reg.id,
-            "game_id": reg.game_id,
-            "first_name": reg.first_name,
-            "last_name": reg.last_name,
-            "nickname": reg.nickname,
-            "email": reg.email,
-            "phone": reg.phone,
-            "attendance_type": reg.attendance_type,
-            "has_association": reg.has_association,
-            "association_name": reg.association_name,
-            "bb_weight_pistol": reg.bb_weight_pistol,
-            "bb_weight_rifle": reg.bb_weight_rifle,
-            "has_second_rifle": reg.has_second_rifle,
-            "bb_weight_rifle_2": reg.bb_weight_rifle_2,
-            "approval_status": reg.approval_status,
-            "rejection_reason": reg.rejection_reason,
-            "confirmed": reg.confirmed,
-            "was_present": reg.was_present,
-            "payment_validated": reg.payment_validated,
-            "payment_type_id": reg.payment_type_id,
-            "calculated_price": calculate_registration_price(reg, db),
-            "nfc_tag_id": reg.nfc_tag_id,
-            "nfc_tag_number": nfc_tag_number,
-            "game_name": game.name if game else None,
-            "game_date": game.date if game else None,
-            "created_at": reg.created_at
-        }
-        result.append(reg_dict)
+        Registration.approval_status == approval_status
+    )
+    query = filter_registrations(query, association, attendance_type, search)
     
-    return result
+    registrations = (await db.scalars(
+        paginate(query, REGISTRATION_CURSOR_COLUMNS, cursor, limit, descending=False)
+    )).all()
+    registrations = finish_page(registrations, REGISTRATION_CURSOR_COLUMNS, limit, response)
+    
+    return [build_registration_response(reg, pricing) for reg in registrations]
+
+
+@app.get("/api/games/{game_id}/registrations/export")
+async def export_game_registrations(
+    game_id: int,
+    export_format: str = Query("csv", alias="format", pattern="^(csv|xlsx)$"),
+    approval_status: str = "approved",
+    admin: str = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+    pricing: PricingContext = Depends(get_pricing_context)
+):
+    """Exporter les inscriptions d'une partie en CSV ou XLSX, en flux (admin)"""
+    game = await db.scalar(select(Game).where(Game.id == game_id))
+    if not game:
+        raise HTTPException(status_code=404, detail="Partie non trouvée")
+    
+    query = select(Registration).options(*REGISTRATION_LISTING_OPTIONS).where(
+        Registration.game_id == game_id,
+        Registration.approval_status == approval_status
+    ).order_by(*REGISTRATION_CURSOR_COLUMNS)
+    
+    return export_response(
+        export_format, f"inscriptions-{game.date.isoformat()}", game.name,
+        REGISTRATION_COLUMNS, stream_registration_rows(query, pricing)
+    )
+
+
+@app.get("/api/registrations/export")
+async def export_season_registrations(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|xlsx)$"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    approval_status: str = "approved",
+    admin: str = Depends(get_current_admin),
+    pricing: PricingContext = Depends(get_pricing_context)
+):
+    """Exporter les inscriptions de toutes les parties d'une période (saison) en CSV ou XLSX, en flux (admin)"""
+    query = select(Registration).options(*REGISTRATION_LISTING_OPTIONS).join(
+        Game, Game.id == Registration.game_id
+    ).where(
+        Registration.approval_status == approval_status
+    ).order_by(Game.date, Game.id, *REGISTRATION_CURSOR_COLUMNS)
+    if date_from:
+        query = query.where(Game.date >= date_from)
+    if date_to:
+        query = query.where(Game.date <= date_to)
+    
+    return export_response(
+        export_format, export_filename("inscriptions", date_from, date_to), "Inscriptions",
+        REGISTRATION_COLUMNS, stream_registration_rows(query, pricing)
+    )
 
 
 @app.patch("/api/registrations/{registration_id}/attendance")
@@ -545,12 +721,13 @@ async def update_attendance(
     registration_id: int,
     attendance: AttendanceUpdate,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Mettre à jour la présence d'un joueur (admin)"""
-    registration = db.query(Registration).filter(
+    # Verrouillée : la contribution "avant" aux statistiques reste celle que l'on remplace
+    registration = await db.scalar(select(Registration).where(
         Registration.id == registration_id
-    ).first()
+    ).with_for_update())
     
     if not registration:
         raise HTTPException(
@@ -558,8 +735,10 @@ async def update_attendance(
             detail="Inscription non trouvée"
         )
     
+    before = await registration_contributions(db, [registration])
     registration.was_present = attendance.was_present
-    db.commit()
+    await apply_contributions_delta(db, before, await registration_contributions(db, [registration]))
+    await db.commit()
     
     return {"message": "Présence mise à jour"}
 
@@ -569,12 +748,12 @@ async def update_payment(
     registration_id: int,
     payment_data: dict,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Mettre à jour le statut de paiement (admin)"""
-    registration = db.query(Registration).filter(
+    registration = await db.scalar(select(Registration).where(
         Registration.id == registration_id
-    ).first()
+    ))
     
     if not registration:
         raise HTTPException(
@@ -583,7 +762,7 @@ async def update_payment(
         )
     
     registration.payment_validated = payment_data.get("payment_validated", False)
-    db.commit()
+    await db.commit()
     
     return {"message": "Statut de paiement mis à jour"}
 
@@ -593,12 +772,13 @@ async def update_registration(
     registration_id: int,
     registration_data: RegistrationUpdate,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Mettre à jour une inscription (admin)"""
-    registration = db.query(Registration).filter(
+    # Verrouillée : la contribution "avant" aux statistiques reste celle que l'on remplace
+    registration = await db.scalar(select(Registration).where(
         Registration.id == registration_id
-    ).first()
+    ).with_for_update())
     
     if not registration:
         raise HTTPException(
@@ -607,12 +787,14 @@ async def update_registration(
         )
     
     # Mettre à jour uniquement les champs fournis
+    before = await registration_contributions(db, [registration])
     update_data = registration_data.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(registration, field, value)
+    await apply_contributions_delta(db, before, await registration_contributions(db, [registration]))
     
-    db.commit()
-    db.refresh(registration)
+    await db.commit()
+    await db.refresh(registration)
     
     return registration
 
@@ -621,12 +803,13 @@ async def update_registration(
 async def delete_registration(
     registration_id: int,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Supprimer une inscription (admin)"""
-    registration = db.query(Registration).filter(
+    # Verrouillée : la contribution "avant" aux statistiques reste celle que l'on remplace
+    registration = await db.scalar(select(Registration).where(
         Registration.id == registration_id
-    ).first()
+    ).with_for_update())
     
     if not registration:
         raise HTTPException(
@@ -634,8 +817,13 @@ async def delete_registration(
             detail="Inscription non trouvée"
         )
     
-    db.delete(registration)
-    db.commit()
+    was_pending = registration.approval_status == "pending"
+    before = await registration_contributions(db, [registration])
+    await db.delete(registration)
+    await apply_contributions_delta(db, before, Contributions())
+    await db.commit()
+    if was_pending:
+        live_events.adjust(PENDING_REGISTRATIONS, -1)
     
     return {"message": "Inscription supprimée avec succès"}
 
@@ -644,113 +832,52 @@ async def delete_registration(
 async def get_statistics(
     last_games: int = 10,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    pricing: PricingContext = Depends(get_pricing_context)
 ):
     """Récupérer les statistiques (admin)"""
     # Récupérer les dernières parties
-    games = db.query(Game).order_by(Game.date.desc()).limit(last_games).all()
-    
-    total_registrations = 0
-    total_confirmed = 0
-    total_present = 0
-    total_morning_only = 0
-    total_full_day = 0
-    total_revenue = 0  # Revenu calculé
-    associations = {}
-    
-    for game in games:
-        registrations = db.query(Registration).filter(
-            Registration.game_id == game.id
-        ).all()
-        
-        total_registrations += len(registrations)
-        total_confirmed += sum(1 for r in registrations if r.confirmed)
-        total_present += sum(1 for r in registrations if r.was_present)
-        
-        # Calculer le revenu en fonction des types de paiement et des prix calculés
-        for r in registrations:
-            if r.payment_type_id:
-                payment_type = db.query(PaymentType).filter(PaymentType.id == r.payment_type_id).first()
-                if payment_type and payment_type.generates_cost:
-                    # Utiliser le prix calculé pour chaque inscription
-                    total_revenue += calculate_registration_price(r, db)
-        
-        total_morning_only += sum(1 for r in registrations if r.attendance_type == "morning")
-        total_full_day += sum(1 for r in registrations if r.attendance_type == "full_day")
-        
-        for reg in registrations:
-            if reg.has_association and reg.association_name:
-                associations[reg.association_name] = associations.get(reg.association_name, 0) + 1
+    games = (await db.scalars(select(Game).order_by(Game.date.desc()).limit(last_games))).all()
     
-    return {
-        "total_games": len(games),
-        "total_registrations": total_registrations,
-        "total_confirmed": total_confirmed,
-        "total_present": total_present,
-        "total_revenue": float(total_revenue),
-        "average_per_game": total_registrations / len(games) if games else 0,
-        "morning_only": total_morning_only,
-        "full_day": total_full_day,
-        "top_associations": dict(sorted(associations.items(), key=lambda x: x[1], reverse=True)[:5])
-    }
+    return await compute_global_statistics(db, games, pricing)
 
 
 @app.get("/api/statistics/by-game", response_model=List[GameStatistics])
 async def get_statistics_by_game(
     limit: int = 10,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    pricing: PricingContext = Depends(get_pricing_context)
 ):
     """Récupérer les statistiques par partie (admin)"""
-    games = db.query(Game).order_by(Game.date.desc()).limit(limit).all()
-    
-    stats = []
-    for game in games:
-        registrations = db.query(Registration).filter(
-            Registration.game_id == game.id
-        ).all()
-        
-        associations = {}
-        payments_validated = 0
-        revenue = 0
-        
-        for reg in registrations:
-            if reg.has_association and reg.association_name:
-                associations[reg.association_name] = associations.get(reg.association_name, 0) + 1
-            
-            # Calculer le revenu en fonction des types de paiement et des prix calculés
-            if reg.payment_type_id:
-                payment_type = db.query(PaymentType).filter(PaymentType.id == reg.payment_type_id).first()
-                if payment_type and payment_type.generates_cost:
-                    payments_validated += 1
-                    # Utiliser le prix calculé pour chaque inscription
-                    revenue += calculate_registration_price(reg, db)
-        
-        stats.append({
-            "game_id": game.id,
-            "game_name": game.name,
-            "game_date": game.date,
-            "total_registrations": len(registrations),
-            "confirmed": sum(1 for r in registrations if r.confirmed),
-            "present": sum(1 for r in registrations if r.was_present),
-            "payments_validated": payments_validated,
-            "revenue": float(revenue),
-            "morning_only": sum(1 for r in registrations if r.attendance_type == "morning"),
-            "full_day": sum(1 for r in registrations if r.attendance_type == "full_day"),
-            "associations": associations
-        })
+    games = (await db.scalars(select(Game).order_by(Game.date.desc()).limit(limit))).all()
     
-    return stats
+    return await compute_games_statistics(db, games, pricing)
+
 
+@app.get("/api/statistics/by-game/export")
+async def export_statistics_by_game(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|xlsx)$"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    admin: str = Depends(get_current_admin),
+    pricing: PricingContext = Depends(get_pricing_context)
+):
+    """Exporter les statistiques de chaque partie d'une période en CSV ou XLSX, en flux (admin)"""
+    return export_response(
+        export_format, export_filename("statistiques", date_from, date_to), "Statistiques",
+        STATISTICS_COLUMNS, stream_statistics_rows(pricing, date_from, date_to)
+    )
 
-@app.post("/api/games/{game_id}/send-reminders")
+
+@app.post("/api/games/{game_id}/send-reminders", response_model=ReminderQueueResponse)
 async def send_reminders(
     game_id: int,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Envoyer des rappels pour une partie (admin)"""
-    game = db.query(Game).filter(Game.id == game_id).first()
+    game = await db.scalar(select(Game).where(Game.id == game_id))
     
     if not game:
         raise HTTPException(
@@ -758,30 +885,80 @@ async def send_reminders(
             detail="Partie non trouvée"
         )
     
-    registrations = db.query(Registration).filter(
+    registrations = (await db.scalars(select(Registration).where(
         Registration.game_id == game_id,
         Registration.confirmed == True
-    ).all()
-    
-    sent_count = 0
-    for reg in registrations:
-        try:
-            await send_reminder_email(
-                email=reg.email,
-                first_name=reg.first_name,
-                game_date=game.date
-            )
-            sent_count += 1
-        except Exception as e:
-            print(f"Erreur envoi rappel à {reg.email}: {e}")
+    ))).all()
+    
+    # Mise en file des rappels (un rappel manuel par joueur et par jour au plus)
+    today = datetime.now().date().isoformat()
+    entries = await enqueue_emails(db, [
+        {
+            "kind": "reminder",
+            "recipient": reg.email,
+            "payload": {"first_name": reg.first_name, "game_date": game.date},
+            "dedupe_key": f"reminder:{game.id}:{reg.id}:manual:{today}",
+            "registration_id": reg.id
+        }
+        for reg in registrations
+    ])
+    await db.commit()
+    notify_email_worker()
     
-    return {"message": f"{sent_count} rappels envoyés"}
+    return {
+        "message": f"{len(entries)} rappels en cours d'envoi",
+        "queued": len(entries),
+        "already_queued": len(registrations) - len(entries)
+    }
+
+
+@app.get("/api/games/{game_id}/reminders", response_model=List[ReminderDeliveryResponse])
+async def get_game_reminders(
+    game_id: int,
+    admin: str = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Suivi des rappels automatiques d'une partie, joueur par joueur (admin)"""
+    game = await db.scalar(select(Game.id).where(Game.id == game_id))
+    if not game:
+        raise HTTPException(status_code=404, detail="Partie non trouvée")
+    
+    return await get_reminder_deliveries(db, game_id)
+
+
+@app.post("/api/games/{game_id}/reminders/resume", response_model=ReminderResumeResponse)
+async def resume_game_reminders(
+    game_id: int,
+    admin: str = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Reprendre les rappels automatiques d'une partie déjà traitée par le job (admin) :
+    joueurs confirmés depuis, envois abandonnés après une panne SMTP
+    """
+    game = await db.scalar(select(Game).where(Game.id == game_id))
+    if not game:
+        raise HTTPException(status_code=404, detail="Partie non trouvée")
+    if not game.reminder_sent:
+        raise HTTPException(status_code=409, detail="Les rappels automatiques de cette partie n'ont pas encore été envoyés")
+    if game.date < datetime.now().date():
+        raise HTTPException(status_code=400, detail="La partie est déjà passée")
+    
+    summary = await queue_game_reminders(db, game)
+    await db.commit()
+    if summary["queued"] or summary["retried"]:
+        notify_email_worker()
+    
+    return {
+        "message": f"{summary['queued']} rappels mis en file, {summary['retried']} relancés",
+        **summary
+    }
 
 
 @app.post("/api/send-automatic-reminders")
 async def send_automatic_reminders_endpoint(
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Déclenche manuellement l'envoi des rappels automatiques pour les parties dans 2 jours
@@ -799,6 +976,38 @@ async def send_automatic_reminders_endpoint(
         )
 
 
+@app.get("/api/email-queue", response_model=EmailQueueStatusResponse)
+async def get_email_queue_status(
+    admin: str = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Récupérer l'état de la file d'attente des emails (admin)"""
+    return await get_queue_status(db)
+
+
+@app.post("/api/email-queue/{email_id}/retry", response_model=EmailOutboxResponse)
+async def retry_queued_email(
+    email_id: int,
+    admin: str = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Relancer l'envoi d'un email abandonné (admin)"""
+    entry = await db.scalar(select(EmailOutbox).where(EmailOutbox.id == email_id))
+    if not entry:
+        raise HTTPException(status_code=404, detail="Email non trouvé")
+    
+    if entry.status != "failed":
+        raise HTTPException(status_code=400, detail="Seuls les emails en échec peuvent être relancés")
+    
+    entry.status = "pending"
+    entry.attempts = 0
+    entry.next_attempt_at = datetime.utcnow()
+    await db.commit()
+    await db.refresh(entry)
+    notify_email_worker()
+    return entry
+
+
 @app.post("/api/logo/upload")
 async def upload_logo(
     file: UploadFile = File(...),
@@ -826,10 +1035,17 @@ async def upload_logo(
 
 
 @app.get("/api/logo")
-async def get_logo():
+async def get_logo(request: Request):
     """Récupérer le logo actuel"""
     if LOGO_PATH.exists():
-        return FileResponse(LOGO_PATH)
+        stat = LOGO_PATH.stat()
+        response = FileResponse(LOGO_PATH, stat_result=stat)
+        not_modified = conditional_response(
+            request, response,
+            make_etag("logo", stat.st_mtime_ns, stat.st_size),
+            datetime.utcfromtimestamp(stat.st_mtime)
+        )
+        return not_modified or response
     else:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -851,18 +1067,15 @@ async def delete_logo(admin: str = Depends(get_current_admin)):
 
 
 @app.get("/api/settings", response_model=SiteSettingsResponse)
-async def get_site_settings(db: Session = Depends(get_db)):
+async def get_site_settings(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
     """Récupérer les paramètres du site"""
-    settings = db.query(SiteSettings).first()
-    if not settings:
-        # Créer les paramètres par défaut si ils n'existent pas
-        settings = SiteSettings(
-            site_title="Bienvenue sur le terrain de la LSPA",
-            primary_color="#4CAF50"
-        )
-        db.add(settings)
-        db.commit()
-        db.refresh(settings)
+    settings = await get_cached_site_settings(db)
+    
+    not_modified = conditional_response(
+        request, response, make_etag("settings", settings.id, settings.updated_at), settings.updated_at
+    )
+    if not_modified:
+        return not_modified
     return settings
 
 
@@ -870,10 +1083,10 @@ async def get_site_settings(db: Session = Depends(get_db)):
 async def update_site_settings(
     settings_data: SiteSettingsUpdate,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Mettre à jour les paramètres du site (admin)"""
-    settings = db.query(SiteSettings).first()
+    settings = await db.scalar(select(SiteSettings).limit(1))
     if not settings:
         settings = SiteSettings()
         db.add(settings)
@@ -883,42 +1096,53 @@ async def update_site_settings(
     for field, value in update_data.items():
         setattr(settings, field, value)
     
-    db.commit()
-    db.refresh(settings)
+    await db.commit()
+    await db.refresh(settings)
+    await invalidate_config(SITE_SETTINGS)
     return settings
 
 
 @app.put("/api/admin/change-password")
 async def change_password(
     password_data: ChangePasswordRequest,
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    current_admin: AdminIdentity = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """Changer le mot de passe de l'administrateur"""
+    user = await db.get(User, current_admin.id)
+    
     # Vérifier l'ancien mot de passe
-    if not verify_password(password_data.current_password, current_admin.hashed_password):
+    if not user or not await verify_password_async(password_data.current_password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Mot de passe actuel incorrect"
         )
     
-    # Mettre à jour avec le nouveau mot de passe
-    current_admin.hashed_password = hash_password(password_data.new_password)
-    db.commit()
+    # Mettre à jour avec le nouveau mot de passe ; les tokens déjà émis sont révoqués
+    user.hashed_password = await hash_password_async(password_data.new_password)
+    user.password_changed_at = datetime.utcnow()
+    await db.commit()
+    await invalidate_admin_tokens(user.username)
     
-    return {"message": "Mot de passe mis à jour avec succès"}
+    # Nouveau token pour la session en cours
+    access_token = create_access_token(data={"sub": user.username, "pwd": password_stamp(user)})
+    return {
+        "message": "Mot de passe mis à jour avec succès",
+        "access_token": access_token,
+        "token_type": "bearer"
+    }
 
 
 @app.get("/api/rules", response_model=RulesResponse)
-async def get_rules(db: Session = Depends(get_db)):
+async def get_rules(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
     """Récupérer les règles du terrain"""
-    rules = db.query(Rules).first()
-    if not rules:
-        # Créer les règles par défaut si elles n'existent pas
-        rules = Rules()
-        db.add(rules)
-        db.commit()
-        db.refresh(rules)
+    rules = await get_cached_rules(db)
+    
+    not_modified = conditional_response(
+        request, response, make_etag("rules", rules.id, rules.updated_at), rules.updated_at
+    )
+    if not_modified:
+        return not_modified
     return rules
 
 
@@ -926,10 +1150,10 @@ async def get_rules(db: Session = Depends(get_db)):
 async def update_rules(
     rules_data: RulesUpdate,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Mettre à jour les règles du terrain (admin)"""
-    rules = db.query(Rules).first()
+    rules = await db.scalar(select(Rules).limit(1))
     if not rules:
         rules = Rules()
         db.add(rules)
@@ -939,8 +1163,9 @@ async def update_rules(
     for field, value in update_data.items():
         setattr(rules, field, value)
     
-    db.commit()
-    db.refresh(rules)
+    await db.commit()
+    await db.refresh(rules)
+    await invalidate_config(RULES)
     return rules
 
 
@@ -950,10 +1175,10 @@ async def update_rules(
 
 @app.get("/api/payment-types", response_model=List[PaymentTypeResponse])
 async def get_payment_types(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Récupérer tous les types de paiement"""
-    payment_types = db.query(PaymentType).order_by(PaymentType.name).all()
+    payment_types = (await db.scalars(select(PaymentType).order_by(PaymentType.name))).all()
     return payment_types
 
 
@@ -961,18 +1186,18 @@ async def get_payment_types(
 async def create_payment_type(
     payment_type: PaymentTypeCreate,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Créer un nouveau type de paiement (admin)"""
     # Vérifier si le nom existe déjà
-    existing = db.query(PaymentType).filter(PaymentType.name == payment_type.name).first()
+    existing = await db.scalar(select(PaymentType).where(PaymentType.name == payment_type.name))
     if existing:
         raise HTTPException(status_code=400, detail="Ce type de paiement existe déjà")
     
     new_payment_type = PaymentType(**payment_type.dict())
     db.add(new_payment_type)
-    db.commit()
-    db.refresh(new_payment_type)
+    await db.commit()
+    await db.refresh(new_payment_type)
     return new_payment_type
 
 
@@ -981,25 +1206,33 @@ async def update_payment_type(
     payment_type_id: int,
     payment_type_data: PaymentTypeUpdate,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Mettre à jour un type de paiement (admin)"""
-    payment_type = db.query(PaymentType).filter(PaymentType.id == payment_type_id).first()
+    payment_type = await db.scalar(select(PaymentType).where(PaymentType.id == payment_type_id))
     if not payment_type:
         raise HTTPException(status_code=404, detail="Type de paiement non trouvé")
     
     # Vérifier le nom unique si modifié
     if payment_type_data.name and payment_type_data.name != payment_type.name:
-        existing = db.query(PaymentType).filter(PaymentType.name == payment_type_data.name).first()
+        existing = await db.scalar(select(PaymentType).where(PaymentType.name == payment_type_data.name))
         if existing:
             raise HTTPException(status_code=400, detail="Ce nom existe déjà")
     
     update_data = payment_type_data.dict(exclude_unset=True)
+    generates_cost_changed = (
+        "generates_cost" in update_data and update_data["generates_cost"] != payment_type.generates_cost
+    )
     for field, value in update_data.items():
         setattr(payment_type, field, value)
     
-    db.commit()
-    db.refresh(payment_type)
+    # Les paiements comptés dans les statistiques des parties concernées changent
+    if generates_cost_changed:
+        await db.flush()
+        await rebuild_payment_type_games(db, payment_type_id)
+    
+    await db.commit()
+    await db.refresh(payment_type)
     return payment_type
 
 
@@ -1007,17 +1240,17 @@ async def update_payment_type(
 async def delete_payment_type(
     payment_type_id: int,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Supprimer un type de paiement (admin)"""
-    payment_type = db.query(PaymentType).filter(PaymentType.id == payment_type_id).first()
+    payment_type = await db.scalar(select(PaymentType).where(PaymentType.id == payment_type_id))
     if not payment_type:
         raise HTTPException(status_code=404, detail="Type de paiement non trouvé")
     
     # Vérifier s'il est utilisé
-    registrations_count = db.query(Registration).filter(
+    registrations_count = await db.scalar(select(func.count()).select_from(Registration).where(
         Registration.payment_type_id == payment_type_id
-    ).count()
+    ))
     
     if registrations_count > 0:
         raise HTTPException(
@@ -1025,8 +1258,8 @@ async def delete_payment_type(
             detail=f"Impossible de supprimer: {registrations_count} inscription(s) utilisent ce type"
         )
     
-    db.delete(payment_type)
-    db.commit()
+    await db.delete(payment_type)
+    await db.commit()
     return {"message": "Type de paiement supprimé"}
 
 
@@ -1035,29 +1268,32 @@ async def set_registration_payment_type(
     registration_id: int,
     payment_data: SetPaymentTypeRequest,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Définir le type de paiement d'une inscription (admin)"""
-    registration = db.query(Registration).filter(Registration.id == registration_id).first()
+    # Verrouillée : la contribution "avant" aux statistiques reste celle que l'on remplace
+    registration = await db.scalar(select(Registration).where(Registration.id == registration_id).with_for_update())
     if not registration:
         raise HTTPException(status_code=404, detail="Inscription non trouvée")
     
     # Vérifier que le type de paiement existe
     if payment_data.payment_type_id is not None:
-        payment_type = db.query(PaymentType).filter(
+        payment_type = await db.scalar(select(PaymentType).where(
             PaymentType.id == payment_data.payment_type_id
-        ).first()
+        ))
         if not payment_type:
             raise HTTPException(status_code=404, detail="Type de paiement non trouvé")
         if not payment_type.is_active:
             raise HTTPException(status_code=400, detail="Ce type de paiement est désactivé")
     
+    before = await registration_contributions(db, [registration])
     registration.payment_type_id = payment_data.payment_type_id
     # Mettre à jour payment_validated pour compatibilité
     registration.payment_validated = payment_data.payment_type_id is not None
+    await apply_contributions_delta(db, before, await registration_contributions(db, [registration]))
     
-    db.commit()
-    db.refresh(registration)
+    await db.commit()
+    await db.refresh(registration)
     return {"message": "Type de paiement mis à jour"}
 
 
@@ -1068,10 +1304,10 @@ async def set_registration_payment_type(
 @app.get("/api/partner-associations", response_model=List[PartnerAssociationResponse])
 async def get_partner_associations(
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Récupérer toutes les associations partenaires (admin)"""
-    associations = db.query(PartnerAssociation).order_by(PartnerAssociation.name).all()
+    associations = (await db.scalars(select(PartnerAssociation).order_by(PartnerAssociation.name))).all()
     return associations
 
 
@@ -1079,20 +1315,21 @@ async def get_partner_associations(
 async def create_partner_association(
     association: PartnerAssociationCreate,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Créer une nouvelle association partenaire (admin)"""
     # Vérifier si le nom existe déjà
-    existing = db.query(PartnerAssociation).filter(
+    existing = await db.scalar(select(PartnerAssociation).where(
         PartnerAssociation.name == association.name
-    ).first()
+    ))
     if existing:
         raise HTTPException(status_code=400, detail="Une association avec ce nom existe déjà")
     
     new_association = PartnerAssociation(**association.dict())
     db.add(new_association)
-    db.commit()
-    db.refresh(new_association)
+    await db.commit()
+    await db.refresh(new_association)
+    await invalidate_config(PRICING_CONTEXT)
     return new_association
 
 
@@ -1101,20 +1338,20 @@ async def update_partner_association(
     association_id: int,
     association: PartnerAssociationUpdate,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Mettre à jour une association partenaire (admin)"""
-    db_association = db.query(PartnerAssociation).filter(
+    db_association = await db.scalar(select(PartnerAssociation).where(
         PartnerAssociation.id == association_id
-    ).first()
+    ))
     if not db_association:
         raise HTTPException(status_code=404, detail="Association non trouvée")
     
     # Vérifier si le nouveau nom existe déjà
     if association.name and association.name != db_association.name:
-        existing = db.query(PartnerAssociation).filter(
+        existing = await db.scalar(select(PartnerAssociation).where(
             PartnerAssociation.name == association.name
-        ).first()
+        ))
         if existing:
             raise HTTPException(status_code=400, detail="Une association avec ce nom existe déjà")
     
@@ -1122,8 +1359,9 @@ async def update_partner_association(
     for field, value in association.dict(exclude_unset=True).items():
         setattr(db_association, field, value)
     
-    db.commit()
-    db.refresh(db_association)
+    await db.commit()
+    await db.refresh(db_association)
+    await invalidate_config(PRICING_CONTEXT)
     return db_association
 
 
@@ -1131,17 +1369,18 @@ async def update_partner_association(
 async def delete_partner_association(
     association_id: int,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Supprimer une association partenaire (admin)"""
-    association = db.query(PartnerAssociation).filter(
+    association = await db.scalar(select(PartnerAssociation).where(
         PartnerAssociation.id == association_id
-    ).first()
+    ))
     if not association:
         raise HTTPException(status_code=404, detail="Association non trouvée")
     
-    db.delete(association)
-    db.commit()
+    await db.delete(association)
+    await db.commit()
+    await invalidate_config(PRICING_CONTEXT)
     return {"message": "Association supprimée"}
 
 
@@ -1152,27 +1391,20 @@ async def delete_partner_association(
 @app.get("/api/pricing-settings", response_model=PricingSettingsResponse)
 async def get_pricing_settings(
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Récupérer les paramètres de tarification (admin)"""
-    settings = db.query(PricingSettings).first()
-    if not settings:
-        # Créer les paramètres par défaut si inexistants
-        settings = PricingSettings()
-        db.add(settings)
-        db.commit()
-        db.refresh(settings)
-    return settings
+    return await get_cached_pricing_settings(db)
 
 
 @app.put("/api/pricing-settings", response_model=PricingSettingsResponse)
 async def update_pricing_settings(
     pricing: PricingSettingsUpdate,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Mettre à jour les paramètres de tarification (admin)"""
-    settings = db.query(PricingSettings).first()
+    settings = await db.scalar(select(PricingSettings).limit(1))
     if not settings:
         settings = PricingSettings()
         db.add(settings)
@@ -1181,8 +1413,9 @@ async def update_pricing_settings(
     for field, value in pricing.dict(exclude_unset=True).items():
         setattr(settings, field, value)
     
-    db.commit()
-    db.refresh(settings)
+    await db.commit()
+    await db.refresh(settings)
+    await invalidate_config(PRICING_SETTINGS, PRICING_CONTEXT)
     return settings
 
 
@@ -1193,10 +1426,10 @@ async def update_pricing_settings(
 @app.get("/api/nfc-tags", response_model=List[NFCTagResponse])
 async def get_nfc_tags(
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Récupérer tous les tags NFC (admin)"""
-    tags = db.query(NFCTag).order_by(NFCTag.tag_number).all()
+    tags = (await db.scalars(select(NFCTag).order_by(NFCTag.tag_number))).all()
     return tags
 
 
@@ -1204,20 +1437,20 @@ async def get_nfc_tags(
 async def create_nfc_tag(
     tag: NFCTagCreate,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Créer un nouveau tag NFC (admin)"""
     # Vérifier si le numéro existe déjà
-    existing = db.query(NFCTag).filter(
+    existing = await db.scalar(select(NFCTag).where(
         NFCTag.tag_number == tag.tag_number
-    ).first()
+    ))
     if existing:
         raise HTTPException(status_code=400, detail="Un tag avec ce numéro existe déjà")
     
     new_tag = NFCTag(**tag.dict())
     db.add(new_tag)
-    db.commit()
-    db.refresh(new_tag)
+    await db.commit()
+    await db.refresh(new_tag)
     return new_tag
 
 
@@ -1226,18 +1459,18 @@ async def update_nfc_tag(
     tag_id: int,
     tag: NFCTagUpdate,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Mettre à jour un tag NFC (admin)"""
-    db_tag = db.query(NFCTag).filter(NFCTag.id == tag_id).first()
+    db_tag = await db.scalar(select(NFCTag).where(NFCTag.id == tag_id))
     if not db_tag:
         raise HTTPException(status_code=404, detail="Tag non trouvé")
     
     # Vérifier si le nouveau numéro existe déjà
     if tag.tag_number and tag.tag_number != db_tag.tag_number:
-        existing = db.query(NFCTag).filter(
+        existing = await db.scalar(select(NFCTag).where(
             NFCTag.tag_number == tag.tag_number
-        ).first()
+        ))
         if existing:
             raise HTTPException(status_code=400, detail="Un tag avec ce numéro existe déjà")
     
@@ -1245,8 +1478,8 @@ async def update_nfc_tag(
     for field, value in tag.dict(exclude_unset=True).items():
         setattr(db_tag, field, value)
     
-    db.commit()
-    db.refresh(db_tag)
+    await db.commit()
+    await db.refresh(db_tag)
     return db_tag
 
 
@@ -1254,25 +1487,25 @@ async def update_nfc_tag(
 async def delete_nfc_tag(
     tag_id: int,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Supprimer un tag NFC (admin)"""
-    tag = db.query(NFCTag).filter(NFCTag.id == tag_id).first()
+    tag = await db.scalar(select(NFCTag).where(NFCTag.id == tag_id))
     if not tag:
         raise HTTPException(status_code=404, detail="Tag non trouvé")
     
     # Vérifier si le tag est attribué
-    registration_count = db.query(Registration).filter(
+    registration_count = await db.scalar(select(func.count()).select_from(Registration).where(
         Registration.nfc_tag_id == tag_id
-    ).count()
+    ))
     if registration_count > 0:
         raise HTTPException(
             status_code=400,
             detail=f"Impossible de supprimer ce tag car il est attribué à {registration_count} inscription(s)"
         )
     
-    db.delete(tag)
-    db.commit()
+    await db.delete(tag)
+    await db.commit()
     return {"message": "Tag supprimé"}
 
 
@@ -1281,59 +1514,62 @@ async def assign_nfc_tag(
     registration_id: int,
     tag_data: AssignTagRequest,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Attribuer ou retirer un tag NFC à une inscription (admin)"""
-    registration = db.query(Registration).filter(Registration.id == registration_id).first()
-    if not registration:
-        raise HTTPException(status_code=404, detail="Inscription non trouvée")
+    await assign_tag(db, registration_id, tag_data.nfc_tag_id)
+    await commit_tag_assignment(db)
     
-    # Si on retire le tag
     if tag_data.nfc_tag_id is None:
-        if registration.nfc_tag_id:
-            # Libérer le tag
-            old_tag = db.query(NFCTag).filter(NFCTag.id == registration.nfc_tag_id).first()
-            if old_tag:
-                old_tag.is_available = True
-        registration.nfc_tag_id = None
-        db.commit()
-        db.refresh(registration)
         return {"message": "Tag retiré"}
-    
-    # Vérifier que le tag existe
-    tag = db.query(NFCTag).filter(NFCTag.id == tag_data.nfc_tag_id).first()
-    if not tag:
-        raise HTTPException(status_code=404, detail="Tag non trouvé")
-    
-    if not tag.is_active:
-        raise HTTPException(status_code=400, detail="Ce tag est hors service")
-    
-    if not tag.is_available:
-        raise HTTPException(status_code=400, detail="Ce tag est déjà attribué")
-    
-    # Libérer l'ancien tag si existant
-    if registration.nfc_tag_id:
-        old_tag = db.query(NFCTag).filter(NFCTag.id == registration.nfc_tag_id).first()
-        if old_tag:
-            old_tag.is_available = True
-    
-    # Attribuer le nouveau tag
-    tag.is_available = False
-    registration.nfc_tag_id = tag_data.nfc_tag_id
-    
-    db.commit()
-    db.refresh(registration)
     return {"message": "Tag attribué"}
 
 
+@app.post("/api/registrations/{registration_id}/nfc-tag/auto")
+async def auto_assign_nfc_tag(
+    registration_id: int,
+    admin: str = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Attribuer le prochain tag NFC libre à une inscription (admin)"""
+    tag = await auto_assign_tag(db, registration_id)
+    await commit_tag_assignment(db)
+    return {"message": "Tag attribué", "nfc_tag_id": tag.id, "tag_number": tag.tag_number}
+
+
+@app.post("/api/games/{game_id}/nfc-tags/auto-assign", response_model=GameTagAssignmentResponse)
+async def auto_assign_game_nfc_tags(
+    game_id: int,
+    admin: str = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Attribuer un tag NFC libre à chaque joueur présent d'une partie qui n'en a pas (admin)"""
+    game = await db.scalar(select(Game.id).where(Game.id == game_id))
+    if not game:
+        raise HTTPException(status_code=404, detail="Partie non trouvée")
+    
+    result = await auto_assign_game_tags(db, game_id)
+    await commit_tag_assignment(db)
+    return result
+
+
 # ==========================================
 # RULE VERSIONS - Gestion des versions des règles
 # ==========================================
 
 @app.get("/api/rule-versions", response_model=List[RuleVersionResponse])
-async def get_rule_versions(db: Session = Depends(get_db)):
+async def get_rule_versions(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
     """Récupérer toutes les versions sauvegardées (maximum 3)"""
-    versions = db.query(RuleVersion).order_by(RuleVersion.created_at.desc()).limit(3).all()
+    versions = (await db.scalars(select(RuleVersion).order_by(RuleVersion.created_at.desc()).limit(3))).all()
+    
+    # Les versions ne sont jamais modifiées : la liste des ids suffit
+    not_modified = conditional_response(
+        request, response,
+        make_etag("rule-versions", *(version.id for version in versions)),
+        max((version.created_at for version in versions), default=None)
+    )
+    if not_modified:
+        return not_modified
     return versions
 
 
@@ -1341,11 +1577,11 @@ async def get_rule_versions(db: Session = Depends(get_db)):
 async def create_rule_version(
     version_data: RuleVersionCreate,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Créer une nouvelle version en sauvegardant les règles actuelles (admin)"""
     # Vérifier qu'on ne dépasse pas 3 versions
-    version_count = db.query(RuleVersion).count()
+    version_count = await db.scalar(select(func.count()).select_from(RuleVersion))
     if version_count >= 3:
         raise HTTPException(
             status_code=400, 
@@ -1353,7 +1589,7 @@ async def create_rule_version(
         )
     
     # Récupérer les règles actuelles
-    current_rules = db.query(Rules).first()
+    current_rules = await db.scalar(select(Rules).limit(1))
     if not current_rules:
         raise HTTPException(status_code=404, detail="Aucune règle à sauvegarder")
     
@@ -1374,8 +1610,8 @@ async def create_rule_version(
     )
     
     db.add(new_version)
-    db.commit()
-    db.refresh(new_version)
+    await db.commit()
+    await db.refresh(new_version)
     return new_version
 
 
@@ -1383,15 +1619,15 @@ async def create_rule_version(
 async def apply_rule_version(
     version_id: int,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Appliquer (restaurer) une version des règles (admin)"""
-    version = db.query(RuleVersion).filter(RuleVersion.id == version_id).first()
+    version = await db.scalar(select(RuleVersion).where(RuleVersion.id == version_id))
     if not version:
         raise HTTPException(status_code=404, detail="Version non trouvée")
     
     # Récupérer ou créer les règles actuelles
-    current_rules = db.query(Rules).first()
+    current_rules = await db.scalar(select(Rules).limit(1))
     if not current_rules:
         current_rules = Rules()
         db.add(current_rules)
@@ -1409,8 +1645,9 @@ async def apply_rule_version(
     current_rules.formal_bans = version.formal_bans
     current_rules.important_info = version.important_info
     
-    db.commit()
-    db.refresh(current_rules)
+    await db.commit()
+    await db.refresh(current_rules)
+    await invalidate_config(RULES)
     return {"message": f"Version '{version.version_name}' appliquée avec succès"}
 
 
@@ -1418,15 +1655,15 @@ async def apply_rule_version(
 async def delete_rule_version(
     version_id: int,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Supprimer une version des règles (admin)"""
-    version = db.query(RuleVersion).filter(RuleVersion.id == version_id).first()
+    version = await db.scalar(select(RuleVersion).where(RuleVersion.id == version_id))
     if not version:
         raise HTTPException(status_code=404, detail="Version non trouvée")
     
-    db.delete(version)
-    db.commit()
+    await db.delete(version)
+    await db.commit()
     return {"message": "Version supprimée"}
 
 
@@ -1437,7 +1674,7 @@ async def delete_rule_version(
 @app.post("/api/membership-applications", response_model=MembershipApplicationResponse)
 async def create_membership_application(
     application_data: MembershipApplicationCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Créer une nouvelle candidature d'adhésion (public)"""
     new_application = MembershipApplication(
@@ -1453,32 +1690,54 @@ async def create_membership_application(
     )
     
     db.add(new_application)
-    db.commit()
-    db.refresh(new_application)
+    await db.commit()
+    await db.refresh(new_application)
+    
+    live_events.adjust(PENDING_APPLICATIONS, +1)
+    live_events.publish("application_created", {
+        "id": new_application.id,
+        "first_name": new_application.first_name,
+        "last_name": new_application.last_name,
+        "created_at": new_application.created_at
+    })
     return new_application
 
 
 @app.get("/api/membership-applications", response_model=List[MembershipApplicationResponse])
 async def get_membership_applications(
+    response: Response,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Récupérer toutes les candidatures (admin)"""
-    applications = db.query(MembershipApplication).order_by(
-        MembershipApplication.created_at.desc()
-    ).all()
-    return applications
+    """Récupérer les candidatures, plus récentes d'abord (admin, paginé)"""
+    query = select(MembershipApplication)
+    if status_filter:
+        query = query.where(MembershipApplication.status == status_filter)
+    condition = text_search(
+        (MembershipApplication.first_name, MembershipApplication.last_name, MembershipApplication.email),
+        search
+    )
+    if condition is not None:
+        query = query.where(condition)
+    
+    columns = (MembershipApplication.created_at, MembershipApplication.id)
+    applications = (await db.scalars(paginate(query, columns, cursor, limit))).all()
+    return finish_page(applications, columns, limit, response)
 
 
 @app.get("/api/membership-applications/pending/count")
 async def get_pending_applications_count(
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Récupérer le nombre de candidatures non traitées (admin)"""
-    count = db.query(MembershipApplication).filter(
+    count = await db.scalar(select(func.count()).select_from(MembershipApplication).where(
         MembershipApplication.status == "pending"
-    ).count()
+    ))
     return {"count": count}
 
 
@@ -1487,24 +1746,89 @@ async def update_application_status(
     application_id: int,
     status_data: MembershipApplicationStatusUpdate,
     admin: str = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Mettre à jour le statut d'une candidature (admin)"""
-    application = db.query(MembershipApplication).filter(
+    application = await db.scalar(select(MembershipApplication).where(
         MembershipApplication.id == application_id
-    ).first()
+    ))
     
     if not application:
         raise HTTPException(status_code=404, detail="Candidature non trouvée")
     
+    was_pending = application.status == "pending"
     application.status = status_data.status
-    db.commit()
-    db.refresh(application)
+    await db.commit()
+    await db.refresh(application)
+    if was_pending:
+        live_events.adjust(PENDING_APPLICATIONS, -1)
     
     status_text = "approuvée" if status_data.status == "approved" else "refusée"
     return {"message": f"Candidature {status_text}"}
 
 
+# ==========================================
+# LIVE EVENTS - Flux temps réel du tableau de bord
+# ==========================================
+
+@app.post("/api/events/ticket")
+async def create_events_ticket(
+    current_admin: AdminIdentity = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """Ticket à usage unique pour ouvrir le flux /api/events (admin)"""
+    ticket = await issue_stream_ticket(db, current_admin.id)
+    return {"ticket": ticket, "expires_in": LIVE_EVENTS_TICKET_TTL}
+
+
+@app.get("/api/events")
+async def admin_events(request: Request, ticket: str = Query(...)):
+    """
+    Flux SSE des compteurs en attente et des nouvelles inscriptions (admin).
+    EventSource ne permet pas d'en-tête Authorization : l'URL porte un ticket
+    à usage unique obtenu par POST /api/events/ticket, jamais le token admin.
+    La session est fermée avant le début du flux pour ne pas garder une
+    connexion du pool par tableau de bord ouvert.
+    """
+    async with AsyncSessionLocal() as db:
+        user_id = await consume_stream_ticket(db, ticket)
+        if user_id is None or not await db.scalar(select(User.id).where(User.id == user_id, User.is_admin == True)):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Ticket invalide ou expiré"
+            )
+        await live_events.ensure_counters(db)
+    
+    subscriber = live_events.subscribe()
+    return StreamingResponse(
+        live_events.stream(request, subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ==========================================
+# MÉTRIQUES (PROMETHEUS)
+# ==========================================
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """
+    Métriques du processus au format Prometheus. Hors de /api, la route n'est
+    pas exposée par Caddy ; elle exige le token Bearer METRICS_TOKEN.
+    """
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Token de métriques invalide")
+    
+    update_pool_gauges(async_engine)
+    async with AsyncSessionLocal() as db:
+        await live_events.ensure_counters(db)
+        await update_queue_gauges(db, live_events.counters, live_events.subscriber_count)
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
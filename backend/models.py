@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Text, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -12,10 +12,25 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     is_admin = Column(Boolean, default=True)
+    password_changed_at = Column(DateTime, nullable=True)  # Révoque les tokens émis avant cette date
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+class EventStreamTicket(Base):
+    """
+    Ticket d'ouverture du flux temps réel (/api/events), à usage unique et de
+    courte durée : EventSource ne permet pas d'en-tête Authorization, et un
+    ticket dans l'URL (journaux d'accès) ne vaut pas le token admin
+    """
+    __tablename__ = "event_stream_tickets"
+    
+    id = Column(Integer, primary_key=True)
+    ticket_hash = Column(String, unique=True, nullable=False)  # SHA-256 du ticket (le ticket n'est pas stocké)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
 class Game(Base):
     """Modèle pour les parties d'airsoft"""
     __tablename__ = "games"
@@ -28,8 +43,14 @@ class Game(Base):
     is_closed = Column(Boolean, default=False)  # Inscriptions clôturées
     reminder_sent = Column(Boolean, default=False)  # Rappel automatique envoyé
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     registrations = relationship("Registration", back_populates="game")
+    
+    __table_args__ = (
+        # Liste admin des parties, plus récentes d'abord (pagination par curseur)
+        Index("ix_games_date_id", "date", "id"),
+    )
 
 
 class Registration(Base):
@@ -75,6 +96,22 @@ class Registration(Base):
     game = relationship("Game", back_populates="registrations")
     payment_type = relationship("PaymentType")
     nfc_tag = relationship("NFCTag")
+    
+    # Index des requêtes fréquentes (voir alembic/versions/0001_registration_indexes.py)
+    __table_args__ = (
+        # Inscriptions d'une partie par statut (listes admin, statistiques)
+        Index("ix_registrations_game_status_created", "game_id", "approval_status", "created_at", "id"),
+        # File de validation : inscriptions en attente, les plus récentes d'abord
+        Index("ix_registrations_status_created", "approval_status", "created_at", "id"),
+        # Rappels : inscriptions confirmées d'une partie (index partiel)
+        Index(
+            "ix_registrations_game_confirmed", "game_id",
+            postgresql_where=text("confirmed = true"),
+            sqlite_where=text("confirmed = 1")
+        ),
+        # Un tag NFC n'est porté que par un joueur d'une partie (voir 0005)
+        Index("ux_registrations_game_nfc_tag", "game_id", "nfc_tag_id", unique=True),
+    )
 
 
 class Attendance(Base):
@@ -205,3 +242,62 @@ class MembershipApplication(Base):
     status = Column(String, default="pending")  # pending, approved, rejected
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        # Liste admin des candidatures, avec ou sans filtre de statut (pagination par curseur)
+        Index("ix_membership_applications_created", "created_at", "id"),
+        Index("ix_membership_applications_status_created", "status", "created_at", "id"),
+    )
+
+
+class EmailOutbox(Base):
+    """Modèle pour la file d'attente des emails sortants (outbox)"""
+    __tablename__ = "email_outbox"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # approval, rejection, reminder, confirmation
+    recipient = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # Paramètres du modèle d'email (JSON)
+    dedupe_key = Column(String, unique=True, nullable=True)  # Empêche les doublons (ex: "approval:42")
+    registration_id = Column(Integer, nullable=True, index=True)  # Inscription concernée (sans contrainte, l'inscription peut être supprimée)
+    
+    # Statut d'envoi (pending = à envoyer, sending = en cours, sent = envoyé, failed = abandonné)
+    status = Column(String, default="pending", index=True)
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True)  # Prochain essai (ou fin du verrou si "sending")
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class GameStats(Base):
+    """
+    Compteurs précalculés d'une partie (statistiques), tenus à jour par les
+    endpoints qui modifient les inscriptions (voir game_stats.py).
+    Le revenu n'est pas stocké : il dépend des tarifs et des associations
+    partenaires du moment, et se calcule à partir des compteurs payés.
+    """
+    __tablename__ = "game_stats"
+    
+    game_id = Column(Integer, ForeignKey("games.id"), primary_key=True)
+    total_registrations = Column(Integer, nullable=False, default=0)
+    confirmed = Column(Integer, nullable=False, default=0)
+    present = Column(Integer, nullable=False, default=0)
+    morning_only = Column(Integer, nullable=False, default=0)
+    full_day = Column(Integer, nullable=False, default=0)
+    payments_validated = Column(Integer, nullable=False, default=0)  # Type de paiement qui génère un coût
+    paid_freelance = Column(Integer, nullable=False, default=0)  # Payés au tarif freelance (hors invités)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class GameAssociationStats(Base):
+    """Compteurs précalculés d'une association dans une partie"""
+    __tablename__ = "game_association_stats"
+    
+    game_id = Column(Integer, ForeignKey("games.id"), primary_key=True)
+    association_name = Column(String, primary_key=True)
+    registrations = Column(Integer, nullable=False, default=0)
+    paid = Column(Integer, nullable=False, default=0)  # Payés au tarif association (hors invités)
+    first_registration_id = Column(Integer, nullable=False)  # Ordre de première apparition
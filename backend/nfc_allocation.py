@@ -0,0 +1,176 @@
+"""
+Attribution des tags NFC Lightning
+Plusieurs postes d'accueil peuvent attribuer des bracelets en même temps :
+un tag n'est réservé que par un UPDATE conditionnel (is_available = true) et
+les tags libres sont sélectionnés avec SELECT ... FOR UPDATE SKIP LOCKED,
+si bien que deux postes ne prennent jamais le même tag et ne s'attendent pas.
+L'index unique (game_id, nfc_tag_id) sur les inscriptions garantit en
+dernier recours qu'un tag n'est porté que par un joueur d'une partie.
+
+Hors PostgreSQL (SQLite), FOR UPDATE est ignoré : les écritures y sont de
+toute façon sérialisées et l'UPDATE conditionnel suffit.
+"""
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import NFCTag, Registration
+
+# Tentatives de réservation quand un autre poste a pris les tags sélectionnés
+CLAIM_ATTEMPTS = 3
+
+
+async def lock_registration(db: AsyncSession, registration_id: int) -> Registration:
+    """Charge une inscription en la verrouillant jusqu'au commit"""
+    registration = await db.scalar(
+        select(Registration).where(Registration.id == registration_id).with_for_update()
+    )
+    if not registration:
+        raise HTTPException(status_code=404, detail="Inscription non trouvée")
+    return registration
+
+
+async def claim_tag(db: AsyncSession, tag_id: int) -> NFCTag:
+    """Réserve un tag précis ; erreur s'il est introuvable, hors service ou déjà pris"""
+    claimed = await db.scalar(
+        update(NFCTag)
+        .where(NFCTag.id == tag_id, NFCTag.is_available == True, NFCTag.is_active == True)
+        .values(is_available=False)
+        .returning(NFCTag.id)
+        .execution_options(synchronize_session=False)
+    )
+    tag = await db.get(NFCTag, tag_id, populate_existing=True)
+    if claimed is not None:
+        return tag
+
+    if not tag:
+        raise HTTPException(status_code=404, detail="Tag non trouvé")
+    if not tag.is_active:
+        raise HTTPException(status_code=400, detail="Ce tag est hors service")
+    raise HTTPException(status_code=400, detail="Ce tag est déjà attribué")
+
+
+async def claim_free_tags(db: AsyncSession, count: int) -> List[NFCTag]:
+    """
+    Réserve jusqu'à `count` tags libres et actifs, par numéro croissant.
+    Les tags en cours de réservation par un autre poste sont sautés.
+    """
+    claimed: List[NFCTag] = []
+    for _ in range(CLAIM_ATTEMPTS):
+        wanted = count - len(claimed)
+        if wanted <= 0:
+            break
+        candidate_ids = (await db.scalars(
+            select(NFCTag.id)
+            .where(NFCTag.is_available == True, NFCTag.is_active == True)
+            .order_by(NFCTag.tag_number, NFCTag.id)
+            .limit(wanted)
+            .with_for_update(skip_locked=True)
+        )).all()
+        if not candidate_ids:
+            break
+        claimed_ids = set((await db.scalars(
+            update(NFCTag)
+            .where(NFCTag.id.in_(candidate_ids), NFCTag.is_available == True)
+            .values(is_available=False)
+            .returning(NFCTag.id)
+            .execution_options(synchronize_session=False)
+        )).all())
+        claimed.extend((await db.scalars(
+            select(NFCTag)
+            .where(NFCTag.id.in_(claimed_ids))
+            .order_by(NFCTag.tag_number, NFCTag.id)
+            .execution_options(populate_existing=True)
+        )).all() if claimed_ids else [])
+        # Tous les candidats obtenus : inutile de recommencer
+        if len(claimed_ids) == len(candidate_ids):
+            break
+    return claimed
+
+
+async def release_tag(db: AsyncSession, tag_id: Optional[int]):
+    """Rend un tag disponible"""
+    if tag_id is None:
+        return
+    await db.execute(
+        update(NFCTag)
+        .where(NFCTag.id == tag_id)
+        .values(is_available=True)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def assign_tag(db: AsyncSession, registration_id: int, tag_id: Optional[int]) -> Optional[NFCTag]:
+    """Attribue un tag précis à une inscription (None = retirer le tag), sans commit"""
+    registration = await lock_registration(db, registration_id)
+    if tag_id is not None and registration.nfc_tag_id == tag_id:
+        return await db.get(NFCTag, tag_id)
+
+    tag = await claim_tag(db, tag_id) if tag_id is not None else None
+    await release_tag(db, registration.nfc_tag_id)
+    registration.nfc_tag_id = tag_id
+    return tag
+
+
+async def auto_assign_tag(db: AsyncSession, registration_id: int) -> NFCTag:
+    """
+    Attribue le prochain tag libre à une inscription, sans commit. Une
+    inscription qui a déjà un tag le conserve (double clic, second poste).
+    """
+    registration = await lock_registration(db, registration_id)
+    if registration.nfc_tag_id is not None:
+        return await db.get(NFCTag, registration.nfc_tag_id)
+
+    tags = await claim_free_tags(db, 1)
+    if not tags:
+        raise HTTPException(status_code=409, detail="Aucun tag disponible")
+    registration.nfc_tag_id = tags[0].id
+    return tags[0]
+
+
+async def auto_assign_game_tags(db: AsyncSession, game_id: int) -> Dict:
+    """
+    Attribue un tag libre à chaque joueur présent d'une partie qui n'en a pas,
+    sans commit. Les inscriptions verrouillées par un autre poste sont laissées
+    à ce poste ; s'il n'y a pas assez de tags, les joueurs restants sont comptés.
+    """
+    registration_ids = (await db.scalars(
+        select(Registration.id)
+        .where(
+            Registration.game_id == game_id,
+            Registration.approval_status == "approved",
+            Registration.was_present == True,
+            Registration.nfc_tag_id.is_(None)
+        )
+        .order_by(Registration.last_name, Registration.first_name, Registration.id)
+        .with_for_update(skip_locked=True)
+    )).all()
+
+    tags = await claim_free_tags(db, len(registration_ids)) if registration_ids else []
+    assignments = list(zip(registration_ids, tags))
+    if assignments:
+        # Une seule requête (executemany) pour toutes les inscriptions
+        await db.execute(
+            update(Registration),
+            [{"id": registration_id, "nfc_tag_id": tag.id} for registration_id, tag in assignments]
+        )
+
+    return {
+        "assigned": [
+            {"registration_id": registration_id, "nfc_tag_id": tag.id, "tag_number": tag.tag_number}
+            for registration_id, tag in assignments
+        ],
+        "without_tag": len(registration_ids) - len(assignments)
+    }
+
+
+async def commit_tag_assignment(db: AsyncSession):
+    """Commit d'une attribution ; l'index unique (partie, tag) est le dernier garde-fou"""
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Ce tag est déjà attribué dans cette partie")
@@ -0,0 +1,97 @@
+"""
+Pagination par curseur (keyset) des listes de l'API
+Une page est lue avec WHERE (colonnes de tri) < (valeurs du dernier élément)
+au lieu d'un OFFSET : le coût d'une page reste constant quelle que soit sa
+position et la taille de la table. Le curseur de la page suivante est renvoyé
+dans l'en-tête X-Next-Cursor (absent sur la dernière page).
+"""
+from datetime import date, datetime
+from typing import List, Optional, Sequence
+import base64
+import json
+import os
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import or_, tuple_
+from sqlalchemy.sql import Select
+
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", 100))  # Éléments par page si limit n'est pas précisé
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", 500))  # Taille de page maximale acceptée
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _encode_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(value, column):
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Encode les valeurs de tri du dernier élément d'une page"""
+    raw = json.dumps([_encode_value(value) for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> List:
+    """Décode un curseur en valeurs typées selon les colonnes de tri"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        return [_decode_value(value, column) for value, column in zip(values, columns)]
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Curseur de pagination invalide"
+        )
+
+
+def paginate(
+    query: Select,
+    columns: Sequence,
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = True
+) -> Select:
+    """
+    Trie la requête sur `columns` (la dernière doit être unique, en général id)
+    et la limite à la page demandée. Une ligne de plus est lue pour savoir s'il
+    existe une page suivante (voir finish_page).
+    """
+    if cursor:
+        key = tuple_(*columns)
+        last = tuple_(*decode_cursor(cursor, columns))
+        query = query.where(key < last if descending else key > last)
+    order = [column.desc() if descending else column.asc() for column in columns]
+    return query.order_by(*order).limit(limit + 1)
+
+
+def finish_page(rows: Sequence, columns: Sequence, limit: int, response: Response) -> List:
+    """Retire la ligne de contrôle et renseigne l'en-tête X-Next-Cursor"""
+    rows = list(rows)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            [getattr(last, column.key) for column in columns]
+        )
+    return rows
+
+
+def text_search(columns: Sequence, term: Optional[str]):
+    """Condition de recherche insensible à la casse sur plusieurs colonnes"""
+    term = (term or "").strip()
+    if not term:
+        return None
+    return or_(*(column.icontains(term, autoescape=True) for column in columns))
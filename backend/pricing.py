@@ -0,0 +1,108 @@
+"""
+Contexte de tarification
+Charge les tarifs et les associations partenaires actives (mis en cache par
+config_cache), pour calculer le prix de N inscriptions sans requête
+supplémentaire.
+"""
+from typing import FrozenSet, Optional
+
+from fastapi import Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config_cache import config_cache, PRICING_CONTEXT, PRICING_SETTINGS
+from database import get_db
+from models import Registration, PartnerAssociation, PricingSettings
+from schemas import PricingSettingsResponse
+
+
+def normalize_association_name(name: Optional[str]) -> str:
+    """Normalise un nom d'association pour une comparaison insensible à la casse"""
+    return (name or "").lower()
+
+
+class PricingContext:
+    """Tarifs de la PAF et noms normalisés des associations partenaires actives"""
+
+    def __init__(
+        self,
+        partner_association_price: int,
+        other_association_price: int,
+        freelance_price: int,
+        partner_names: FrozenSet[str]
+    ):
+        self.partner_association_price = partner_association_price
+        self.other_association_price = other_association_price
+        self.freelance_price = freelance_price
+        self.partner_names = partner_names
+
+    def is_partner(self, association_name: Optional[str]) -> bool:
+        """Indique si l'association est une association partenaire active"""
+        return normalize_association_name(association_name) in self.partner_names
+
+
+def calculate_registration_price(registration: Registration, pricing: PricingContext) -> int:
+    """
+    Calcule le prix d'une inscription selon les règles :
+    - Invité (attendance_type = 'invited') : 0€
+    - Association partenaire : tarif association partenaire (défaut 5€)
+    - Autre association : tarif autre association (défaut 7€)
+    - Freelance (pas d'association) : tarif freelance (défaut 9€)
+    """
+    # Si c'est un invité, le prix est de 0€
+    if registration.attendance_type == 'invited':
+        return 0
+
+    # Si pas d'association, c'est un freelance
+    if not registration.has_association or not registration.association_name:
+        return pricing.freelance_price
+
+    if pricing.is_partner(registration.association_name):
+        return pricing.partner_association_price
+    else:
+        return pricing.other_association_price
+
+
+async def get_or_create_pricing_settings(db: AsyncSession) -> PricingSettings:
+    """Récupère les paramètres de tarification (créés avec les valeurs par défaut si absents)"""
+    pricing_settings = await db.scalar(select(PricingSettings).limit(1))
+    if not pricing_settings:
+        pricing_settings = PricingSettings()
+        db.add(pricing_settings)
+        await db.commit()
+        await db.refresh(pricing_settings)
+    return pricing_settings
+
+
+async def load_pricing_context(db: AsyncSession) -> PricingContext:
+    """Charge le contexte de tarification (2 requêtes)"""
+    pricing_settings = await get_or_create_pricing_settings(db)
+    partner_names = (await db.scalars(
+        select(PartnerAssociation.name).where(PartnerAssociation.is_active == True)
+    )).all()
+
+    return PricingContext(
+        partner_association_price=pricing_settings.partner_association_price,
+        other_association_price=pricing_settings.other_association_price,
+        freelance_price=pricing_settings.freelance_price,
+        partner_names=frozenset(normalize_association_name(name) for name in partner_names)
+    )
+
+
+async def _load_pricing_settings_snapshot(db: AsyncSession) -> PricingSettingsResponse:
+    return PricingSettingsResponse.model_validate(await get_or_create_pricing_settings(db))
+
+
+async def get_cached_pricing_settings(db: AsyncSession) -> PricingSettingsResponse:
+    """Paramètres de tarification (cache de configuration)"""
+    return await config_cache.get(PRICING_SETTINGS, db, _load_pricing_settings_snapshot)
+
+
+async def get_cached_pricing_context(db: AsyncSession) -> PricingContext:
+    """Contexte de tarification (cache de configuration)"""
+    return await config_cache.get(PRICING_CONTEXT, db, load_pricing_context)
+
+
+async def get_pricing_context(db: AsyncSession = Depends(get_db)) -> PricingContext:
+    """Dépendance FastAPI : contexte de tarification, servi depuis le cache"""
+    return await get_cached_pricing_context(db)
@@ -0,0 +1,169 @@
+"""
+Instrumentation des requêtes SQL par requête HTTP
+Les événements du moteur (installés par database.py) comptent les requêtes
+SQL exécutées pendant chaque requête HTTP, leur durée cumulée et la plus
+lente. Le middleware expose ces mesures dans l'en-tête Server-Timing (visible
+dans l'onglet Réseau du navigateur) et journalise en JSON les requêtes qui
+dépassent le budget de requêtes SQL ou de durée : une boucle N+1 apparaît
+ainsi dès le développement.
+
+Le texte des requêtes SQL est journalisé sans ses paramètres (données
+personnelles des joueurs).
+"""
+from contextvars import ContextVar
+from typing import Dict, Optional
+import json
+import logging
+import os
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+QUERY_METRICS_ENABLED = os.getenv("QUERY_METRICS_ENABLED", "true").lower() == "true"  # Mesure et en-tête Server-Timing
+QUERY_BUDGET_COUNT = int(os.getenv("QUERY_BUDGET_COUNT", 20))  # Requêtes SQL par requête HTTP au-delà desquelles on alerte
+QUERY_BUDGET_MS = float(os.getenv("QUERY_BUDGET_MS", 500))  # Durée d'une requête HTTP au-delà de laquelle on alerte (ms)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))  # Durée d'une requête SQL journalisée comme lente (ms)
+QUERY_METRICS_LOG_ALL = os.getenv("QUERY_METRICS_LOG_ALL", "false").lower() == "true"  # Journalise toutes les requêtes HTTP
+
+STATEMENT_LOG_LENGTH = 300  # Caractères de requête SQL conservés dans les journaux
+
+
+class QueryStats:
+    """Requêtes SQL d'une requête HTTP"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0  # secondes
+        self.slowest_duration = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    def add(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        if duration > self.slowest_duration:
+            self.slowest_duration = duration
+            self.slowest_statement = statement
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def _short_statement(statement: str) -> str:
+    statement = " ".join(statement.split())
+    if len(statement) > STATEMENT_LOG_LENGTH:
+        return statement[:STATEMENT_LOG_LENGTH] + "…"
+    return statement
+
+
+def install_query_hooks(engine: Engine):
+    """
+    Chronomètre chaque requête SQL du moteur (pour un moteur asynchrone :
+    async_engine.sync_engine). Le contexte de la requête HTTP en cours est
+    propagé par SQLAlchemy jusqu'aux événements.
+    """
+    if not QUERY_METRICS_ENABLED:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_start"].pop()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.add(statement, duration)
+        if duration * 1000 >= SLOW_QUERY_MS:
+            logger.warning(json.dumps({
+                "event": "slow_query",
+                "duration_ms": round(duration * 1000, 1),
+                "statement": _short_statement(statement),
+            }, ensure_ascii=False))
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        # Requête en erreur : pas d'after_cursor_execute, on retire son chronomètre
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+
+
+def server_timing(stats: QueryStats, elapsed: float) -> str:
+    """Valeur de l'en-tête Server-Timing (durées en millisecondes)"""
+    return (
+        f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} SQL", '
+        f"db-slowest;dur={stats.slowest_duration * 1000:.1f}, "
+        f"app;dur={elapsed * 1000:.1f}"
+    )
+
+
+class QueryMetricsMiddleware:
+    """
+    Middleware ASGI : mesure les requêtes SQL de chaque requête HTTP.
+    L'en-tête Server-Timing reflète le travail fait avant l'envoi des en-têtes ;
+    le journal, écrit en fin de réponse, inclut celui fait pendant un envoi en flux
+    (exports). Les flux temps réel (text/event-stream) ne sont pas soumis au budget.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not QUERY_METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        response: Dict = {"status": 500, "event_stream": False}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing(stats, time.perf_counter() - start))
+                response["status"] = message["status"]
+                response["event_stream"] = headers.get("content-type", "").startswith("text/event-stream")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_stats.reset(token)
+            if not response["event_stream"]:
+                _log_request(scope, response["status"], stats, time.perf_counter() - start)
+
+
+def _log_request(scope, status: int, stats: QueryStats, elapsed: float):
+    """Journal JSON de la requête ; niveau WARNING si elle dépasse un budget"""
+    over_budget = []
+    if stats.count > QUERY_BUDGET_COUNT:
+        over_budget.append("query_count")
+    if elapsed * 1000 > QUERY_BUDGET_MS:
+        over_budget.append("duration")
+    if not over_budget and not QUERY_METRICS_LOG_ALL:
+        return
+
+    route = scope.get("route")
+    record = {
+        "event": "request_over_budget" if over_budget else "request",
+        "method": scope["method"],
+        "path": scope["path"],
+        "route": getattr(route, "path", None),
+        "status": status,
+        "duration_ms": round(elapsed * 1000, 1),
+        "db_queries": stats.count,
+        "db_time_ms": round(stats.duration * 1000, 1),
+        "slowest_query_ms": round(stats.slowest_duration * 1000, 1),
+        "slowest_query": _short_statement(stats.slowest_statement) if stats.slowest_statement else None,
+    }
+    if over_budget:
+        record["over_budget"] = over_budget
+        logger.warning(json.dumps(record, ensure_ascii=False))
+    else:
+        logger.info(json.dumps(record, ensure_ascii=False))
@@ -0,0 +1,39 @@
+"""
+Vérifie et corrige les statistiques précalculées des parties (game_stats)
+
+Recalcule les compteurs de chaque partie depuis ses inscriptions et les
+compare aux compteurs tenus à jour par l'application ; les parties en écart
+(ou sans compteurs) sont réécrites.
+
+Usage : python rebuild_game_stats.py [--check] [game_id ...]
+  --check : signale les écarts sans rien modifier (code de sortie 1 si écart)
+"""
+import asyncio
+import sys
+
+from database import AsyncSessionLocal, async_engine
+from game_stats import rebuild_game_stats
+
+
+async def main(args) -> int:
+    check_only = "--check" in args
+    game_ids = [int(arg) for arg in args if arg != "--check"] or None
+
+    async with AsyncSessionLocal() as db:
+        drifted = await rebuild_game_stats(db, game_ids, repair=not check_only)
+        if not check_only:
+            await db.commit()
+    await async_engine.dispose()
+
+    if not drifted:
+        print("✅ Statistiques des parties à jour")
+        return 0
+    if check_only:
+        print(f"❌ {len(drifted)} partie(s) en écart : {', '.join(map(str, drifted))}")
+        return 1
+    print(f"🔧 {len(drifted)} partie(s) corrigée(s) : {', '.join(map(str, drifted))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
@@ -1,98 +1,258 @@
 """
 Scheduler pour les tâches automatiques
 Utilise APScheduler pour exécuter les rappels automatiques tous les jours
+
+Avec plusieurs workers uvicorn (ou plusieurs conteneurs) sur PostgreSQL, un
+seul processus exécute les tâches planifiées : celui qui obtient le verrou
+consultatif SCHEDULER_LOCK_ID, gardé sur une connexion dédiée. Si ce
+processus s'arrête ou perd sa connexion, le verrou est libéré et un autre
+worker prend le relais au plus SCHEDULER_LEADER_RETRY secondes plus tard.
+Chaque partie est de plus réservée par un UPDATE conditionnel sur
+reminder_sent avant la mise en file de ses rappels.
+
+Le rappel de chaque joueur est suivi par son entrée de la file d'emails
+(clé reminder:{partie}:{inscription}:auto : statut, essais, dernière erreur,
+date d'envoi). Le job traite les parties dans 2 jours sans rappel envoyé et
+relance les rappels abandonnés (failed) des parties déjà traitées encore à
+venir. Une partie déjà traitée peut aussi être reprise à la demande (POST
+/api/games/{id}/reminders/resume) : les joueurs confirmés depuis sont ajoutés.
 """
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.schedulers.base import STATE_PAUSED, STATE_RUNNING, STATE_STOPPED
 from apscheduler.triggers.cron import CronTrigger
 from datetime import datetime, date, timedelta
-from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 import asyncio
 import logging
+import os
+import time
 
-from database import SessionLocal
-from models import Game, Registration
-from email_service import send_reminder_email
+from app_metrics import SCHEDULER_LEADER, record_job_run
+from database import AsyncSessionLocal, async_engine, connect_dedicated
+from models import Game, Registration, EmailOutbox
+from email_queue import enqueue_emails, notify_email_worker
 
 # Configuration du logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"  # false : ce processus n'exécute jamais les tâches planifiées
+SCHEDULER_LEADER_RETRY = float(os.getenv("SCHEDULER_LEADER_RETRY", 30))  # Intervalle de tentative / vérification du verrou (secondes)
+SCHEDULER_LOCK_ID = 7214001  # Clé du verrou consultatif PostgreSQL (pg_try_advisory_lock)
+
 # Instance du scheduler
 scheduler = AsyncIOScheduler()
 
+_election_task: Optional[asyncio.Task] = None
+_election_stop: Optional[asyncio.Event] = None
+
+
+async def claim_game_reminder(db, game_id: int) -> bool:
+    """
+    Réserve l'envoi du rappel automatique d'une partie (reminder_sent passe à
+    true) ; False si un autre processus l'a déjà fait. La réservation est
+    validée avec la mise en file des rappels, dans la même transaction.
+    """
+    claimed = await db.scalar(
+        update(Game)
+        .where(Game.id == game_id, Game.reminder_sent == False)
+        .values(reminder_sent=True)
+        .returning(Game.id)
+        .execution_options(synchronize_session=False)
+    )
+    return claimed is not None
+
+
+def reminder_dedupe_key(game_id: int, registration_id: int) -> str:
+    """Clé du rappel automatique d'un joueur : son entrée de la file sert de suivi d'envoi"""
+    return f"reminder:{game_id}:{registration_id}:auto"
+
+
+async def queue_game_reminders(db: AsyncSession, game) -> Dict[str, int]:
+    """
+    Met en file les rappels automatiques d'une partie, sans commit. Idempotent :
+    seuls les joueurs confirmés sans rappel en file sont ajoutés, et les rappels
+    abandonnés (failed) repartent pour un cycle complet d'essais. Une exécution
+    interrompue reprend donc là où elle s'était arrêtée.
+    """
+    registrations = (await db.execute(select(
+        Registration.id, Registration.email, Registration.first_name
+    ).where(
+        Registration.game_id == game.id,
+        Registration.confirmed == True
+    ))).all()
+    if not registrations:
+        return {"queued": 0, "retried": 0, "in_progress": 0, "sent": 0}
+
+    keys = [reminder_dedupe_key(game.id, reg.id) for reg in registrations]
+    deliveries = {
+        entry.dedupe_key: entry
+        for entry in (await db.scalars(select(EmailOutbox).where(EmailOutbox.dedupe_key.in_(keys)))).all()
+    }
+
+    now = datetime.utcnow()
+    retried = 0
+    for entry in deliveries.values():
+        if entry.status == "failed":
+            entry.status = "pending"
+            entry.attempts = 0
+            entry.next_attempt_at = now
+            retried += 1
+
+    entries = await enqueue_emails(db, [
+        {
+            "kind": "reminder",
+            "recipient": reg.email,
+            "payload": {"first_name": reg.first_name, "game_date": game.date},
+            "dedupe_key": key,
+            "registration_id": reg.id
+        }
+        for reg, key in zip(registrations, keys) if key not in deliveries
+    ])
+    sent = sum(1 for entry in deliveries.values() if entry.status == "sent")
+    return {
+        "queued": len(entries),
+        "retried": retried,
+        "in_progress": len(deliveries) - sent - retried,
+        "sent": sent
+    }
+
+
+async def retry_failed_reminders(db: AsyncSession, today: date, target_date: date) -> int:
+    """
+    Relance les rappels automatiques abandonnés (failed) des parties déjà
+    traitées et encore à venir (jusqu'à target_date), sans commit : une panne
+    SMTP plus longue que le cycle d'essais du worker est rattrapée au passage
+    suivant du job. Retourne le nombre de rappels relancés.
+    """
+    now = datetime.utcnow()
+    retried = await db.execute(
+        update(EmailOutbox)
+        .where(
+            EmailOutbox.status == "failed",
+            EmailOutbox.kind == "reminder",
+            EmailOutbox.dedupe_key.like("reminder:%:auto"),
+            EmailOutbox.registration_id.in_(
+                select(Registration.id).join(Game, Game.id == Registration.game_id).where(
+                    Game.reminder_sent == True,
+                    Game.date > today,
+                    Game.date <= target_date
+                )
+            )
+        )
+        .values(status="pending", attempts=0, next_attempt_at=now, updated_at=now)
+        .returning(EmailOutbox.id)
+        .execution_options(synchronize_session=False)
+    )
+    return len(retried.all())
+
 
 async def send_automatic_reminders_job():
     """
     Job qui envoie les rappels automatiques pour les parties dans 2 jours
     Exécuté tous les jours à 9h00 par le scheduler
+
+    Les rappels abandonnés des parties déjà traitées et encore à venir sont
+    relancés au passage. Durée et résultat sont exposés sur /metrics.
     """
-    db = SessionLocal()
-    try:
-        # Date dans 2 jours
-        target_date = date.today() + timedelta(days=2)
-        
-        logger.info(f"🔍 Recherche des parties du {target_date.strftime('%d/%m/%Y')}...")
-        
-        # Trouver les parties dans 2 jours qui n'ont pas encore reçu de rappel
-        games = db.query(Game).filter(
-            Game.date == target_date,
-            Game.reminder_sent == False
-        ).all()
-        
-        if not games:
-            logger.info(f"✓ Aucune partie trouvée pour le {target_date.strftime('%d/%m/%Y')} nécessitant un rappel")
-            return
-        
-        logger.info(f"📧 {len(games)} partie(s) trouvée(s), envoi des rappels...")
-        
-        for game in games:
-            logger.info(f"📅 Traitement de la partie: {game.name} ({game.date.strftime('%d/%m/%Y')})")
+    started = time.perf_counter()
+    succeeded = await _send_automatic_reminders()
+    record_job_run("send_automatic_reminders", time.perf_counter() - started, "success" if succeeded else "error")
+
+
+async def _send_automatic_reminders() -> bool:
+    """Traitement du job ; False en cas d'erreur (journalisée)"""
+    async with AsyncSessionLocal() as db:
+        try:
+            # Date dans 2 jours
+            today = date.today()
+            target_date = today + timedelta(days=2)
             
-            # Récupérer les inscriptions confirmées
-            registrations = db.query(Registration).filter(
-                Registration.game_id == game.id,
-                Registration.confirmed == True
-            ).all()
+            # Rappels abandonnés (panne SMTP plus longue que les essais du worker)
+            retried = await retry_failed_reminders(db, today, target_date)
+            await db.commit()
+            if retried:
+                notify_email_worker()
+                logger.info(f"🔁 {retried} rappel(s) abandonné(s) relancé(s)")
             
-            if not registrations:
-                logger.warning(f"⚠️  Aucune inscription confirmée pour cette partie")
-                game.reminder_sent = True
-                db.commit()
-                continue
+            logger.info(f"🔍 Recherche des parties du {target_date.strftime('%d/%m/%Y')}...")
             
-            sent_count = 0
-            error_count = 0
+            # Trouver les parties dans 2 jours qui n'ont pas encore reçu de rappel
+            games = (await db.execute(select(Game.id, Game.name, Game.date).where(
+                Game.date == target_date,
+                Game.reminder_sent == False
+            ).order_by(Game.id))).all()
             
-            for reg in registrations:
-                try:
-                    await send_reminder_email(
-                        email=reg.email,
-                        first_name=reg.first_name,
-                        game_date=game.date
-                    )
-                    sent_count += 1
-                    logger.info(f"✓ Rappel envoyé à {reg.first_name} ({reg.email})")
-                except Exception as e:
-                    error_count += 1
-                    logger.error(f"✗ Erreur pour {reg.email}: {e}")
+            if not games:
+                logger.info(f"✓ Aucune partie trouvée pour le {target_date.strftime('%d/%m/%Y')} nécessitant un rappel")
+                return True
+            
+            logger.info(f"📧 {len(games)} partie(s) trouvée(s), envoi des rappels...")
+            
+            for game in games:
+                logger.info(f"📅 Traitement de la partie: {game.name} ({game.date.strftime('%d/%m/%Y')})")
+            
+                # Un autre processus (ou un appel manuel concurrent) a pu la traiter entre-temps
+                if not await claim_game_reminder(db, game.id):
+                    await db.rollback()
+                    logger.info(f"✓ Rappel déjà pris en charge par un autre processus")
+                    continue
             
-            # Marquer le rappel comme envoyé
-            game.reminder_sent = True
-            db.commit()
+                # Mettre les rappels en file et marquer la partie dans la même transaction :
+                # l'envoi (avec nouveaux essais) est assuré par le worker d'emails
+                summary = await queue_game_reminders(db, game)
+                await db.commit()
+                if summary["queued"] or summary["retried"]:
+                    notify_email_worker()
             
-            logger.info(f"📊 Résumé: {sent_count} envoyés, {error_count} erreurs")
-            logger.info(f"✓ Partie marquée comme rappel envoyé")
-        
-        logger.info(f"✅ Traitement terminé!")
-        
-    except Exception as e:
-        logger.error(f"❌ Erreur lors du traitement: {e}")
-        db.rollback()
-    finally:
-        db.close()
+                logger.info(
+                    f"📊 Résumé: {summary['queued']} rappels mis en file, {summary['retried']} relancés, "
+                    f"{summary['in_progress']} en cours, {summary['sent']} déjà envoyés"
+                )
+            
+            logger.info(f"✅ Traitement terminé!")
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Erreur lors du traitement: {e}")
+            await db.rollback()
+            return False
 
 
-def start_scheduler():
+async def get_reminder_deliveries(db: AsyncSession, game_id: int) -> List[Dict]:
+    """Suivi du rappel automatique de chaque joueur confirmé d'une partie"""
+    registrations = (await db.execute(select(
+        Registration.id, Registration.first_name, Registration.last_name, Registration.email
+    ).where(
+        Registration.game_id == game_id,
+        Registration.confirmed == True
+    ).order_by(Registration.last_name, Registration.first_name, Registration.id))).all()
+
+    keys = [reminder_dedupe_key(game_id, reg.id) for reg in registrations]
+    deliveries = {
+        entry.dedupe_key: entry
+        for entry in (await db.scalars(select(EmailOutbox).where(EmailOutbox.dedupe_key.in_(keys)))).all()
+    } if keys else {}
+
+    result = []
+    for reg, key in zip(registrations, keys):
+        entry = deliveries.get(key)
+        result.append({
+            "registration_id": reg.id,
+            "first_name": reg.first_name,
+            "last_name": reg.last_name,
+            "email": reg.email,
+            "status": entry.status if entry else "not_queued",
+            "attempts": entry.attempts if entry else 0,
+            "last_error": entry.last_error if entry else None,
+            "sent_at": entry.sent_at if entry else None
+        })
+    return result
+
+
+def _run_scheduler():
     """
     Démarre le scheduler avec les tâches planifiées
     """
@@ -105,8 +265,12 @@ def start_scheduler():
         replace_existing=True
     )
     
-    # Démarrer le scheduler
-    scheduler.start()
+    # Démarrer le scheduler (ou le reprendre après une perte du verrou)
+    if scheduler.state == STATE_PAUSED:
+        scheduler.resume()
+    else:
+        scheduler.start()
+    SCHEDULER_LEADER.set(1)
     logger.info("✅ Scheduler démarré - Rappels automatiques configurés pour 9h00 chaque jour")
     
     # Afficher les jobs planifiés
@@ -115,10 +279,83 @@ def start_scheduler():
         logger.info(f"📅 Job planifié: {job.name} - Prochaine exécution: {job.next_run_time}")
 
 
-def stop_scheduler():
+def _pause_scheduler():
+    if scheduler.state == STATE_RUNNING:
+        scheduler.pause()
+        SCHEDULER_LEADER.set(0)
+        logger.warning("⏸️  Scheduler suspendu (verrou de leader perdu)")
+
+
+async def _wait_stop(timeout: float) -> bool:
+    """Attend l'arrêt demandé ou l'expiration du délai ; True si arrêt"""
+    try:
+        await asyncio.wait_for(_election_stop.wait(), timeout=timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+async def _leader_loop():
+    """
+    Tente d'obtenir le verrou de leader ; une fois obtenu, le conserve sur une
+    connexion dédiée (vérifiée périodiquement) et exécute le scheduler.
+    """
+    while not _election_stop.is_set():
+        conn = None
+        try:
+            conn = await connect_dedicated("scheduler")
+            if await conn.fetchval("SELECT pg_try_advisory_lock($1)", SCHEDULER_LOCK_ID):
+                logger.info(f"👑 Verrou du scheduler obtenu (processus {os.getpid()})")
+                _run_scheduler()
+                # Le verrou vit aussi longtemps que la connexion
+                while not await _wait_stop(SCHEDULER_LEADER_RETRY):
+                    await conn.fetchval("SELECT 1")
+        except Exception as e:
+            logger.error(f"❌ Élection du scheduler interrompue: {e}")
+        finally:
+            # Sans le verrou, ce processus ne doit plus exécuter les tâches
+            if not _election_stop.is_set():
+                _pause_scheduler()
+            if conn is not None and not conn.is_closed():
+                try:
+                    await conn.close()
+                except Exception:
+                    conn.terminate()
+        if await _wait_stop(SCHEDULER_LEADER_RETRY):
+            break
+
+
+def start_scheduler():
+    """
+    Démarre le scheduler : directement hors PostgreSQL (un seul processus),
+    sinon dans le seul processus qui obtient le verrou de leader
+    """
+    global _election_task, _election_stop
+    if not SCHEDULER_ENABLED:
+        logger.info("⏭️  Scheduler désactivé sur ce processus (SCHEDULER_ENABLED=false)")
+        return
+    if async_engine.dialect.name != "postgresql":
+        _run_scheduler()
+        return
+    if _election_task is not None and not _election_task.done():
+        return
+    _election_stop = asyncio.Event()
+    _election_task = asyncio.get_running_loop().create_task(_leader_loop())
+
+
+async def stop_scheduler():
     """
-    Arrête le scheduler proprement
+    Arrête le scheduler proprement (et libère le verrou de leader)
     """
-    if scheduler.running:
+    global _election_task
+    if _election_task is not None:
+        _election_stop.set()
+        try:
+            await asyncio.wait_for(_election_task, timeout=5)
+        except asyncio.TimeoutError:
+            _election_task.cancel()
+        _election_task = None
+    if scheduler.state != STATE_STOPPED:
         scheduler.shutdown()
+        SCHEDULER_LEADER.set(0)
         logger.info("🛑 Scheduler arrêté")
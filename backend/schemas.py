@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
 from datetime import date, datetime
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 
 class RegistrationCreate(BaseModel):
@@ -151,6 +151,34 @@ class GameStatistics(BaseModel):
     associations: Dict[str, int]
 
 
+class ReminderQueueResponse(BaseModel):
+    """Schéma pour la mise en file d'attente des rappels"""
+    message: str
+    queued: int  # Rappels ajoutés à la file
+    already_queued: int  # Rappels déjà présents dans la file (doublons ignorés)
+
+
+class ReminderResumeResponse(BaseModel):
+    """Schéma pour la reprise des rappels automatiques d'une partie"""
+    message: str
+    queued: int  # Joueurs sans rappel ajoutés à la file
+    retried: int  # Rappels abandonnés relancés
+    in_progress: int  # Rappels en attente ou en cours d'envoi
+    sent: int  # Rappels déjà envoyés
+
+
+class ReminderDeliveryResponse(BaseModel):
+    """Schéma pour le suivi du rappel automatique d'un joueur"""
+    registration_id: int
+    first_name: str
+    last_name: str
+    email: str
+    status: str  # not_queued, pending, sending, sent, failed
+    attempts: int
+    last_error: Optional[str] = None
+    sent_at: Optional[datetime] = None
+
+
 class SiteSettingsUpdate(BaseModel):
     """Schéma pour mettre à jour les paramètres du site"""
     site_title: Optional[str] = None
@@ -322,6 +350,19 @@ class AssignTagRequest(BaseModel):
     nfc_tag_id: Optional[int] = None  # None = retirer le tag
 
 
+class TagAssignment(BaseModel):
+    """Tag NFC attribué automatiquement à une inscription"""
+    registration_id: int
+    nfc_tag_id: int
+    tag_number: str
+
+
+class GameTagAssignmentResponse(BaseModel):
+    """Résultat de l'attribution automatique des tags d'une partie"""
+    assigned: List[TagAssignment]
+    without_tag: int  # Joueurs présents restés sans tag (plus de tag disponible)
+
+
 # ==========================================
 # RULE VERSIONS - Versions des règles
 # ==========================================
@@ -391,3 +432,61 @@ class MembershipApplicationResponse(BaseModel):
 class MembershipApplicationStatusUpdate(BaseModel):
     """Schéma pour mettre à jour le statut d'une candidature"""
     status: str = Field(..., pattern="^(approved|rejected)$")
+
+
+# ==========================================
+# EMAIL OUTBOX - File d'attente des emails
+# ==========================================
+
+class EmailOutboxResponse(BaseModel):
+    """Schéma pour la réponse d'un email de la file d'attente"""
+    id: int
+    kind: str
+    recipient: str
+    registration_id: Optional[int] = None
+    status: str  # pending, sending, sent, failed
+    attempts: int
+    last_error: Optional[str] = None
+    next_attempt_at: Optional[datetime] = None
+    created_at: datetime
+    sent_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class EmailQueueStatusResponse(BaseModel):
+    """Schéma pour l'état de la file d'attente des emails"""
+    pending: int
+    sending: int
+    sent: int
+    failed: int
+    recent_failures: List[EmailOutboxResponse]
+
+
+# ==========================================
+# BULK - Traitement des inscriptions par lot
+# ==========================================
+
+class BulkRegistrationRequest(BaseModel):
+    """Schéma pour appliquer une même opération à plusieurs inscriptions"""
+    action: str = Field(..., pattern="^(approve|reject|attendance|payment|payment_type)$")
+    registration_ids: List[int] = Field(..., min_length=1, max_length=500)
+    rejection_reason: Optional[str] = Field(None, min_length=1, max_length=500)  # action "reject"
+    was_present: Optional[bool] = None  # action "attendance"
+    payment_validated: Optional[bool] = None  # action "payment"
+    payment_type_id: Optional[int] = None  # action "payment_type" (None = retirer le paiement)
+
+
+class BulkItemResult(BaseModel):
+    """Résultat de l'opération pour une inscription"""
+    registration_id: int
+    status: str  # updated, not_found, game_not_found, not_pending
+    detail: Optional[str] = None
+
+
+class BulkRegistrationResponse(BaseModel):
+    """Schéma pour la réponse d'une opération par lot"""
+    action: str
+    updated: int
+    results: List[BulkItemResult]
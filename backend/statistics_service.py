@@ -0,0 +1,224 @@
+"""
+Moteur de statistiques ensemblistes
+Les statistiques de N parties sont lues dans les compteurs précalculés
+(game_stats, tenus à jour par game_stats.py) en un nombre constant de
+requêtes, quel que soit le nombre d'inscriptions. Les mêmes compteurs peuvent
+être agrégés depuis les inscriptions (GROUP BY game_id avec agrégats
+conditionnels) pour une partie sans ligne précalculée ou pour une
+reconstruction.
+"""
+from typing import Dict, List, Tuple
+
+from sqlalchemy import and_, case, func, not_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Game, GameStats, GameAssociationStats, Registration, PaymentType
+from pricing import PricingContext
+
+
+def _count_if(condition):
+    """Agrégat conditionnel : nombre de lignes qui satisfont la condition"""
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+# Compteurs d'une partie (colonnes de game_stats)
+GAME_COUNTERS = (
+    "total_registrations", "confirmed", "present", "morning_only", "full_day",
+    "payments_validated", "paid_freelance",
+)
+
+
+class GameCounters:
+    """Compteurs d'une partie et de ses associations (précalculés ou agrégés)"""
+
+    def __init__(self, counters: Dict[str, int], associations: List[Tuple[str, int, int, int]]):
+        self.counters = counters
+        # (nom, inscriptions, payés au tarif association, première inscription), par ordre d'apparition
+        self.associations = sorted(associations, key=lambda association: association[3])
+
+    def revenue(self, pricing: PricingContext) -> float:
+        """Revenu selon les tarifs et les associations partenaires du moment"""
+        revenue = self.counters["paid_freelance"] * pricing.freelance_price
+        for name, _, paid, _ in self.associations:
+            if pricing.is_partner(name):
+                revenue += paid * pricing.partner_association_price
+            else:
+                revenue += paid * pricing.other_association_price
+        return float(revenue)
+
+    def key(self) -> tuple:
+        """Valeur comparable (vérification de la table game_stats, ordre des associations compris)"""
+        return (
+            tuple(self.counters[name] for name in GAME_COUNTERS),
+            tuple(sorted(self.associations))
+        )
+
+
+async def aggregate_registrations(db: AsyncSession, game_ids: List[int]) -> Dict[int, GameCounters]:
+    """
+    Calcule les compteurs de N parties depuis les inscriptions, en 2 requêtes
+    (source de vérité de game_stats : reconstruction et parties sans ligne).
+    Seules les inscriptions dont le type de paiement génère un coût comptent
+    comme payées ; les invités ne paient pas.
+    """
+    if not game_ids:
+        return {}
+
+    is_freelance = or_(
+        Registration.has_association.is_(None),
+        Registration.has_association == False,
+        Registration.association_name.is_(None),
+        Registration.association_name == ""
+    )
+    is_paid = PaymentType.generates_cost == True
+    is_invited = Registration.attendance_type == "invited"
+
+    # 1 requête : compteurs par partie
+    counters = (await db.execute(select(
+        Registration.game_id,
+        func.count(Registration.id).label("total_registrations"),
+        _count_if(Registration.confirmed == True).label("confirmed"),
+        _count_if(Registration.was_present == True).label("present"),
+        _count_if(Registration.attendance_type == "morning").label("morning_only"),
+        _count_if(Registration.attendance_type == "full_day").label("full_day"),
+        _count_if(is_paid).label("payments_validated"),
+        _count_if(and_(is_paid, not_(is_invited), is_freelance)).label("paid_freelance"),
+    ).outerjoin(
+        PaymentType, PaymentType.id == Registration.payment_type_id
+    ).where(
+        Registration.game_id.in_(game_ids)
+    ).group_by(Registration.game_id))).all()
+
+    # 1 requête : inscriptions et payés par association
+    association_rows = (await db.execute(select(
+        Registration.game_id,
+        Registration.association_name,
+        func.count(Registration.id).label("count"),
+        _count_if(and_(is_paid, not_(is_invited))).label("paid"),
+        func.min(Registration.id).label("first_id")
+    ).outerjoin(
+        PaymentType, PaymentType.id == Registration.payment_type_id
+    ).where(
+        Registration.game_id.in_(game_ids),
+        not_(is_freelance)
+    ).group_by(
+        Registration.game_id, Registration.association_name
+    ))).all()
+
+    associations_by_game: Dict[int, List[Tuple[str, int, int, int]]] = {}
+    for row in association_rows:
+        associations_by_game.setdefault(row.game_id, []).append(
+            (row.association_name, row.count, row.paid, row.first_id)
+        )
+
+    counters_by_game = {row.game_id: row for row in counters}
+    result = {}
+    for game_id in game_ids:
+        row = counters_by_game.get(game_id)
+        result[game_id] = GameCounters(
+            {name: (getattr(row, name) if row else 0) for name in GAME_COUNTERS},
+            associations_by_game.get(game_id, [])
+        )
+    return result
+
+
+async def load_game_counters(db: AsyncSession, game_ids: List[int]) -> Dict[int, GameCounters]:
+    """
+    Compteurs de N parties lus dans game_stats (2 requêtes sur des lignes
+    précalculées) ; les parties sans ligne sont agrégées depuis les inscriptions.
+    """
+    if not game_ids:
+        return {}
+
+    stored = (await db.scalars(select(GameStats).where(GameStats.game_id.in_(game_ids)))).all()
+    association_rows = (await db.scalars(select(GameAssociationStats).where(
+        GameAssociationStats.game_id.in_(game_ids)
+    ))).all() if stored else []
+
+    associations_by_game: Dict[int, List[Tuple[str, int, int, int]]] = {}
+    for row in association_rows:
+        associations_by_game.setdefault(row.game_id, []).append(
+            (row.association_name, row.registrations, row.paid, row.first_registration_id)
+        )
+
+    result = {
+        row.game_id: GameCounters(
+            {name: getattr(row, name) for name in GAME_COUNTERS},
+            associations_by_game.get(row.game_id, [])
+        )
+        for row in stored
+    }
+    missing = [game_id for game_id in game_ids if game_id not in result]
+    if missing:
+        result.update(await aggregate_registrations(db, missing))
+    return result
+
+
+async def compute_games_statistics(
+    db: AsyncSession,
+    games: List[Game],
+    pricing: PricingContext
+) -> List[dict]:
+    """
+    Calcule les statistiques de chaque partie, dans l'ordre de `games`, à
+    partir des compteurs précalculés. Les règles de calcul sont celles de
+    calculate_registration_price :
+    - Invité : 0€
+    - Association partenaire active (insensible à la casse) : tarif partenaire
+    - Autre association : tarif autre association
+    - Freelance : tarif freelance
+    Seules les inscriptions dont le type de paiement génère un coût comptent
+    dans le revenu.
+    """
+    if not games:
+        return []
+
+    counters_by_game = await load_game_counters(db, [game.id for game in games])
+
+    stats = []
+    for game in games:
+        game_counters = counters_by_game[game.id]
+        counters = game_counters.counters
+        stats.append({
+            "game_id": game.id,
+            "game_name": game.name,
+            "game_date": game.date,
+            "total_registrations": counters["total_registrations"],
+            "confirmed": counters["confirmed"],
+            "present": counters["present"],
+            "payments_validated": counters["payments_validated"],
+            "revenue": game_counters.revenue(pricing),
+            "morning_only": counters["morning_only"],
+            "full_day": counters["full_day"],
+            "associations": {name: count for name, count, _, _ in game_counters.associations}
+        })
+
+    return stats
+
+
+async def compute_global_statistics(
+    db: AsyncSession,
+    games: List[Game],
+    pricing: PricingContext
+) -> dict:
+    """Agrège les statistiques de plusieurs parties (tableau de bord)"""
+    games_stats = await compute_games_statistics(db, games, pricing)
+
+    associations: Dict[str, int] = {}
+    for game_stats in games_stats:
+        for name, count in game_stats["associations"].items():
+            associations[name] = associations.get(name, 0) + count
+
+    total_registrations = sum(s["total_registrations"] for s in games_stats)
+
+    return {
+        "total_games": len(games),
+        "total_registrations": total_registrations,
+        "total_confirmed": sum(s["confirmed"] for s in games_stats),
+        "total_present": sum(s["present"] for s in games_stats),
+        "total_revenue": float(sum(s["revenue"] for s in games_stats)),
+        "average_per_game": total_registrations / len(games) if games else 0,
+        "morning_only": sum(s["morning_only"] for s in games_stats),
+        "full_day": sum(s["full_day"] for s in games_stats),
+        "top_associations": dict(sorted(associations.items(), key=lambda x: x[1], reverse=True)[:5])
+    }
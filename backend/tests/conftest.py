@@ -0,0 +1,16 @@
+"""
+Configuration des tests backend (lancés depuis backend/ : pytest)
+Les modules de l'application lisent DATABASE_URL à l'import : une base SQLite
+temporaire est configurée avant tout import.
+"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_database_dir = tempfile.mkdtemp(prefix="airsoft-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_database_dir, 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.setdefault("SCHEDULER_ENABLED", "false")
@@ -0,0 +1,57 @@
+"""Approbation et refus unitaires d'une inscription (main.claim_pending_registration)"""
+from datetime import date, timedelta
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from database import AsyncSessionLocal, Base, engine
+from main import claim_pending_registration
+from models import Game, Registration
+
+
+@pytest.fixture(autouse=True)
+def tables():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+
+
+async def _seed() -> int:
+    async with AsyncSessionLocal() as db:
+        game = Game(name="Partie", date=date.today() + timedelta(days=7))
+        db.add(game)
+        await db.flush()
+        registration = Registration(
+            game_id=game.id, first_name="Joueur", last_name="Test", nickname="J",
+            email="joueur@example.com", phone="0600000000", attendance_type="full_day",
+            has_association=False, approval_status="pending", confirmed=False
+        )
+        db.add(registration)
+        await db.commit()
+        return registration.id
+
+
+async def _concurrent_decisions(registration_id: int):
+    """Deux requêtes lisent l'inscription en attente, puis écrivent l'une après l'autre"""
+    async with AsyncSessionLocal() as first, AsyncSessionLocal() as second:
+        for db in (first, second):
+            registration = await db.scalar(select(Registration).where(Registration.id == registration_id))
+            assert registration.approval_status == "pending"
+
+        await claim_pending_registration(first, registration_id, approval_status="approved")
+        await first.commit()
+        with pytest.raises(HTTPException) as conflict:
+            await claim_pending_registration(second, registration_id, approval_status="rejected", rejection_reason="Complet")
+        await second.rollback()
+
+    async with AsyncSessionLocal() as db:
+        registration = await db.scalar(select(Registration).where(Registration.id == registration_id))
+    return conflict.value.status_code, registration.approval_status, registration.rejection_reason
+
+
+def test_second_decision_conflicts():
+    registration_id = asyncio.run(_seed())
+
+    assert asyncio.run(_concurrent_decisions(registration_id)) == (409, "approved", None)
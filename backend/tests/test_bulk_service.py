@@ -0,0 +1,89 @@
+"""Opérations par lot sur les inscriptions (bulk_service.apply_bulk_action)"""
+from datetime import date, timedelta
+import asyncio
+
+import pytest
+from sqlalchemy import delete, event, select
+
+from bulk_service import apply_bulk_action
+from database import AsyncSessionLocal, Base, async_engine, engine
+from models import EmailOutbox, Game, Registration
+from schemas import BulkRegistrationRequest
+
+
+@pytest.fixture(autouse=True)
+def tables():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+
+
+def _registration(index: int, game_id) -> Registration:
+    return Registration(
+        game_id=game_id, first_name=f"Joueur{index}", last_name="Test", nickname=f"J{index}",
+        email=f"joueur{index}@example.com", phone="0600000000", attendance_type="full_day",
+        has_association=False, approval_status="pending", confirmed=False
+    )
+
+
+async def _seed(count: int, orphans: int = 0):
+    """count inscriptions sur une partie existante, orphans sur une partie supprimée"""
+    async with AsyncSessionLocal() as db:
+        game = Game(name="Partie", date=date.today() + timedelta(days=7))
+        deleted_game = Game(name="Supprimée", date=date.today() + timedelta(days=14))
+        db.add_all([game, deleted_game])
+        await db.flush()
+        registrations = [_registration(i, game.id) for i in range(count)]
+        registrations += [_registration(count + i, deleted_game.id) for i in range(orphans)]
+        db.add_all(registrations)
+        await db.flush()
+        await db.execute(delete(Game).where(Game.id == deleted_game.id))
+        await db.commit()
+        return [registration.id for registration in registrations]
+
+
+async def _run(request: BulkRegistrationRequest, statements=None):
+    """Applique l'opération ; les requêtes SQL du lot sont ajoutées à `statements`"""
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    if statements is not None:
+        event.listen(async_engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        async with AsyncSessionLocal() as db:
+            results, updated_ids = await apply_bulk_action(db, request)
+            await db.commit()
+    finally:
+        if statements is not None:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", listener)
+    async with AsyncSessionLocal() as db:
+        statuses = dict((await db.execute(select(Registration.id, Registration.approval_status))).all())
+        emails = (await db.scalars(select(EmailOutbox))).all()
+    return results, updated_ids, statuses, emails
+
+
+@pytest.mark.parametrize("action", ["approve", "reject"])
+def test_approval_reports_missing_game(action):
+    valid_id, orphan_id = asyncio.run(_seed(1, orphans=1))
+    request = BulkRegistrationRequest(
+        action=action, registration_ids=[valid_id, orphan_id],
+        rejection_reason="Complet" if action == "reject" else None
+    )
+
+    results, updated_ids, statuses, emails = asyncio.run(_run(request))
+
+    assert updated_ids == {valid_id}
+    assert results[1] == {"registration_id": orphan_id, "status": "game_not_found", "detail": "Partie non trouvée"}
+    assert statuses[orphan_id] == "pending"
+    assert [email.registration_id for email in emails] == [valid_id]
+
+
+def test_approve_batch_query_count():
+    registration_ids = asyncio.run(_seed(20))
+    statements = []
+
+    _, updated_ids, _, emails = asyncio.run(
+        _run(BulkRegistrationRequest(action="approve", registration_ids=registration_ids), statements)
+    )
+
+    assert len(updated_ids) == 20 and len(emails) == 20
+    # Lecture du lot, UPDATE des inscriptions, INSERT des emails en une fois
+    assert len(statements) == 3, statements
@@ -0,0 +1,123 @@
+"""Pool de sessions SMTP et envois groupés (email_service.py), sur un serveur aiosmtpd local"""
+import asyncio
+import socket
+
+import pytest
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+import email_service
+from email_service import SMTPConnectionPool, build_message, dispatch_emails
+
+REJECTED = "refuse@example.com"
+
+
+class RecordingHandler:
+    """Note la connexion (port client) de chaque message reçu ; refuse REJECTED"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == REJECTED:
+            return "550 Destinataire refusé"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((session.peer, envelope.rcpt_tos[0]))
+        return "250 OK"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class SMTPServer:
+    """Serveur SMTP local redémarrable sur le même port"""
+
+    def __init__(self):
+        self.port = _free_port()
+        self.handler = RecordingHandler()
+        self._controller = None
+
+    def start(self):
+        self._controller = aiosmtpd_controller.Controller(self.handler, hostname="127.0.0.1", port=self.port)
+        self._controller.start()
+
+    def stop(self):
+        self._controller.stop()
+
+    def connections(self):
+        return [peer for peer, _ in self.handler.messages]
+
+
+@pytest.fixture
+def server():
+    server = SMTPServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def pool(server, monkeypatch):
+    pool = SMTPConnectionPool("127.0.0.1", server.port, None, None, False, size=2, idle_timeout=30)
+    monkeypatch.setattr(email_service, "smtp_pool", pool)
+    monkeypatch.setattr(email_service, "EMAIL_FROM", "club@example.com")
+    return pool
+
+
+def _message(index: int):
+    return build_message(f"joueur{index}@example.com", "Rappel", f"<p>Message {index}</p>")
+
+
+def test_session_reused_across_sends(server, pool):
+    async def send():
+        for index in range(3):
+            await pool.send_message(_message(index))
+        await pool.close()
+
+    asyncio.run(send())
+
+    assert len(server.handler.messages) == 3
+    assert len(set(server.connections())) == 1
+
+
+def test_reconnects_after_server_restart(server, pool):
+    async def send():
+        await pool.send_message(_message(0))
+        # Le serveur ferme les sessions ouvertes : la session inactive du pool est perdue
+        await asyncio.get_running_loop().run_in_executor(None, server.stop)
+        await asyncio.get_running_loop().run_in_executor(None, server.start)
+        await pool.send_message(_message(1))
+        await pool.close()
+
+    asyncio.run(send())
+
+    assert [rcpt for _, rcpt in server.handler.messages] == ["joueur0@example.com", "joueur1@example.com"]
+    assert len(set(server.connections())) == 2
+
+
+def test_dispatch_reports_each_recipient(server, pool):
+    emails = [
+        ("joueur0@example.com", "Rappel", "<p>0</p>"),
+        (REJECTED, "Rappel", "<p>refusé</p>"),
+        ("joueur1@example.com", "Rappel", "<p>1</p>"),
+    ]
+
+    async def send():
+        try:
+            return await dispatch_emails(emails, max_concurrency=2, rate_limit=0)
+        finally:
+            await pool.close()
+
+    results = asyncio.run(send())
+
+    assert [(result["email"], result["sent"]) for result in results] == [
+        ("joueur0@example.com", True), (REJECTED, False), ("joueur1@example.com", True)
+    ]
+    assert results[0]["error"] is None and "550" in results[1]["error"]
+    assert sorted(rcpt for _, rcpt in server.handler.messages) == ["joueur0@example.com", "joueur1@example.com"]
@@ -0,0 +1,121 @@
+"""Tenue à jour incrémentale de game_stats par les endpoints (game_stats.py)"""
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+
+import main
+from database import AsyncSessionLocal, Base, engine
+from game_stats import rebuild_game_stats
+from models import GameAssociationStats
+from statistics_service import aggregate_registrations, load_game_counters
+
+
+@pytest.fixture
+def client():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with TestClient(main.app) as client:
+        token = client.post("/api/auth/login", json={"username": "admin", "password": "admin123"}).json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+        yield client
+
+
+async def _stored_and_expected(game_id: int):
+    async with AsyncSessionLocal() as db:
+        stored = (await load_game_counters(db, [game_id]))[game_id]
+        expected = (await aggregate_registrations(db, [game_id]))[game_id]
+    return stored, expected
+
+
+def _assert_in_sync(client, game_id: int):
+    stored, expected = client.portal.call(_stored_and_expected, game_id)
+    assert stored.key() == expected.key()
+    assert [name for name, _, _, _ in stored.associations] == [name for name, _, _, _ in expected.associations]
+
+
+def _register(client, index: int, attendance_type: str, association_name=None) -> int:
+    response = client.post("/api/registrations", json={
+        "first_name": f"Joueur{index}", "last_name": "Test", "nickname": f"J{index}",
+        "email": f"joueur{index}@example.com", "phone": "0600000000", "attendance_type": attendance_type,
+        "has_association": association_name is not None, "association_name": association_name
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def test_endpoints_keep_game_stats_in_sync(client):
+    game_id = client.post("/api/games", json={"date": str(date.today() + timedelta(days=7)), "name": "Partie"}).json()["id"]
+    paid_type = client.post("/api/payment-types", json={"name": "Espèces"}).json()["id"]
+    free_type = client.post("/api/payment-types", json={"name": "Offert", "generates_cost": False}).json()["id"]
+
+    freelance = _register(client, 0, "morning")
+    alpha_first = _register(client, 1, "full_day", "Alpha")
+    beta = _register(client, 2, "full_day", "Beta")
+    alpha_second = _register(client, 3, "morning", "Alpha")
+    _assert_in_sync(client, game_id)
+
+    assert client.post(f"/api/registrations/{freelance}/confirm").status_code == 200
+    _assert_in_sync(client, game_id)
+
+    assert client.patch(f"/api/registrations/{alpha_first}/attendance", json={"was_present": True}).status_code == 200
+    _assert_in_sync(client, game_id)
+
+    for registration_id, payment_type_id in ((freelance, paid_type), (alpha_first, paid_type), (beta, free_type)):
+        response = client.patch(f"/api/registrations/{registration_id}/payment-type", json={"payment_type_id": payment_type_id})
+        assert response.status_code == 200
+        _assert_in_sync(client, game_id)
+
+    # Changement d'association : la première inscription de Beta devient alpha_first
+    assert client.put(f"/api/registrations/{alpha_first}", json={"association_name": "Beta"}).status_code == 200
+    _assert_in_sync(client, game_id)
+    assert client.put(f"/api/registrations/{beta}", json={"attendance_type": "morning"}).status_code == 200
+    _assert_in_sync(client, game_id)
+
+    # Suppression de la première inscription d'une association
+    assert client.delete(f"/api/registrations/{alpha_first}").status_code == 200
+    _assert_in_sync(client, game_id)
+
+    for payload in (
+        {"action": "approve", "registration_ids": [freelance, beta]},
+        {"action": "attendance", "registration_ids": [freelance, beta, alpha_second], "was_present": True},
+        {"action": "payment_type", "registration_ids": [beta, alpha_second], "payment_type_id": paid_type},
+        {"action": "payment_type", "registration_ids": [freelance], "payment_type_id": None},
+    ):
+        response = client.post("/api/registrations/bulk", json=payload)
+        assert response.status_code == 200, response.text
+        _assert_in_sync(client, game_id)
+
+    assert client.delete(f"/api/registrations/{beta}").status_code == 200
+    _assert_in_sync(client, game_id)
+
+
+async def _corrupt_first_registration(game_id: int):
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(GameAssociationStats).where(
+            GameAssociationStats.game_id == game_id, GameAssociationStats.association_name == "Alpha"
+        ).values(first_registration_id=0))
+        await db.commit()
+
+
+async def _rebuild(game_id: int, repair: bool):
+    async with AsyncSessionLocal() as db:
+        drifted = await rebuild_game_stats(db, [game_id], repair=repair)
+        await db.commit()
+        first_id = await db.scalar(select(GameAssociationStats.first_registration_id).where(
+            GameAssociationStats.game_id == game_id, GameAssociationStats.association_name == "Alpha"
+        ))
+    return drifted, first_id
+
+
+def test_rebuild_detects_association_order(client):
+    game_id = client.post("/api/games", json={"date": str(date.today() + timedelta(days=7)), "name": "Partie"}).json()["id"]
+    first = _register(client, 0, "full_day", "Alpha")
+    _register(client, 1, "full_day", "Alpha")
+
+    client.portal.call(_corrupt_first_registration, game_id)
+
+    assert client.portal.call(_rebuild, game_id, False) == ([game_id], 0)
+    assert client.portal.call(_rebuild, game_id, True) == ([game_id], first)
+    assert client.portal.call(_rebuild, game_id, False) == ([], first)
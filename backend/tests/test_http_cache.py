@@ -0,0 +1,32 @@
+"""Validation HTTP des lectures publiques (http_cache.py)"""
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from database import Base, engine
+
+
+@pytest.fixture
+def client():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with TestClient(main.app) as client:
+        token = client.post("/api/auth/login", json={"username": "admin", "password": "admin123"}).json()["access_token"]
+        client.post("/api/games", json={"date": str(date.today() + timedelta(days=7)), "name": "Partie"},
+                    headers={"Authorization": f"Bearer {token}"})
+        yield client
+
+
+def test_active_game_revalidated_by_etag_only(client):
+    response = client.get("/api/games/active")
+    assert response.status_code == 200
+    assert "last-modified" not in response.headers
+
+    # If-Modified-Since seul ne suffit pas : la partie active dépend de la date du jour
+    future = "Fri, 01 Jan 2100 00:00:00 GMT"
+    assert client.get("/api/games/active", headers={"If-Modified-Since": future}).status_code == 200
+
+    etag = response.headers["etag"]
+    assert client.get("/api/games/active", headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,74 @@
+"""
+Les requêtes fréquentes sur les inscriptions utilisent leurs index
+(EXPLAIN QUERY PLAN sur une base créée par create_all)
+"""
+import pytest
+from sqlalchemy import func, select
+
+from database import Base, engine
+from models import Game, MembershipApplication, Registration
+
+# Requêtes des listes admin, du compteur et des rappels -> index attendu
+HOT_QUERIES = [
+    (
+        "Inscriptions approuvées d'une partie",
+        select(Registration).where(
+            Registration.game_id == 1,
+            Registration.approval_status == "approved"
+        ),
+        "ix_registrations_game_status_created"
+    ),
+    (
+        "Inscriptions en attente",
+        select(Registration).where(
+            Registration.approval_status == "pending"
+        ).order_by(Registration.created_at.desc()),
+        "ix_registrations_status_created"
+    ),
+    (
+        "Compteur des inscriptions en attente",
+        select(func.count(Registration.id)).where(Registration.approval_status == "pending"),
+        "ix_registrations_status_created"
+    ),
+    (
+        "Inscriptions confirmées d'une partie (rappels)",
+        select(Registration).where(
+            Registration.game_id == 1,
+            Registration.confirmed == True
+        ),
+        "ix_registrations_game_confirmed"
+    ),
+    (
+        "Liste des parties",
+        select(Game).order_by(Game.date.desc(), Game.id.desc()).limit(101),
+        "ix_games_date_id"
+    ),
+    (
+        "Candidatures d'un statut",
+        select(MembershipApplication).where(
+            MembershipApplication.status == "pending"
+        ).order_by(MembershipApplication.created_at.desc(), MembershipApplication.id.desc()).limit(101),
+        "ix_membership_applications_status_created"
+    ),
+]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def tables():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+
+
+def explain(conn, query) -> str:
+    """Plan d'exécution d'une requête, sous forme de texte"""
+    sql = str(query.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+    return "\n".join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize("label, query, index_name", HOT_QUERIES, ids=[label for label, _, _ in HOT_QUERIES])
+def test_hot_query_uses_index(label, query, index_name):
+    with engine.connect() as conn:
+        plan = explain(conn, query)
+    assert index_name in plan, f"{label} : index {index_name} non utilisé\n{plan}"
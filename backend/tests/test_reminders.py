@@ -0,0 +1,83 @@
+"""Rappels automatiques (scheduler._send_automatic_reminders)"""
+from datetime import date, timedelta
+import asyncio
+
+import pytest
+from sqlalchemy import select, update
+
+from database import AsyncSessionLocal, Base, engine
+from models import EmailOutbox, Game, Registration
+from scheduler import _send_automatic_reminders, reminder_dedupe_key
+
+
+@pytest.fixture(autouse=True)
+def tables():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+
+
+async def _seed_game(days: int, reminder_sent: bool = False) -> int:
+    """Partie dans `days` jours avec un joueur confirmé"""
+    async with AsyncSessionLocal() as db:
+        game = Game(name=f"J+{days}", date=date.today() + timedelta(days=days), reminder_sent=reminder_sent)
+        db.add(game)
+        await db.flush()
+        db.add(Registration(
+            game_id=game.id, first_name="Joueur", last_name="Test", nickname="J",
+            email=f"joueur{game.id}@example.com", phone="0600000000", attendance_type="full_day",
+            has_association=False, approval_status="approved", confirmed=True
+        ))
+        await db.commit()
+        return game.id
+
+
+async def _reminders():
+    """Statut des rappels automatiques, par partie"""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(select(Registration.game_id, EmailOutbox.status).join(
+            EmailOutbox, EmailOutbox.registration_id == Registration.id
+        ).where(EmailOutbox.dedupe_key.like("reminder:%:auto")))).all()
+        reminded = dict((await db.execute(select(Game.id, Game.reminder_sent))).all())
+    return dict(rows), reminded
+
+
+def test_job_reminds_games_in_two_days_only():
+    tomorrow = asyncio.run(_seed_game(1))
+    target = asyncio.run(_seed_game(2))
+
+    assert asyncio.run(_send_automatic_reminders())
+    statuses, reminded = asyncio.run(_reminders())
+
+    assert statuses == {target: "pending"}
+    assert reminded == {tomorrow: False, target: True}
+
+
+async def _fail_reminders():
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(EmailOutbox).values(status="failed", attempts=6, last_error="SMTP down"))
+        await db.commit()
+
+
+def test_job_retries_failed_reminders_of_upcoming_games():
+    upcoming = asyncio.run(_seed_game(2))
+    past = asyncio.run(_seed_game(-1))
+    asyncio.run(_send_automatic_reminders())
+
+    # Rappel de la partie passée mis en file avant la date, puis abandonné
+    async def queue_past():
+        async with AsyncSessionLocal() as db:
+            registration_id = await db.scalar(select(Registration.id).where(Registration.game_id == past))
+            db.add(EmailOutbox(
+                kind="reminder", recipient="passe@example.com", payload="{}",
+                dedupe_key=reminder_dedupe_key(past, registration_id), registration_id=registration_id
+            ))
+            await db.execute(update(Game).where(Game.id == past).values(reminder_sent=True))
+            await db.commit()
+    asyncio.run(queue_past())
+    asyncio.run(_fail_reminders())
+
+    assert asyncio.run(_send_automatic_reminders())
+    statuses, _ = asyncio.run(_reminders())
+
+    assert statuses == {upcoming: "pending", past: "failed"}
@@ -0,0 +1,141 @@
+"""
+Statistiques agrégées (statistics_service.py) comparées au calcul d'origine,
+inscription par inscription avec calculate_registration_price
+"""
+from datetime import date, timedelta
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from database import AsyncSessionLocal, Base, engine
+from game_stats import rebuild_game_stats
+from models import Game, PartnerAssociation, PaymentType, PricingSettings, Registration
+from pricing import calculate_registration_price, load_pricing_context
+from statistics_service import compute_games_statistics, compute_global_statistics
+
+# (type de présence, has_association, association, paiement, statut, confirmé)
+REGISTRATIONS = [
+    ("invited", False, None, "paid", "approved", True),
+    ("morning", False, None, "paid", "approved", True),
+    ("full_day", False, "Ignorée", "paid", "approved", False),
+    ("full_day", True, "", "paid", "approved", True),
+    ("full_day", True, "LSPA", "paid", "approved", True),
+    ("morning", True, "lspa", "paid", "approved", True),
+    ("full_day", True, "Lspa", None, "pending", False),
+    ("invited", True, "LSPA", "paid", "approved", True),
+    ("full_day", True, "Autre Asso", "paid", "approved", True),
+    ("morning", True, "Autre Asso", "free", "approved", True),
+    ("full_day", True, "Ancienne", "paid", "approved", True),
+    ("morning", False, None, "paid", "rejected", False),
+    ("full_day", True, "Autre Asso", "paid", "pending", False),
+    ("morning", False, None, "free", "approved", True),
+]
+
+
+@pytest.fixture(autouse=True)
+def tables():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+
+
+async def _seed():
+    async with AsyncSessionLocal() as db:
+        db.add(PricingSettings(partner_association_price=5, other_association_price=7, freelance_price=9))
+        db.add_all([
+            PartnerAssociation(name="LSPA", is_active=True),
+            PartnerAssociation(name="Ancienne", is_active=False),
+        ])
+        paid = PaymentType(name="Espèces", generates_cost=True)
+        free = PaymentType(name="Offert", generates_cost=False)
+        games = [
+            Game(name=f"Partie {index}", date=date.today() - timedelta(days=7 * index))
+            for index in range(3)
+        ]
+        db.add_all([paid, free, *games])
+        await db.flush()
+        payment_types = {"paid": paid.id, "free": free.id, None: None}
+
+        registrations = []
+        for game_index, game in enumerate(games[:2]):
+            for index, (attendance, has_association, association, payment, status, confirmed) in enumerate(REGISTRATIONS):
+                # Répartition différente d'une partie à l'autre
+                if (index + game_index) % 4 == 3 and game_index:
+                    continue
+                registrations.append(Registration(
+                    game_id=game.id, first_name=f"Joueur{index}", last_name="Test", nickname=f"J{index}",
+                    email=f"joueur{game_index}-{index}@example.com", phone="0600000000",
+                    attendance_type=attendance, has_association=has_association, association_name=association,
+                    payment_type_id=payment_types[payment], payment_validated=payment is not None,
+                    approval_status=status, confirmed=confirmed, was_present=index % 3 == 0
+                ))
+        db.add_all(registrations)
+        await db.commit()
+
+
+async def _baseline(db, games, pricing):
+    """Calcul d'origine des endpoints de statistiques, inscription par inscription"""
+    paid_types = set((await db.scalars(select(PaymentType.id).where(PaymentType.generates_cost == True))).all())
+    stats = []
+    for game in games:
+        registrations = (await db.scalars(
+            select(Registration).where(Registration.game_id == game.id).order_by(Registration.id)
+        )).all()
+        associations = {}
+        payments_validated = 0
+        revenue = 0
+        for reg in registrations:
+            if reg.has_association and reg.association_name:
+                associations[reg.association_name] = associations.get(reg.association_name, 0) + 1
+            if reg.payment_type_id in paid_types:
+                payments_validated += 1
+                revenue += calculate_registration_price(reg, pricing)
+        stats.append({
+            "game_id": game.id,
+            "game_name": game.name,
+            "game_date": game.date,
+            "total_registrations": len(registrations),
+            "confirmed": sum(1 for r in registrations if r.confirmed),
+            "present": sum(1 for r in registrations if r.was_present),
+            "payments_validated": payments_validated,
+            "revenue": float(revenue),
+            "morning_only": sum(1 for r in registrations if r.attendance_type == "morning"),
+            "full_day": sum(1 for r in registrations if r.attendance_type == "full_day"),
+            "associations": associations
+        })
+    return stats
+
+
+async def _compare(stored: bool):
+    await _seed()
+    async with AsyncSessionLocal() as db:
+        if stored:
+            await rebuild_game_stats(db)
+            await db.commit()
+        games = (await db.scalars(select(Game).order_by(Game.date.desc()))).all()
+        pricing = await load_pricing_context(db)
+
+        expected = await _baseline(db, games, pricing)
+        actual = await compute_games_statistics(db, games, pricing)
+        summary = await compute_global_statistics(db, games, pricing)
+    return expected, actual, summary
+
+
+@pytest.mark.parametrize("stored", [False, True], ids=["agrege", "game_stats"])
+def test_statistics_match_per_registration_pricing(stored):
+    expected, actual, summary = asyncio.run(_compare(stored))
+
+    assert actual == expected
+    for expected_game, actual_game in zip(expected, actual):
+        assert list(actual_game["associations"]) == list(expected_game["associations"])
+    # Partie 0 : 4 freelances (dont refusé), 2 partenaires (casse différente),
+    # 3 autres associations (dont partenaire inactive) ; invités et types gratuits exclus
+    assert expected[0]["revenue"] == 4 * 9 + 2 * 5 + 3 * 7
+
+    assert summary["total_registrations"] == sum(s["total_registrations"] for s in expected)
+    assert summary["total_confirmed"] == sum(s["confirmed"] for s in expected)
+    assert summary["total_present"] == sum(s["present"] for s in expected)
+    assert summary["total_revenue"] == sum(s["revenue"] for s in expected)
+    assert summary["morning_only"] == sum(s["morning_only"] for s in expected)
+    assert summary["full_day"] == sum(s["full_day"] for s in expected)
@@ -1,6 +1,6 @@
 import axios from 'axios';
 
-const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
+export const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
 
 const api = axios.create({
   baseURL: API_URL,
@@ -30,4 +30,37 @@ api.interceptors.response.use(
   }
 );
 
+// Taille de page des listes admin (PAGE_SIZE_DEFAULT et PAGE_SIZE_MAX côté backend)
+export const PAGE_SIZE = 100;
+export const PAGE_SIZE_MAX = 500;
+
+// Récupérer une page d'une liste paginée ; nextCursor (en-tête X-Next-Cursor)
+// est absent sur la dernière page
+export const getPage = async (url, params = {}, cursor = null) => {
+  const response = await api.get(url, {
+    params: cursor ? { ...params, cursor } : params,
+  });
+  return {
+    items: response.data,
+    nextCursor: response.headers['x-next-cursor'] || null,
+  };
+};
+
+// Taille de page pour recharger une liste sans perdre les éléments déjà affichés
+export const reloadLimit = (loadedCount) => Math.min(Math.max(loadedCount, PAGE_SIZE), PAGE_SIZE_MAX);
+
+// Télécharger un export (CSV / XLSX) avec le token admin
+export const downloadExport = async (url, params = {}) => {
+  const response = await api.get(url, { params, responseType: 'blob' });
+  const disposition = response.headers['content-disposition'] || '';
+  const match = disposition.match(/filename="([^"]+)"/);
+  const link = document.createElement('a');
+  link.href = window.URL.createObjectURL(response.data);
+  link.download = match ? match[1] : `export.${params.format || 'csv'}`;
+  document.body.appendChild(link);
+  link.click();
+  link.remove();
+  window.URL.revokeObjectURL(link.href);
+};
+
 export default api;
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-import api from '../api';
+import api, { API_URL, PAGE_SIZE_MAX, getPage, reloadLimit, downloadExport } from '../api';
 import EditPlayerModal from './EditPlayerModal';
 import LogoManager from './LogoManager';
 import SiteCustomizer from './SiteCustomizer';
@@ -16,6 +16,8 @@ function AdminDashboard({ setIsAuthenticated }) {
   const [games, setGames] = useState([]);
   const [selectedGame, setSelectedGame] = useState(null);
   const [registrations, setRegistrations] = useState([]);
+  const [registrationsCursor, setRegistrationsCursor] = useState(null);
+  const [loadingMoreRegistrations, setLoadingMoreRegistrations] = useState(false);
   const [statistics, setStatistics] = useState(null);
   const [gameStats, setGameStats] = useState([]);
   const [paymentTypes, setPaymentTypes] = useState([]);
@@ -50,6 +52,52 @@ function AdminDashboard({ setIsAuthenticated }) {
     fetchPendingRegistrationsCount();
   }, []);
 
+  // Compteurs en attente poussés par le serveur (Server-Sent Events). L'URL du flux
+  // porte un ticket à usage unique, jamais le token : à chaque fin de flux (durée
+  // maximale, coupure), on se reconnecte avec un nouveau ticket.
+  useEffect(() => {
+    if (!localStorage.getItem('token') || typeof EventSource === 'undefined') {
+      return undefined;
+    }
+    let events = null;
+    let retryTimer = null;
+    let closed = false;
+
+    const connect = async () => {
+      try {
+        const response = await api.post('/api/events/ticket');
+        if (closed) return;
+        events = new EventSource(`${API_URL}/api/events?ticket=${encodeURIComponent(response.data.ticket)}`);
+        events.addEventListener('counters', (event) => {
+          const counters = JSON.parse(event.data);
+          setPendingRegistrationsCount(counters.pending_registrations || 0);
+          setPendingApplicationsCount(counters.pending_applications || 0);
+        });
+        events.onerror = () => {
+          // Le ticket est consommé : pas de reconnexion automatique d'EventSource
+          events.close();
+          scheduleReconnect();
+        };
+      } catch (err) {
+        console.error('Erreur lors de l\'ouverture du flux temps réel:', err);
+        scheduleReconnect();
+      }
+    };
+
+    const scheduleReconnect = () => {
+      if (!closed) {
+        retryTimer = setTimeout(connect, 3000);
+      }
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (events) events.close();
+    };
+  }, []);
+
   useEffect(() => {
     if (selectedGame) {
       fetchRegistrations(selectedGame.id);
@@ -73,27 +121,53 @@ function AdminDashboard({ setIsAuthenticated }) {
     }
   }, [activeTab]);
 
+  // Toutes les parties pour le sélecteur : /api/games est paginé, on suit le
+  // curseur jusqu'à la dernière page
   const fetchGames = async () => {
     try {
-      const response = await api.get('/api/games');
-      setGames(response.data);
-      if (response.data.length > 0) {
-        setSelectedGame(response.data[0]);
+      const allGames = [];
+      let cursor = null;
+      do {
+        const page = await getPage('/api/games', { limit: PAGE_SIZE_MAX }, cursor);
+        allGames.push(...page.items);
+        cursor = page.nextCursor;
+      } while (cursor);
+      setGames(allGames);
+      if (allGames.length > 0) {
+        setSelectedGame(allGames[0]);
       }
     } catch (err) {
       console.error('Erreur lors de la récupération des parties:', err);
     }
   };
 
-  const fetchRegistrations = async (gameId) => {
+  // Première page des inscriptions ; après une modification (keepLoaded), recharge
+  // autant de lignes que déjà affichées pour ne pas perdre la position
+  const fetchRegistrations = async (gameId, keepLoaded = false) => {
     try {
-      const response = await api.get(`/api/games/${gameId}/registrations`);
-      setRegistrations(response.data);
+      const params = keepLoaded ? { limit: reloadLimit(registrations.length) } : {};
+      const page = await getPage(`/api/games/${gameId}/registrations`, params);
+      setRegistrations(page.items);
+      setRegistrationsCursor(page.nextCursor);
     } catch (err) {
       console.error('Erreur lors de la récupération des inscriptions:', err);
     }
   };
 
+  const loadMoreRegistrations = async () => {
+    if (!selectedGame || !registrationsCursor) return;
+    setLoadingMoreRegistrations(true);
+    try {
+      const page = await getPage(`/api/games/${selectedGame.id}/registrations`, {}, registrationsCursor);
+      setRegistrations((loaded) => [...loaded, ...page.items]);
+      setRegistrationsCursor(page.nextCursor);
+    } catch (err) {
+      console.error('Erreur lors de la récupération des inscriptions:', err);
+    } finally {
+      setLoadingMoreRegistrations(false);
+    }
+  };
+
   const fetchStatistics = async () => {
     try {
       const response = await api.get('/api/statistics');
@@ -135,7 +209,7 @@ function AdminDashboard({ setIsAuthenticated }) {
       await api.patch(`/api/registrations/${registrationId}/nfc-tag`, {
         nfc_tag_id: tagId || null
       });
-      fetchRegistrations(selectedGame.id);
+      fetchRegistrations(selectedGame.id, true);
       fetchNFCTags(); // Rafraîchir la liste des tags pour mettre à jour leur disponibilité
     } catch (err) {
       console.error('Erreur lors de l\'attribution du tag:', err);
@@ -143,6 +217,37 @@ function AdminDashboard({ setIsAuthenticated }) {
     }
   };
 
+  const exportFile = async (url, format) => {
+    try {
+      await downloadExport(url, { format });
+    } catch (err) {
+      console.error('Erreur lors de l\'export:', err);
+      alert('Erreur lors de l\'export');
+    }
+  };
+
+  const autoAssignNFCTags = async () => {
+    if (!selectedGame) return;
+
+    setLoading(true);
+    try {
+      const response = await api.post(`/api/games/${selectedGame.id}/nfc-tags/auto-assign`);
+      const { assigned, without_tag } = response.data;
+      let message = `${assigned.length} tag(s) attribué(s)`;
+      if (without_tag > 0) {
+        message += `\n${without_tag} joueur(s) présent(s) sans tag : plus aucun tag disponible`;
+      }
+      alert(message);
+      fetchRegistrations(selectedGame.id, true);
+      fetchNFCTags();
+    } catch (err) {
+      console.error('Erreur lors de l\'attribution automatique des tags:', err);
+      alert('Erreur : ' + (err.response?.data?.detail || 'Impossible d\'attribuer les tags'));
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const fetchPendingApplicationsCount = async () => {
     try {
       const response = await api.get('/api/membership-applications/pending/count');
@@ -174,7 +279,7 @@ function AdminDashboard({ setIsAuthenticated }) {
       await api.patch(`/api/registrations/${registrationId}/attendance`, {
         was_present: !currentStatus,
       });
-      fetchRegistrations(selectedGame.id);
+      fetchRegistrations(selectedGame.id, true);
       fetchStatistics();
       fetchGameStatistics();
     } catch (err) {
@@ -192,7 +297,7 @@ function AdminDashboard({ setIsAuthenticated }) {
       await api.patch(`/api/registrations/${registrationId}/payment-type`, {
         payment_type_id: paymentTypeId || null
       });
-      fetchRegistrations(selectedGame.id);
+      fetchRegistrations(selectedGame.id, true);
       fetchStatistics();
       fetchGameStatistics();
     } catch (err) {
@@ -208,7 +313,7 @@ function AdminDashboard({ setIsAuthenticated }) {
 
     try {
       await api.delete(`/api/registrations/${registrationId}`);
-      fetchRegistrations(selectedGame.id);
+      fetchRegistrations(selectedGame.id, true);
       fetchStatistics();
       fetchGameStatistics();
       alert('Inscription supprimée avec succès');
@@ -377,7 +482,7 @@ function AdminDashboard({ setIsAuthenticated }) {
 
   const handleUpdatePlayer = () => {
     if (selectedGame) {
-      fetchRegistrations(selectedGame.id);
+      fetchRegistrations(selectedGame.id, true);
       fetchStatistics();
       fetchGameStatistics();
     }
@@ -625,6 +730,29 @@ function AdminDashboard({ setIsAuthenticated }) {
                   >
                     {loading ? 'Envoi en cours...' : '📧 Envoyer des rappels'}
                   </button>
+
+                  <button 
+                    onClick={autoAssignNFCTags} 
+                    className="action-button secondary"
+                    disabled={loading}
+                    title="Attribuer un tag libre à chaque joueur présent qui n'en a pas"
+                  >
+                    {loading ? 'Traitement...' : '⚡ Attribuer les tags aux présents'}
+                  </button>
+
+                  <button 
+                    onClick={() => exportFile(`/api/games/${selectedGame.id}/registrations/export`, 'csv')} 
+                    className="action-button secondary"
+                  >
+                    📄 Exporter (CSV)
+                  </button>
+
+                  <button 
+                    onClick={() => exportFile(`/api/games/${selectedGame.id}/registrations/export`, 'xlsx')} 
+                    className="action-button secondary"
+                  >
+                    📊 Exporter (Excel)
+                  </button>
                 </div>
 
                 <p style={{ 
@@ -688,6 +816,7 @@ function AdminDashboard({ setIsAuthenticated }) {
                   </div>
                   <div style={{ marginTop: '15px', fontSize: '0.9em', color: '#b0b0b0' }}>
                     {getFilteredAndSortedRegistrations().length} / {registrations.length} inscription(s)
+                    {registrationsCursor && ' chargée(s) : filtres et tri portent sur les inscriptions chargées'}
                   </div>
                 </div>
 
@@ -851,6 +980,17 @@ function AdminDashboard({ setIsAuthenticated }) {
                     </tbody>
                   </table>
                 </div>
+                {registrationsCursor && (
+                  <div style={{ textAlign: 'center', marginTop: '15px' }}>
+                    <button
+                      onClick={loadMoreRegistrations}
+                      className="action-button secondary"
+                      disabled={loadingMoreRegistrations}
+                    >
+                      {loadingMoreRegistrations ? 'Chargement...' : 'Charger plus d\'inscriptions'}
+                    </button>
+                  </div>
+                )}
               </>
             )}
           </div>
@@ -919,6 +1059,14 @@ function AdminDashboard({ setIsAuthenticated }) {
             {gameStats.length > 0 && (
               <div className="table-container" style={{ marginTop: '40px' }}>
                 <h2 style={{ padding: '20px', color: 'var(--primary-color)' }}>🎮 Statistiques par Partie</h2>
+                <div style={{ padding: '0 20px 20px', display: 'flex', gap: '10px', flexWrap: 'wrap' }}>
+                  <button onClick={() => exportFile('/api/statistics/by-game/export', 'xlsx')} className="action-button secondary">
+                    📊 Exporter les statistiques (Excel)
+                  </button>
+                  <button onClick={() => exportFile('/api/registrations/export', 'xlsx')} className="action-button secondary">
+                    📊 Exporter toutes les inscriptions (Excel)
+                  </button>
+                </div>
                 <table>
                   <thead>
                     <tr>
@@ -1,28 +1,36 @@
 import React, { useState, useEffect } from 'react';
-import api from '../api';
+import api, { getPage, reloadLimit } from '../api';
 import './MembershipApplications.css';
 
 function MembershipApplications() {
   const [applications, setApplications] = useState([]);
-  const [filteredApplications, setFilteredApplications] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [pendingCount, setPendingCount] = useState(0);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [message, setMessage] = useState({ type: '', text: '' });
   const [filterStatus, setFilterStatus] = useState('all'); // all, pending, approved, rejected
   const [selectedApplication, setSelectedApplication] = useState(null);
 
   useEffect(() => {
     fetchApplications();
-  }, []);
+  }, [filterStatus]);
 
-  useEffect(() => {
-    filterApplicationsByStatus();
-  }, [applications, filterStatus]);
+  // Filtre par statut appliqué par le serveur, une page à la fois
+  const statusParams = () => (filterStatus === 'all' ? {} : { status: filterStatus });
 
-  const fetchApplications = async () => {
+  // Première page ; après une décision (keepLoaded), recharge autant de lignes que déjà affichées
+  const fetchApplications = async (keepLoaded = false) => {
     setLoading(true);
     try {
-      const response = await api.get('/api/membership-applications');
-      setApplications(response.data);
+      const params = keepLoaded ? { ...statusParams(), limit: reloadLimit(applications.length) } : statusParams();
+      const [page, count] = await Promise.all([
+        getPage('/api/membership-applications', params),
+        api.get('/api/membership-applications/pending/count'),
+      ]);
+      setApplications(page.items);
+      setNextCursor(page.nextCursor);
+      setPendingCount(count.data.count || 0);
     } catch (error) {
       console.error('Erreur lors du chargement des candidatures:', error);
       setMessage({ type: 'error', text: 'Erreur lors du chargement des candidatures' });
@@ -31,11 +39,18 @@ function MembershipApplications() {
     }
   };
 
-  const filterApplicationsByStatus = () => {
-    if (filterStatus === 'all') {
-      setFilteredApplications(applications);
-    } else {
-      setFilteredApplications(applications.filter(app => app.status === filterStatus));
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await getPage('/api/membership-applications', statusParams(), nextCursor);
+      setApplications((loaded) => [...loaded, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.error('Erreur lors du chargement des candidatures:', error);
+      setMessage({ type: 'error', text: 'Erreur lors du chargement des candidatures' });
+    } finally {
+      setLoadingMore(false);
     }
   };
 
@@ -54,7 +69,7 @@ function MembershipApplications() {
         type: 'success', 
         text: `Candidature ${newStatus === 'approved' ? 'approuvée' : 'refusée'} avec succès` 
       });
-      fetchApplications();
+      fetchApplications(true);
       setSelectedApplication(null);
       setTimeout(() => setMessage({ type: '', text: '' }), 3000);
     } catch (error) {
@@ -78,8 +93,6 @@ function MembershipApplications() {
     );
   };
 
-  const pendingCount = applications.filter(app => app.status === 'pending').length;
-
   return (
     <div className="membership-applications">
       <div className="applications-header">
@@ -99,7 +112,7 @@ function MembershipApplications() {
             className={filterStatus === 'all' ? 'active' : ''}
             onClick={() => setFilterStatus('all')}
           >
-            Toutes ({applications.length})
+            Toutes
           </button>
           <button 
             className={filterStatus === 'pending' ? 'active' : ''}
@@ -111,28 +124,28 @@ function MembershipApplications() {
             className={filterStatus === 'approved' ? 'active' : ''}
             onClick={() => setFilterStatus('approved')}
           >
-            Approuvées ({applications.filter(a => a.status === 'approved').length})
+            Approuvées
           </button>
           <button 
             className={filterStatus === 'rejected' ? 'active' : ''}
             onClick={() => setFilterStatus('rejected')}
           >
-            Refusées ({applications.filter(a => a.status === 'rejected').length})
+            Refusées
           </button>
         </div>
       </div>
 
       {loading && <div className="loading">Chargement...</div>}
 
-      {!loading && filteredApplications.length === 0 && (
+      {!loading && applications.length === 0 && (
         <div className="no-applications">
           <p>Aucune candidature trouvée</p>
         </div>
       )}
 
-      {!loading && filteredApplications.length > 0 && (
+      {!loading && applications.length > 0 && (
         <div className="applications-grid">
-          {filteredApplications.map(application => (
+          {applications.map(application => (
             <div key={application.id} className="application-card">
               <div className="card-header">
                 <div className="applicant-info">
@@ -198,6 +211,14 @@ function MembershipApplications() {
         </div>
       )}
 
+      {!loading && nextCursor && (
+        <div className="load-more">
+          <button className="details-button" onClick={loadMore} disabled={loadingMore}>
+            {loadingMore ? 'Chargement...' : 'Charger plus'}
+          </button>
+        </div>
+      )}
+
       {/* Modal de détails */}
       {selectedApplication && (
         <div className="modal-overlay" onClick={() => setSelectedApplication(null)}>
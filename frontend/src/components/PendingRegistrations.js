@@ -1,9 +1,12 @@
 import React, { useState, useEffect } from 'react';
-import api from '../api';
+import api, { getPage, reloadLimit } from '../api';
 import './PendingRegistrations.css';
 
 function PendingRegistrations({ onCountChange }) {
   const [pendingRegistrations, setPendingRegistrations] = useState([]);
+  const [pendingTotal, setPendingTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [rejectModalOpen, setRejectModalOpen] = useState(false);
@@ -15,13 +18,21 @@ function PendingRegistrations({ onCountChange }) {
     fetchPendingRegistrations();
   }, []);
 
-  const fetchPendingRegistrations = async () => {
+  // Première page ; après une validation (keepLoaded), recharge autant de lignes
+  // que déjà affichées. Le total vient du compteur, pas de la page chargée.
+  const fetchPendingRegistrations = async (keepLoaded = false) => {
     try {
       setLoading(true);
-      const response = await api.get('/api/registrations/pending');
-      setPendingRegistrations(response.data);
+      const params = keepLoaded ? { limit: reloadLimit(pendingRegistrations.length) } : {};
+      const [page, count] = await Promise.all([
+        getPage('/api/registrations/pending', params),
+        api.get('/api/registrations/pending/count'),
+      ]);
+      setPendingRegistrations(page.items);
+      setNextCursor(page.nextCursor);
+      setPendingTotal(count.data.count || 0);
       if (onCountChange) {
-        onCountChange(response.data.length);
+        onCountChange(count.data.count || 0);
       }
     } catch (err) {
       console.error('Erreur lors de la récupération des inscriptions en attente:', err);
@@ -31,6 +42,20 @@ function PendingRegistrations({ onCountChange }) {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await getPage('/api/registrations/pending', {}, nextCursor);
+      setPendingRegistrations((loaded) => [...loaded, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      console.error('Erreur lors de la récupération des inscriptions en attente:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleApprove = async (registrationId) => {
     if (!window.confirm('Voulez-vous vraiment approuver cette inscription ?')) {
       return;
@@ -40,7 +65,7 @@ function PendingRegistrations({ onCountChange }) {
       setProcessing(true);
       await api.post(`/api/registrations/${registrationId}/approve`);
       alert('Inscription approuvée ! Un email de confirmation a été envoyé au joueur.');
-      fetchPendingRegistrations();
+      fetchPendingRegistrations(true);
     } catch (err) {
       console.error('Erreur lors de l\'approbation:', err);
       alert('Erreur : ' + (err.response?.data?.detail || 'Impossible d\'approuver cette inscription'));
@@ -74,7 +99,7 @@ function PendingRegistrations({ onCountChange }) {
       });
       alert('Inscription rejetée. Un email a été envoyé au joueur avec le motif du refus.');
       closeRejectModal();
-      fetchPendingRegistrations();
+      fetchPendingRegistrations(true);
     } catch (err) {
       console.error('Erreur lors du rejet:', err);
       alert('Erreur : ' + (err.response?.data?.detail || 'Impossible de rejeter cette inscription'));
@@ -120,7 +145,8 @@ function PendingRegistrations({ onCountChange }) {
       ) : (
         <div className="pending-list">
           <p className="pending-count">
-            {pendingRegistrations.length} inscription{pendingRegistrations.length > 1 ? 's' : ''} en attente
+            {pendingTotal} inscription{pendingTotal > 1 ? 's' : ''} en attente
+            {nextCursor && ` (${pendingRegistrations.length} affichées)`}
           </p>
           
           <div className="pending-cards">
@@ -187,6 +213,18 @@ function PendingRegistrations({ onCountChange }) {
               </div>
             ))}
           </div>
+
+          {nextCursor && (
+            <div className="pending-load-more">
+              <button
+                className="pending-btn pending-btn-cancel"
+                onClick={loadMore}
+                disabled={loadingMore}
+              >
+                {loadingMore ? 'Chargement...' : 'Charger plus'}
+              </button>
+            </div>
+          )}
         </div>
       )}
 